@@ -8,8 +8,10 @@ methods are provided to interface with profiles using either a list of pyspark.R
 import random
 from functools import reduce
 
+import numpy
 import pyspark
 from collections import defaultdict
+from scipy.sparse import csr_matrix
 
 
 def filter_profiles(profiles, filter_fn):
@@ -63,6 +65,28 @@ def map_profiles(profiles, map_fn):
         return map(map_fn, profiles)
 
 
+def project_profiles(profiles, features):
+    """
+    keep only some features of (user, profile) pairs
+    :type profiles: pyspark.RDD|list
+    :type features: list[str]|set[str]
+    :rtype: pyspark.RDD|list
+    """
+    features = set(features)
+    return map_profiles(profiles, lambda x: (x[0], {k: v for k, v in x[1].items() if k in features}))
+
+
+def vectorize_profiles(profiles, model):
+    """
+    replace the profile of (user, profile) pairs with the model's sparse vector of the profile
+    :type profiles: pyspark.RDD|list
+    :type model: RightPersonModel
+    :rtype: pyspark.RDD|list
+    """
+    vectorizer = model.vectorizer
+    return map_profiles(profiles, lambda x: (x[0], vectorizer(x[1])))
+
+
 def partition_profiles(profiles, partitions):
     """
     partition profiles into on of n partitions
@@ -116,6 +140,78 @@ def collect_profiles(profiles):
     return profiles
 
 
+def iterate_profiles(profiles):
+    """
+    iterate over the profiles on the driver, streaming RDDs partition by partition
+    (so that only one partition at a time is held by the driver, unlike collect_profiles)
+    :type profiles: pyspark.RDD|list
+    :rtype: Iterator
+    """
+    if isinstance(profiles, pyspark.RDD):
+        return profiles.toLocalIterator()
+    return iter(profiles)
+
+
+def _grow_buffer(buffer, size):
+    """copies a buffer into a larger buffer of the same type"""
+    grown = numpy.empty(size, dtype=buffer.dtype)
+    grown[:len(buffer)] = buffer
+    return grown
+
+
+def _get_capacity(needed, capacity):
+    """the capacity of a buffer needing some size, doubling it when it is too small"""
+    return capacity if needed <= capacity else max(needed, 2 * capacity)
+
+
+def _get_buffers_size(rows, values):
+    """the size (in bytes) of the buffers for a number of rows and (boolean) values of a csr matrix"""
+    return 9 * rows + 5 * values + 8
+
+
+def collect_sparse_vectors(labelled_vectors, num_columns, memory_budget=None, initial_rows=1024):
+    """
+    collect (sparse vector, label) pairs into a (boolean) csr matrix and an array of labels.
+    vectors are streamed (see iterate_profiles) straight into growing buffers, so the driver never holds them as a list.
+    :param pyspark.RDD|list labelled_vectors: (sorted feature indexes, label) pairs
+    :param int num_columns: the number of columns of the matrix (e.g. the hash size of a model)
+    :param int memory_budget: the maximum size (in bytes) of the buffers, a MemoryError is raised if it is exceeded
+    :param int initial_rows: the initial number of rows of the buffers
+    :rtype: tuple[scipy.sparse.csr_matrix, numpy.ndarray]
+    """
+    indptr = numpy.zeros(initial_rows + 1, dtype=numpy.int64)
+    indices = numpy.empty(initial_rows * 8, dtype=numpy.int32)
+    labels = numpy.empty(initial_rows, dtype=numpy.int8)
+    rows = values = 0
+
+    for vector, label in iterate_profiles(labelled_vectors):
+        needed_rows, needed_values = rows + 1, values + len(vector)
+        if needed_rows > len(labels) or needed_values > len(indices):
+            row_capacity = _get_capacity(needed_rows, len(labels))
+            value_capacity = _get_capacity(needed_values, len(indices))
+            if memory_budget and _get_buffers_size(row_capacity, value_capacity) > memory_budget:
+                # grow only as much as needed when doubling would exceed the budget
+                row_capacity, value_capacity = max(needed_rows, len(labels)), max(needed_values, len(indices))
+                if _get_buffers_size(row_capacity, value_capacity) > memory_budget:
+                    raise MemoryError('{} vectors ({} values) exceed the memory budget of {} bytes'.format(
+                        needed_rows, needed_values, memory_budget))
+            if row_capacity > len(labels):
+                indptr = _grow_buffer(indptr, row_capacity + 1)
+                labels = _grow_buffer(labels, row_capacity)
+            if value_capacity > len(indices):
+                indices = _grow_buffer(indices, value_capacity)
+
+        indices[values:values + len(vector)] = vector
+        values += len(vector)
+        labels[rows] = label
+        rows += 1
+        indptr[rows] = values
+
+    data = numpy.ones(values, dtype=bool)
+    matrix = csr_matrix((data, indices[:values], indptr[:rows + 1]), shape=(rows, num_columns))
+    return matrix, labels[:rows]
+
+
 def count_profiles(profiles):
     """
     count the number of profiles
@@ -7,6 +7,7 @@ from __future__ import unicode_literals
 
 
 from numpy import log, mean
+from scipy.sparse import issparse
 
 
 # TODO: replace with nebula
@@ -36,17 +37,22 @@ def log_loss(predictions, labels, avg_score):
 def get_information_gain(data, labels, model):
     """
     Gets the information gain of a machine_learning that is acquired after utilities on data
-    :param list data: the utilities/testing data as accepted by the machine_learning.predict method
+    :param list|scipy.sparse.csr_matrix data: the utilities/testing data as accepted by the machine_learning.predict
+        method (or a matrix of vectors, as accepted by the machine_learning.predict_vectors method)
     :param list[int] labels: the labels assigned to the utilities/testing data
     :param model: the machine_learning being tested
     :rtype: float
     :returns: the information gain from the machine_learning
     """
-    num_training_sets = int(len(data) * (1 - TRAIN_TEST_RATIO))
+    num_data = data.shape[0] if issparse(data) else len(data)
+    num_training_sets = int(num_data * (1 - TRAIN_TEST_RATIO))
     train_data = data[num_training_sets:], labels[num_training_sets:]
 
     model.partial_fit(*train_data)
     test_data = data[:num_training_sets]
-    predictions = [model.predict(profile) for profile in test_data]
+    if issparse(test_data):
+        predictions = model.predict_vectors(test_data)
+    else:
+        predictions = [model.predict(profile) for profile in test_data]
 
     return 1 - log_loss(predictions, labels[:num_training_sets], mean(labels))
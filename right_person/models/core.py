@@ -17,10 +17,29 @@ import numpy
 from numpy import log
 from pyspark.mllib.classification import LogisticRegressionModel
 from pyspark.mllib.linalg import SparseVector
-from scipy.sparse import coo_matrix
+from scipy.sparse import coo_matrix, issparse
 from sklearn.linear_model import LogisticRegression
 
 
+def get_hashed_features(profile, valid_features, hash_size, flatten_profile_feature):
+    """
+    Creates a sparse vector (sorted hashed feature indexes) from a profile
+    :type profile: dict
+    :type valid_features: list|set
+    :type hash_size: int
+    :param Callable flatten_profile_feature: flattens a feature into hashable values
+    :rtype: list
+    """
+    features = set()
+
+    for feature, values in profile.items():
+        if feature in valid_features:
+            flat_feature = flatten_profile_feature(feature, values)
+            features.update([mmh3.hash(f) % hash_size for f in flat_feature])
+
+    return sorted(features)
+
+
 class RightPersonModel(object):
     """Model for evaluating users based on auction history."""
     MAX_TRAINING_SET_SIZE = 200000
@@ -94,14 +113,26 @@ class RightPersonModel(object):
         vector = self.get_right_person_vector(profile, self.features)
         return self._predictor.predict(SparseVector(self.hash_size, sorted(vector), [1] * len(vector)))
 
+    def predict_vectors(self, matrix):
+        """
+        Predicts the probabilities of the rows of a matrix of vectors being "positive" (as predict does for a profile)
+        :param scipy.sparse.csr_matrix matrix: vectors (see vectorizer and combine_vectors)
+        :rtype: numpy.ndarray
+        """
+        margins = matrix.dot(self.weights) + self.intercept
+        return 1 / (1 + numpy.exp(-margins))
+
     def partial_fit(self, profiles, labels):
         """
         Fit data to the underlying classifier, utilities it
-        :param list[dict] profiles: the data_miners to use for utilities
+        :param list[dict]|scipy.sparse.csr_matrix profiles: the data_miners (or a matrix of their vectors) to use
         :param list[int] labels: the corresponding labels (0 or 1) for the data_miners
         """
-        vectors = [self.get_right_person_vector(profile, self.features) for profile in profiles]
-        matrix = self.combine_vectors(vectors)
+        if issparse(profiles):
+            matrix = profiles
+        else:
+            vectors = [self.get_right_person_vector(profile, self.features) for profile in profiles]
+            matrix = self.combine_vectors(vectors)
 
         self.classifier.fit(matrix, labels)
 
@@ -109,6 +140,22 @@ class RightPersonModel(object):
             self.weights.tolist(), self.intercept, self.hash_size, 2)
         self._predictor.clearThreshold()
 
+    @property
+    def vectorizer(self):
+        """
+        This function returns a function (that can be serialized) for spark jobs to create vectors from profiles
+        (e.g. as profiles are loaded, see SparkDatasetMiner.load_dataset). The function does not reference self.
+        :returns: types.FuncType
+        """
+        valid_features = set(self.features)
+        hash_size = self.hash_size
+        flatten_profile_feature = self.flatten_profile_feature
+
+        def vectorize(profile):
+            return get_hashed_features(profile, valid_features, hash_size, flatten_profile_feature)
+
+        return vectorize
+
     def get_right_person_vector(self, profile, valid_features):
         """
         Creates a sparse vector from a profile
@@ -116,15 +163,7 @@ class RightPersonModel(object):
         :type valid_features: list|set
         :rtype: list
         """
-
-        features = set()
-
-        for feature, values in profile.items():
-            if feature in valid_features:
-                flat_feature = self.flatten_profile_feature(feature, values)
-                features.update([mmh3.hash(f) % self.hash_size for f in flat_feature])
-
-        return sorted(features)
+        return get_hashed_features(profile, valid_features, self.hash_size, self.flatten_profile_feature)
 
     @staticmethod
     def flatten_profile_feature(feature, values):
@@ -135,7 +174,7 @@ class RightPersonModel(object):
         :rtype: list
         """
 
-        if isinstance(values, (set, dict)):
+        if isinstance(values, (set, dict, list)):
             return ['{}-{}'.format(feature, val) for val in values]
         elif isinstance(values, (int, bool)) and values:
             return ['{}-{}'.format(feature, bool(values))]
@@ -10,20 +10,24 @@ import random
 from itertools import repeat
 
 from right_person.ml_utils.data.transformations import filter_profiles, sample_profiles, map_profiles, \
-    count_profiles, union_profiles, collect_profiles
+    count_profiles, union_profiles, collect_sparse_vectors
 from right_person.ml_utils.cross_validation import get_candidate_models
 from right_person.ml_utils.evaluation import TRAIN_TEST_RATIO, get_information_gain
 
 logger = logging.getLogger('right_person.models.training')
 
 
-def train_model(audience, model, cross_validation_folds=1, hyperparameters=None):
+TRAINING_MEMORY_BUDGET = 1024 ** 3
+
+
+def train_model(audience, model, cross_validation_folds=1, hyperparameters=None, memory_budget=TRAINING_MEMORY_BUDGET):
     """
     Train a right person model for some given audience and machine learning parameters
     :param list|pyspark.RDD audience: the audience (list of users and profiles) to use as a basis for training
     :type model: RightPersonModel
     :type cross_validation_folds: int
     :type hyperparameters: dict[str, list[float]]
+    :param int memory_budget: the maximum size (in bytes) of the training data collected on the driver
     :rtype: RightPersonModel
     """
     good_set = filter_profiles(audience, lambda user_profile: user_profile[0] in model.good_users)
@@ -39,42 +43,49 @@ def train_model(audience, model, cross_validation_folds=1, hyperparameters=None)
     normal_set = filter_profiles(audience, lambda user_profile: user_profile[0] not in model.good_users)
     normal_sample = sample_profiles(normal_set, model.sampling_fraction)
 
-    labelled_good_profiles = map_profiles(good_set, lambda user_profile: (user_profile[1], 1))
-    labelled_normal_profiles = map_profiles(normal_sample, lambda user_profile: (user_profile[1], 0))
+    vectorizer = model.vectorizer
+    labelled_good_vectors = map_profiles(good_set, lambda user_profile: (vectorizer(user_profile[1]), 1))
+    labelled_normal_vectors = map_profiles(normal_sample, lambda user_profile: (vectorizer(user_profile[1]), 0))
 
     optimised_model = get_optimised_model(
-        labelled_good_profiles, labelled_normal_profiles, model, cross_validation_folds, hyperparameters or {})
+        labelled_good_vectors, labelled_normal_vectors, model, cross_validation_folds, hyperparameters or {},
+        memory_budget)
 
     return optimised_model
 
 
 def get_shuffled_training_data(training_data, seed, model):
-    """shuffles training data for cross validation"""
+    """shuffles training data (a matrix of vectors and their labels) for cross validation"""
+    matrix, labels = training_data
 
     good_limit = model.audience_good_size / 2
-    training_sample = int(len(training_data) * TRAIN_TEST_RATIO)
+    training_sample = int(len(labels) * TRAIN_TEST_RATIO)
 
-    random.Random(seed).shuffle(training_data)
+    order = list(range(len(labels)))
+    random.Random(seed).shuffle(order)
 
-    while list(zip(*training_data))[1][:training_sample].count(1) < good_limit:
-        random.Random(seed).shuffle(training_data)
+    while list(labels[order[:training_sample]]).count(1) < good_limit:
+        random.Random(seed).shuffle(order)
 
-    return list(zip(*training_data))
+    return matrix[order], labels[order]
 
 
-def get_optimised_model(labelled_good, labelled_normal, model, cross_validation_folds, hyperparameters):
+def get_optimised_model(labelled_good, labelled_normal, model, cross_validation_folds, hyperparameters,
+                        memory_budget=TRAINING_MEMORY_BUDGET):
     """
     Gets an optimised right_person model for some given profile data, cross validation folds and hyperparameters
-    :type labelled_good: list|pyspark.RDD
-    :type labelled_normal: list|pyspark.RDD
+    :param list|pyspark.RDD labelled_good: (vector, 1) pairs
+    :param list|pyspark.RDD labelled_normal: (vector, 0) pairs
     :type model: RightPersonModel
     :type cross_validation_folds: int
     :type hyperparameters: dict[str, list[float]]
+    :param int memory_budget: the maximum size (in bytes) of the training data collected on the driver
     :rtype: RightPersonModel|None
     """
     # TODO: revisit parallel training
 
-    training_data = collect_profiles(union_profiles(labelled_good, labelled_normal))  # MAX 200K
+    training_data = collect_sparse_vectors(
+        union_profiles(labelled_good, labelled_normal), model.hash_size, memory_budget)  # MAX 200K
 
     model_variants = (
         m for cv_model in repeat(model, cross_validation_folds) for m in get_candidate_models(cv_model, hyperparameters)
@@ -50,7 +50,9 @@ setup(
     cmdclass={'pytest': about.get('PyTest')},
     entry_points={
         'console_scripts': [
-            'build_right_person_ami=spark_data_miner.cluster.ami.utils:create_ami_from_instance'
+            'build_right_person_ami=spark_data_miner.cluster.ami.utils:create_ami_from_instance',
+            'benchmark_spark_data_miner=spark_data_miner.core.benchmark:main',
+            'reap_spark_data_miner_clusters=spark_data_miner.cluster.manager.reaper:main',
         ]
     },
     install_requires=[
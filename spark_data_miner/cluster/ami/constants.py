@@ -50,7 +50,7 @@ PYTHON_DEPENDENCIES = [
 
 PACKAGE_DEPENDENCIES = [
     'future',
-    'boto3>=1.9.123',
+    'boto3>=1.12.0',
     'mmh3',
     'numpy',
     'requests',
@@ -65,3 +65,14 @@ PACKAGE_DEPENDENCIES = [
 ]
 
 NAME_FORMAT = 'SPARK_DATA_MINER-{}'
+
+
+# the package and s3a jars are baked into the AMI (and the AMI tagged with their versions, and the package's hash)
+# so that sessions don't resolve jars from maven or ship the package to executors
+PACKAGE_NAME = 'right-person'
+PACKAGE_VERSION_TAG = 'spark-data-miner-package-version'
+PACKAGE_HASH_TAG = 'spark-data-miner-package-hash'  # see cluster.utils.get_installed_package_hash
+
+S3A_JARS = ['org.apache.hadoop:hadoop-aws:2.7.5', 'com.amazonaws:aws-java-sdk:1.7.4']
+MAVEN_REPOSITORY = 'https://repo1.maven.org/maven2/'
+JARS_TAG = 'spark-data-miner-jars'
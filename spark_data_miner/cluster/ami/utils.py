@@ -1,25 +1,32 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import argparse
 import datetime
 import logging
 import sys
-import time
 from contextlib import contextmanager
 from html.parser import HTMLParser
 
-import boto3
 import pyspark
 import requests
+from botocore.exceptions import ClientError
 
 from spark_data_miner.cluster.ami.constants import BASE_IMAGE, NAME_FORMAT, APT_DEPENDENCIES, \
-    PACKAGE_DEPENDENCIES, PYTHON_DEPENDENCIES, SPARK_DIRECTORY
+    PACKAGE_DEPENDENCIES, PYTHON_DEPENDENCIES, SPARK_DIRECTORY, PACKAGE_NAME, PACKAGE_VERSION_TAG, \
+    S3A_JARS, MAVEN_REPOSITORY, JARS_TAG, PACKAGE_HASH_TAG
 from spark_data_miner.cluster.components.ec2.utils import wait_for_instance, ec2_client
-from spark_data_miner.cluster.utils import describe_ec2_properties_from_instance
+from spark_data_miner.cluster.components.waiters import poll
+from spark_data_miner.cluster.utils import describe_ec2_properties_from_instance, get_package_version, \
+    get_installed_package_hash
+from spark_data_miner.core.utils import get_aws_client
 
 
 logger = logging.getLogger('spark_data_miner.cluster.ami.utils')
 
 
+COMMAND_TIMEOUT = 1800  # seconds for each AMI build command
+
+
 # noinspection PyAbstractClass
 class SparkVersionFinder(HTMLParser):
     """lightweight way of getting the spark version/link from the pyspark version"""
@@ -43,8 +50,35 @@ class SparkVersionFinder(HTMLParser):
         return self.DOWNLOAD_URL.format(self.pyspark_version) + self.get_version()
 
 
-def format_commands():
-    """formats the commands for building an AMI"""
+def get_jar_file_name(coordinates):
+    """
+    gets the file name of a jar from its maven coordinates
+    :param str coordinates: e.g. org.apache.hadoop:hadoop-aws:2.7.5
+    :rtype: str
+    """
+    group, artifact, version = coordinates.split(':')
+    return '{}-{}.jar'.format(artifact, version)
+
+
+def get_jar_url(coordinates):
+    """
+    gets the maven repository url of a jar from its maven coordinates
+    :param str coordinates: e.g. org.apache.hadoop:hadoop-aws:2.7.5
+    :rtype: str
+    """
+    group, artifact, version = coordinates.split(':')
+    return '{}{}/{}/{}/{}'.format(MAVEN_REPOSITORY, group.replace('.', '/'), artifact, version,
+                                  get_jar_file_name(coordinates))
+
+
+def format_commands(package_version=None, package_index=None):
+    """
+    formats the commands for building an AMI
+    :param str package_version: the version of the package to install (the package isn't installed if None)
+    :param str package_index: the index to install the package from (the package isn't installed if None).
+        the package is only looked up on this index, and its dependencies (already installed) aren't resolved,
+        so that no other index can provide it.
+    """
     COMMANDS = [
         'timeout 180 /bin/bash -c "until stat /var/lib/cloud/instance/boot-finished 2>/dev/null; do '
         'echo .; sleep 1; done"',
@@ -56,7 +90,12 @@ def format_commands():
         'pip install pyspark=={pyspark_version}'.format(pyspark_version=pyspark.__version__),
         'wget -qO- {spark_download_link} | tar -xvz -C {spark} --strip-components=1'.format(
             spark_download_link=SparkVersionFinder().get_download_link(), spark=SPARK_DIRECTORY),
+    ] + [
+        'wget -q -P {spark}jars/ {jar_url}'.format(spark=SPARK_DIRECTORY, jar_url=get_jar_url(jar)) for jar in S3A_JARS
     ]
+    if package_version and package_index:
+        COMMANDS.append('pip install --no-deps --index-url {index} {package}=={version}'.format(
+            index=package_index, package=PACKAGE_NAME, version=package_version))
     return COMMANDS
 
 
@@ -108,34 +147,35 @@ def temporary_ami_instance(region, subnet_id, profile_arn):
         ec2_client(region).terminate_instances(InstanceIds=[instance['InstanceId']])
 
 
-def wait_for_ssm(region, instance_id, max_retry=6):
+def wait_for_ssm(region, instance_id, timeout=60):
     """
     waits for an instance to become "ssm ready" (recognised by the AWS Systems Manager service)
     :type region: str
     :type instance_id: str
-    :type max_retry: int
+    :param float timeout: the maximum time (seconds) to wait for
     """
-    client = boto3.client('ssm', region_name=region)
+    client = get_aws_client('ssm', region)
     filters = [{'Key': 'InstanceIds', 'Values': [instance_id]}]
 
-    while not bool(client.describe_instance_information(Filters=filters)['InstanceInformationList']) and max_retry > 0:
+    def is_ready(instance_information):
         logger.info('Waiting for ssm.')
-        max_retry -= 1
-        time.sleep(10)
+        return bool(instance_information)
+
+    poll(lambda: client.describe_instance_information(Filters=filters)['InstanceInformationList'], is_ready, timeout)
 
 
-def wait_for_ami(region, image_id, max_retry=30):
+def wait_for_ami(region, image_id, timeout=300):
     """
     waits for an ami to be registered as available
     :type region: str
     :type image_id: str
-    :type max_retry: int
+    :param float timeout: the maximum time (seconds) to wait for
     """
-    while ec2_client(region).describe_images(ImageIds=[image_id])['Images'][0]['State'] != 'available' and \
-            max_retry > 0:
+    def is_available(state):
         logger.info('Waiting for ami.')
-        time.sleep(10)
-        max_retry -= 1
+        return state == 'available'
+
+    poll(lambda: ec2_client(region).describe_images(ImageIds=[image_id])['Images'][0]['State'], is_available, timeout)
 
 
 def ami_exists(region):
@@ -159,45 +199,87 @@ def get_ami(region):
     return sorted(images, key=lambda x: x['CreationDate'], reverse=True)[0]
 
 
-def run_commands(region, instance_id):
+def has_baked_jars(image):
+    """
+    checks if an AMI has the s3a jars (that sessions use) on the spark classpath
+    :type image: dict
+    :rtype: bool
+    """
+    tags = {tag['Key']: tag['Value'] for tag in image.get('Tags', [])}
+    return tags.get(JARS_TAG) == ','.join(S3A_JARS)
+
+
+def has_baked_package(image):
+    """
+    checks if an AMI has the package installed, with the same files as this machine (so that it needn't be shipped
+    to executors). files are compared by hash, so local changes (e.g. in a checkout or an editable install) are shipped
+    :type image: dict
+    :rtype: bool
+    """
+    tags = {tag['Key']: tag['Value'] for tag in image.get('Tags', [])}
+    return tags.get(PACKAGE_HASH_TAG) == get_installed_package_hash()
+
+
+def run_commands(region, instance_id, package_version=None, package_index=None):
     """
     runs commands against an ubuntu instance. Requires instance to be valid under aws ssm.
     :type region: str
     :type instance_id: str
+    :param str package_version: the version of the package to install (see format_commands)
+    :param str package_index: the index to install the package from (see format_commands)
     """
-    COMMANDS = format_commands()
-    client = boto3.client('ssm', region_name=region)
+    COMMANDS = format_commands(package_version, package_index)
+    client = get_aws_client('ssm', region)
+    failed_states = {'Cancelled', 'TimedOut', 'Failed', 'Cancelling'}
     for i, cmd in enumerate(COMMANDS, start=1):
         logger.info('Issuing command {}/{}.'.format(i, len(COMMANDS)))
         params = {'commands': [cmd]}
         resp = client.send_command(InstanceIds=[instance_id], DocumentName="AWS-RunShellScript", Parameters=params)
         command = resp['Command']
-        count = 0
-        while command['Status'] != 'Success' or count >= 30:
-            logger.info('Running command {}: waiting...'.format(i))
-            # noinspection PyBroadException
+
+        def get_invocation(command_id=command['CommandId'], pending=command):
             try:
-                command = client.get_command_invocation(CommandId=command['CommandId'], InstanceId=instance_id)
-            except Exception:
+                return client.get_command_invocation(CommandId=command_id, InstanceId=instance_id)
+            except ClientError:
                 logger.info('Pending command {}: AWS not ready.'.format(i))
-            if command['Status'] in {'Cancelled', 'TimedOut', 'Failed', 'Cancelling'}:
-                raise ValueError('Command "{}" Failed:\n'.format(cmd) + command['StandardErrorContent'])
-            count += 1
-            time.sleep(10)
+                return pending
+
+        def is_finished(invocation):
+            logger.info('Running command {}: {}'.format(i, invocation['Status']))
+            return invocation['Status'] == 'Success' or invocation['Status'] in failed_states
+
+        command = poll(get_invocation, is_finished, COMMAND_TIMEOUT, max_delay=10)
+        if command['Status'] != 'Success':
+            raise ValueError('Command "{}" Failed ({}):\n'.format(cmd, command['Status']) +
+                             command.get('StandardErrorContent', ''))
 
 
-def create_ami(region, subnet_id, profile_arn):
+def create_ami(region, subnet_id, profile_arn, package_index=None):
     """
     creates an ami with the relevant specs for spark_data_miner
     :type region: str
     :type subnet_id: str
     :type profile_arn: str
+    :param str package_index: the index to install the package from (the package isn't baked in if None)
     """
+    package_version = get_package_version()
+    if package_version is None:
+        logger.warning('{} is not installed (or is run from source), it will be shipped to executors by each '
+                       'session.'.format(PACKAGE_NAME))
+    elif package_index is None:
+        logger.warning('No package index is configured, {} will be shipped to executors by each session.'.format(
+            PACKAGE_NAME))
+        package_version = None
     with temporary_ami_instance(region, subnet_id, profile_arn) as instance:
         wait_for_ssm(region, instance['InstanceId'])
-        run_commands(region, instance['InstanceId'])
+        run_commands(region, instance['InstanceId'], package_version, package_index)
         image_name = NAME_FORMAT.format(datetime.datetime.now().strftime('%s'))
         image = ec2_client(region).create_image(InstanceId=instance['InstanceId'], Name=image_name)
+        tags = [{'Key': JARS_TAG, 'Value': ','.join(S3A_JARS)}]
+        if package_version:  # the installed files are the released version's, as installed on the AMI
+            tags.append({'Key': PACKAGE_VERSION_TAG, 'Value': package_version})
+            tags.append({'Key': PACKAGE_HASH_TAG, 'Value': get_installed_package_hash()})
+        ec2_client(region).create_tags(Resources=[image['ImageId']], Tags=tags)
         wait_for_ami(region, image['ImageId'])
         logger.info('New ami is ready {}'.format(image['ImageId']))
 
@@ -207,5 +289,10 @@ def create_ami_from_instance():
     creates an ami with the relevant spec for spark_data_miner, using properties of the executing instance
     """
     logging.basicConfig(stream=sys.stdout, level=logging.INFO, format='%(asctime)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Build an AMI for spark data miner clusters')
+    parser.add_argument('--package-index', default=None,
+                        help='the index to install the installed version of {} from, to bake it into the AMI '
+                             '(it is shipped by each session if not set)'.format(PACKAGE_NAME))
+    args = parser.parse_args()
     properties = describe_ec2_properties_from_instance()
-    create_ami(properties.region, properties.subnet_id, properties.profile['Arn'])
+    create_ami(properties.region, properties.subnet_id, properties.profile['Arn'], args.package_index)
@@ -42,3 +42,67 @@ do
   sleep 1.0
 done
 """
+
+
+# instance types: memory (GiB), vcpus, network performance and local NVMe storage (GB)
+# types not listed here are looked up with the pricing api (and cached in INSTANCE_CATALOG_CACHE)
+INSTANCE_CATALOG_CACHE = '~/.spark_data_miner/instance_types.json'
+
+INSTANCE_TYPES = {
+    'm5.large': {'memory': 8, 'vcpus': 2, 'network': 'Up to 10 Gigabit', 'nvme': 0},
+    'm5.xlarge': {'memory': 16, 'vcpus': 4, 'network': 'Up to 10 Gigabit', 'nvme': 0},
+    'm5.2xlarge': {'memory': 32, 'vcpus': 8, 'network': 'Up to 10 Gigabit', 'nvme': 0},
+    'm5.4xlarge': {'memory': 64, 'vcpus': 16, 'network': 'Up to 10 Gigabit', 'nvme': 0},
+    'm5.8xlarge': {'memory': 128, 'vcpus': 32, 'network': '10 Gigabit', 'nvme': 0},
+    'm5.12xlarge': {'memory': 192, 'vcpus': 48, 'network': '10 Gigabit', 'nvme': 0},
+    'm5.16xlarge': {'memory': 256, 'vcpus': 64, 'network': '20 Gigabit', 'nvme': 0},
+    'm5.24xlarge': {'memory': 384, 'vcpus': 96, 'network': '25 Gigabit', 'nvme': 0},
+    'm5d.large': {'memory': 8, 'vcpus': 2, 'network': 'Up to 10 Gigabit', 'nvme': 75},
+    'm5d.xlarge': {'memory': 16, 'vcpus': 4, 'network': 'Up to 10 Gigabit', 'nvme': 150},
+    'm5d.2xlarge': {'memory': 32, 'vcpus': 8, 'network': 'Up to 10 Gigabit', 'nvme': 300},
+    'm5d.4xlarge': {'memory': 64, 'vcpus': 16, 'network': 'Up to 10 Gigabit', 'nvme': 600},
+    'm5d.8xlarge': {'memory': 128, 'vcpus': 32, 'network': '10 Gigabit', 'nvme': 1200},
+    'm5d.12xlarge': {'memory': 192, 'vcpus': 48, 'network': '10 Gigabit', 'nvme': 1800},
+    'm5d.16xlarge': {'memory': 256, 'vcpus': 64, 'network': '20 Gigabit', 'nvme': 2400},
+    'm5d.24xlarge': {'memory': 384, 'vcpus': 96, 'network': '25 Gigabit', 'nvme': 3600},
+    'c5.large': {'memory': 4, 'vcpus': 2, 'network': 'Up to 10 Gigabit', 'nvme': 0},
+    'c5.xlarge': {'memory': 8, 'vcpus': 4, 'network': 'Up to 10 Gigabit', 'nvme': 0},
+    'c5.2xlarge': {'memory': 16, 'vcpus': 8, 'network': 'Up to 10 Gigabit', 'nvme': 0},
+    'c5.4xlarge': {'memory': 32, 'vcpus': 16, 'network': 'Up to 10 Gigabit', 'nvme': 0},
+    'c5.9xlarge': {'memory': 72, 'vcpus': 36, 'network': '10 Gigabit', 'nvme': 0},
+    'c5.18xlarge': {'memory': 144, 'vcpus': 72, 'network': '25 Gigabit', 'nvme': 0},
+    'c5d.large': {'memory': 4, 'vcpus': 2, 'network': 'Up to 10 Gigabit', 'nvme': 50},
+    'c5d.xlarge': {'memory': 8, 'vcpus': 4, 'network': 'Up to 10 Gigabit', 'nvme': 100},
+    'c5d.2xlarge': {'memory': 16, 'vcpus': 8, 'network': 'Up to 10 Gigabit', 'nvme': 200},
+    'c5d.4xlarge': {'memory': 32, 'vcpus': 16, 'network': 'Up to 10 Gigabit', 'nvme': 400},
+    'c5d.9xlarge': {'memory': 72, 'vcpus': 36, 'network': '10 Gigabit', 'nvme': 900},
+    'c5d.18xlarge': {'memory': 144, 'vcpus': 72, 'network': '25 Gigabit', 'nvme': 1800},
+    'r4.large': {'memory': 15.25, 'vcpus': 2, 'network': 'Up to 10 Gigabit', 'nvme': 0},
+    'r4.xlarge': {'memory': 30.5, 'vcpus': 4, 'network': 'Up to 10 Gigabit', 'nvme': 0},
+    'r4.2xlarge': {'memory': 61, 'vcpus': 8, 'network': 'Up to 10 Gigabit', 'nvme': 0},
+    'r4.4xlarge': {'memory': 122, 'vcpus': 16, 'network': 'Up to 10 Gigabit', 'nvme': 0},
+    'r4.8xlarge': {'memory': 244, 'vcpus': 32, 'network': '10 Gigabit', 'nvme': 0},
+    'r4.16xlarge': {'memory': 488, 'vcpus': 64, 'network': '25 Gigabit', 'nvme': 0},
+    'r5.large': {'memory': 16, 'vcpus': 2, 'network': 'Up to 10 Gigabit', 'nvme': 0},
+    'r5.xlarge': {'memory': 32, 'vcpus': 4, 'network': 'Up to 10 Gigabit', 'nvme': 0},
+    'r5.2xlarge': {'memory': 64, 'vcpus': 8, 'network': 'Up to 10 Gigabit', 'nvme': 0},
+    'r5.4xlarge': {'memory': 128, 'vcpus': 16, 'network': 'Up to 10 Gigabit', 'nvme': 0},
+    'r5.8xlarge': {'memory': 256, 'vcpus': 32, 'network': '10 Gigabit', 'nvme': 0},
+    'r5.12xlarge': {'memory': 384, 'vcpus': 48, 'network': '10 Gigabit', 'nvme': 0},
+    'r5.16xlarge': {'memory': 512, 'vcpus': 64, 'network': '20 Gigabit', 'nvme': 0},
+    'r5.24xlarge': {'memory': 768, 'vcpus': 96, 'network': '25 Gigabit', 'nvme': 0},
+    'r5d.large': {'memory': 16, 'vcpus': 2, 'network': 'Up to 10 Gigabit', 'nvme': 75},
+    'r5d.xlarge': {'memory': 32, 'vcpus': 4, 'network': 'Up to 10 Gigabit', 'nvme': 150},
+    'r5d.2xlarge': {'memory': 64, 'vcpus': 8, 'network': 'Up to 10 Gigabit', 'nvme': 300},
+    'r5d.4xlarge': {'memory': 128, 'vcpus': 16, 'network': 'Up to 10 Gigabit', 'nvme': 600},
+    'r5d.8xlarge': {'memory': 256, 'vcpus': 32, 'network': '10 Gigabit', 'nvme': 1200},
+    'r5d.12xlarge': {'memory': 384, 'vcpus': 48, 'network': '10 Gigabit', 'nvme': 1800},
+    'r5d.16xlarge': {'memory': 512, 'vcpus': 64, 'network': '20 Gigabit', 'nvme': 2400},
+    'r5d.24xlarge': {'memory': 768, 'vcpus': 96, 'network': '25 Gigabit', 'nvme': 3600},
+    'i3.large': {'memory': 15.25, 'vcpus': 2, 'network': 'Up to 10 Gigabit', 'nvme': 475},
+    'i3.xlarge': {'memory': 30.5, 'vcpus': 4, 'network': 'Up to 10 Gigabit', 'nvme': 950},
+    'i3.2xlarge': {'memory': 61, 'vcpus': 8, 'network': 'Up to 10 Gigabit', 'nvme': 1900},
+    'i3.4xlarge': {'memory': 122, 'vcpus': 16, 'network': 'Up to 10 Gigabit', 'nvme': 3800},
+    'i3.8xlarge': {'memory': 244, 'vcpus': 32, 'network': '10 Gigabit', 'nvme': 7600},
+    'i3.16xlarge': {'memory': 488, 'vcpus': 64, 'network': '25 Gigabit', 'nvme': 15200},
+}
@@ -1,19 +1,18 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import logging
-import time
-
-import boto3
 
 from spark_data_miner.cluster.components.ec2.constants import PORT_PURPOSES
+from spark_data_miner.cluster.components.waiters import poll
+from spark_data_miner.core.utils import get_aws_client
 
 
 logger = logging.getLogger('spark_data_miner.cluster.components.ec2.utils')
 
 
 def ec2_client(region):
-    """gets a boto3 ec2 client"""
-    return boto3.client('ec2', region_name=region)
+    """gets a (shared) boto3 ec2 client"""
+    return get_aws_client('ec2', region)
 
 
 def ip_rule_template(cidr, port):
@@ -74,18 +73,45 @@ def get_instance(region, instance_id):
     return instance
 
 
-def wait_for_instance(region, instance, max_retry=12):
+def get_instances(region, instance_ids):
+    """
+    gets the instance responses of some instances from boto.
+    :type region: str
+    :type instance_ids: list[str]
+    :rtype: list[dict]
+    """
+    resp = ec2_client(region).describe_instances(InstanceIds=instance_ids)
+    return [instance for reservation in resp['Reservations'] for instance in reservation['Instances']]
+
+
+def wait_for_instance(region, instance, timeout=120):
     """
     waits for an instance to be in a "running" state
     returns info about the running instance (data that's not available until the state has been achieved)
     :type region: str
     :type instance: dict
-    :type max_retry: int
+    :param float timeout: the maximum time (seconds) to wait for
     :rtype: dict
     """
-    while instance['State']['Name'] != 'running' and max_retry > 0:
-        logger.info('Waiting for instance.')
-        max_retry -= 1
-        time.sleep(10)
-        instance = get_instance(region, instance['InstanceId'])
-    return instance
+    return wait_for_instances(region, [instance], timeout)[0]
+
+
+def wait_for_instances(region, instances, timeout=120):
+    """
+    waits for instances to be in a "running" state (polling with exponential backoff)
+    returns info about the running instances (data that's not available until the state has been achieved)
+    :type region: str
+    :type instances: list[dict]
+    :param float timeout: the maximum time (seconds) to wait for
+    :rtype: list[dict]
+    """
+    instance_ids = [instance['InstanceId'] for instance in instances]
+
+    def is_running(described_instances):
+        running = sum(instance['State']['Name'] == 'running' for instance in described_instances)
+        logger.info('Waiting for instances ({}/{} running).'.format(running, len(instance_ids)))
+        return running == len(instance_ids)
+
+    if is_running(instances):
+        return instances
+    return poll(lambda: get_instances(region, instance_ids), is_running, timeout)
@@ -1,16 +1,15 @@
 
-import boto3
-
 from spark_data_miner.cluster.components.iam.constants import _GENERIC_DESCRIBE, _S3_READ_WRITE, _ASSUME_ROLE
+from spark_data_miner.core.utils import get_aws_client
 
 
 def iam_client(region='eu-west-1'):
     """
-    get a client for iam resources, default region: eu-west-1
+    get a (shared) client for iam resources, default region: eu-west-1
     :type region: str
     :rtype botocore.client.EC2:
     """
-    return boto3.client('iam', region_name=region)
+    return get_aws_client('iam', region)
 
 
 def get_policy_documents():
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+waiters for aws resources, polling (or retrying) with exponential backoff rather than fixed sleeps
+"""
+import logging
+import random
+import time
+
+
+logger = logging.getLogger('spark_data_miner.cluster.components.waiters')
+
+
+def get_backoff_delays(timeout, initial_delay=1, max_delay=20, factor=2):
+    """
+    yields delays (seconds) that grow exponentially (with jitter, up to max_delay) until they total the timeout
+    :type timeout: float
+    :type initial_delay: float
+    :type max_delay: float
+    :type factor: float
+    :rtype: Iterator[float]
+    """
+    delay, total = initial_delay, 0
+    while total < timeout:
+        jittered = min(delay * random.uniform(0.5, 1.5), max_delay, timeout - total)
+        total += jittered
+        yield jittered
+        delay = min(delay * factor, max_delay)
+
+
+def poll(get_value, is_done, timeout, **backoff):
+    """
+    polls for a value until it is done or the timeout is reached, returning the last value either way
+    :param Callable get_value: gets the value, e.g. describes an instance
+    :param Callable is_done: checks if the value is done, e.g. the instance is running
+    :param float timeout: the maximum time (seconds) to poll for
+    :param backoff: see get_backoff_delays
+    :rtype: Any
+    """
+    value = get_value()
+    for delay in get_backoff_delays(timeout, **backoff):
+        if is_done(value):
+            break
+        time.sleep(delay)
+        value = get_value()
+    return value
+
+
+def retry(call, exceptions, timeout, **backoff):
+    """
+    calls a function until it doesn't raise one of some exceptions, or the timeout is reached (raising the last error)
+    :param Callable call: the function to call, e.g. launching an instance with a new instance profile
+    :param tuple exceptions: the exceptions to retry on
+    :param float timeout: the maximum time (seconds) to retry for
+    :param backoff: see get_backoff_delays
+    :rtype: Any
+    """
+    for delay in get_backoff_delays(timeout, **backoff):
+        try:
+            return call()
+        except exceptions as e:
+            logger.info('Retrying in {:.1f}s after: {}'.format(delay, e))
+            time.sleep(delay)
+    return call()
@@ -1,12 +1,29 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import contextlib
 import copy
 import datetime
+import errno
+import fcntl
+import getpass
+import json
 import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
 import time
 import ujson
 import uuid
 from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+
+try:
+    from queue import Queue
+except ImportError:  # python 2
+    from Queue import Queue
 
 from botocore.exceptions import ClientError
 
@@ -14,7 +31,8 @@ from spark_data_miner.cluster.ami.utils import get_ami
 from spark_data_miner.cluster.components.ec2.constants import MASTER_SG_PORTS, NODE_SG_PORTS, MASTER_USER_DATA, \
     NODE_USER_DATA, SPARK_PORT
 from spark_data_miner.cluster.components.ec2.utils import ec2_client, \
-    get_ingress_rules, wait_for_instance
+    get_ingress_rules, wait_for_instance, get_instances
+from spark_data_miner.cluster.components.waiters import poll, retry
 from spark_data_miner.cluster.utils import describe_ec2_properties_from_instance
 from spark_data_miner.cluster.components.iam.utils import get_policy_documents, iam_client, get_assume_role
 
@@ -25,26 +43,296 @@ logger = logging.getLogger('spark_data_miner.cluster.manager.access')
 ClusterPlan = namedtuple('ClusterPlan', ['master_type', 'node_type', 'node_count'])
 
 
-class ClusterManager(object):
-    """Manages AWS EC2 instance resources"""
+CLUSTER_REGISTRY_DIRECTORY = '~/.spark_data_miner/clusters'
+CLUSTER_TAG = 'spark-data-miner-cluster'
+ROLE_TAG = 'spark-data-miner-role'
+OWNER_TAG = 'spark-data-miner-owner'
+REAPING_TIMEOUT = 900  # seconds to wait for a cluster being destroyed (by a reaper) to be destroyed
+
+
+def get_owner_id():
+    """
+    gets the id of this user and host, tagged on the clusters they create (their registries are only on this host)
+    :rtype: str
+    """
+    return '{}@{}'.format(getpass.getuser(), socket.gethostname())
+
+
+def is_process_running(pid):
+    """
+    checks if a process (e.g. a reaper) is running on this host
+    :type pid: int
+    :rtype: bool
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM  # the process exists, but belongs to another user
+    return True
+
+
+def is_being_reaped(state):
+    """
+    checks if a cluster (from its persisted registry) is being destroyed by a running reaper
+    :type state: dict
+    :rtype: bool
+    """
+    return bool(state.get('reaper')) and is_process_running(state['reaper'])
+
+
+def is_idle(state):
+    """
+    checks if a cluster (from its persisted registry) has been idle for longer than its idle ttl
+    :type state: dict
+    :rtype: bool
+    """
+    return bool(state.get('idle_until')) and state['idle_until'] <= time.time()
+
+
+def is_in_use(state):
+    """
+    checks if a cluster (from its persisted registry) is in use by a running session, i.e. it wasn't released
+    :type state: dict
+    :rtype: bool
+    """
+    return not state.get('idle_until') and bool(state.get('session')) and is_process_running(state['session'])
+
+
+def get_registry_path(cluster_id):
+    """
+    gets the path of the file persisting the registry of a cluster
+    :type cluster_id: str
+    :rtype: str
+    """
+    return os.path.join(os.path.expanduser(CLUSTER_REGISTRY_DIRECTORY), '{}.json'.format(cluster_id))
+
+
+def read_cluster_registry(cluster_id):
+    """
+    reads the persisted registry of a cluster (None if the cluster isn't known)
+    :type cluster_id: str
+    :rtype: dict|None
+    """
+    path = get_registry_path(cluster_id)
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+@contextlib.contextmanager
+def locked_registry(cluster_id):
+    """
+    holds an exclusive lock on the persisted registry of a cluster (between the processes of this host),
+    so that a cluster is checked and claimed (attached to or reaped) by a single process
+    :type cluster_id: str
+    """
+    path = get_registry_path(cluster_id)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path[:-len('.json')] + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def list_cluster_ids():
+    """
+    lists the ids of the clusters with a persisted registry
+    :rtype: list[str]
+    """
+    directory = os.path.expanduser(CLUSTER_REGISTRY_DIRECTORY)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name[:-len('.json')] for name in os.listdir(directory) if name.endswith('.json'))
+
+
+def get_idle_cluster_ids(exclude=()):
+    """
+    gets the ids of the (warm) clusters that have been idle for longer than their idle ttl
+    (clusters being destroyed by a running reaper are left out)
+    :param exclude: the ids of clusters to leave out
+    :rtype: list[str]
+    """
+    idle = []
+    for cluster_id in list_cluster_ids():
+        state = read_cluster_registry(cluster_id)
+        if cluster_id in exclude or not state or not is_idle(state) or is_being_reaped(state):
+            continue
+        idle.append(cluster_id)
+    return idle
+
+
+def reap_idle_clusters(exclude=()):
+    """
+    destroys the (warm) clusters that have been idle for longer than their idle ttl
+    :param exclude: the ids of clusters not to destroy
+    :rtype: list[str]
+    :returns: the ids of the destroyed clusters
+    """
+    reaped = []
+    for cluster_id in get_idle_cluster_ids(exclude):
+        with locked_registry(cluster_id):
+            state = read_cluster_registry(cluster_id)  # it may have been attached to (or reaped) since it was listed
+            if not state or not is_idle(state) or is_being_reaped(state):
+                continue
+            manager = ClusterManager.from_registry(cluster_id)
+            manager.claim(os.getpid())
+        logger.info('Destroying idle cluster {}.'.format(cluster_id))
+        manager.destroy()
+        reaped.append(cluster_id)
+    return reaped
+
+
+def start_reaper(arguments, log_name):
+    """
+    starts a detached reaper process (see reaper.main), that outlives this process
+    :param list[str] arguments: the arguments of the reaper
+    :param str log_name: the name of the log file (in the registry directory) of the reaper's output
+    :rtype: int|None
+    :returns: the id of the process (None if it couldn't be started)
+    """
+    directory = os.path.expanduser(CLUSTER_REGISTRY_DIRECTORY)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    command = [sys.executable, '-m', 'spark_data_miner.cluster.manager.reaper'] + list(arguments)
+    try:
+        with open(os.path.join(directory, log_name), 'a') as log:
+            process = subprocess.Popen(
+                command, stdout=log, stderr=subprocess.STDOUT, close_fds=True, preexec_fn=os.setsid)
+    except (OSError, IOError) as e:
+        logger.warning('Could not start the cluster reaper ({}).'.format(e))
+        return None
+    return process.pid
+
+
+def reap_idle_clusters_in_background(exclude=()):
+    """
+    destroys the clusters that have been idle for longer than their idle ttl in a detached process, without waiting
+    :param exclude: the ids of clusters not to destroy
+    :rtype: bool
+    :returns: whether the process was started (it isn't if no cluster is idle)
+    """
+    if not get_idle_cluster_ids(exclude):
+        return False
+    arguments = ['--idle']
+    for cluster_id in exclude:
+        arguments += ['--exclude', cluster_id]
+    return start_reaper(arguments, 'reaper.log') is not None
+
+
+def run_steps(steps, dependencies):
+    """
+    runs steps concurrently, each step starting as soon as the steps it depends on are done.
+    if a step fails, no more steps are started and its error is raised once the running steps are done.
+    :param dict[str, Callable] steps: the steps (by name)
+    :param dict[str, tuple[str]] dependencies: the names of the steps each step depends on
+    """
+    finished = Queue()
+
+    def run_step(name):
+        try:
+            steps[name]()
+            finished.put((name, None))
+        except Exception as e:
+            finished.put((name, e))
+
+    started, done, errors = set(), set(), []
+    pool = ThreadPool(len(steps))
+    try:
+        while len(done) < len(steps):
+            if not errors:
+                for name in steps:
+                    if name not in started and set(dependencies.get(name, ())) <= done:
+                        started.add(name)
+                        pool.apply_async(run_step, (name, ))
+            if len(started) == len(done):
+                break
+            name, error = finished.get()
+            if error is not None:
+                logger.error('cluster step "{}" failed: {}'.format(name, error))
+                errors.append(error)
+            done.add(name)
+    finally:
+        pool.close()
+        pool.join()
+    if errors:
+        raise errors[0]
+
 
-    def __init__(self, plan, cluster_id=None):
+class ClusterManager(object):
+    """
+    Manages AWS EC2 instance resources
+
+    The registry of a cluster's resources is persisted (see get_registry_path), so that a cluster can be kept warm
+    between jobs: with an idle_ttl the cluster is released (rather than destroyed) on exit, and a later manager
+    with the same cluster_id attaches to it (resizing it to its plan) until it has been idle for longer than the ttl.
+    The registry also records the process destroying the cluster, if any, so that only one reaper destroys it.
+    """
+
+    CREATION_DEPENDENCIES = {
+        'policies': (),
+        'role': ('policies', ),
+        'instance_profile': ('role', ),
+        'security_groups': (),
+        'master': ('instance_profile', 'security_groups'),
+        'nodes': ('master', ),
+        'master_running': ('master', ),
+    }
+
+    def __init__(self, plan, cluster_id=None, idle_ttl=None, background_teardown=False):
+        """
+        :type plan: ClusterPlan
+        :param str cluster_id: the id of the cluster (a warm cluster with this id is attached to, if it exists)
+        :param float idle_ttl: keep the cluster (for other managers to attach to) for this long (seconds) after exit
+        :param bool background_teardown: destroy the cluster on exit in a detached process, without waiting for it
+        """
         self.__registry = {}
+        self.__registry_lock = threading.RLock()
         self.__plan = plan
+        self.__released = False
+        self.__idle_until = None
+        self.__reaper = None
+        self.__session = os.getpid()
         self.cluster_id = cluster_id or str(uuid.uuid4())
+        self.idle_ttl = idle_ttl
+        self.background_teardown = background_teardown
+
+    @classmethod
+    def from_registry(cls, cluster_id):
+        """
+        gets a manager for an existing cluster from its persisted registry
+        :type cluster_id: str
+        :rtype: ClusterManager
+        """
+        state = read_cluster_registry(cluster_id) or {'plan': [None, None, 0], 'registry': {}}
+        manager = cls(ClusterPlan(*state['plan']), cluster_id)
+        manager.__registry.update(state['registry'])
+        manager.__idle_until = state.get('idle_until')
+        manager.__reaper = state.get('reaper')
+        manager.__session = state.get('session')
+        return manager
 
     def __enter__(self):
-        """Context manager entry; create the cluster and provide a copy of the registry"""
+        """Context manager entry; create (or attach to) the cluster and provide a copy of the registry"""
         self.create()
         return self.registry
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        """Context manager exit; destroy the cluster"""
-        self.destroy()
+        """Context manager exit; release the cluster if it is kept warm, else destroy the cluster"""
+        if self.idle_ttl:
+            self.release()
+        elif self.background_teardown:
+            self.destroy_in_background()
+        else:
+            self.destroy()
 
     def __del__(self):
-        """Object deletion; destroy the cluster"""
-        self.destroy()
+        """Object deletion; destroy the cluster (unless it was released to be kept warm)"""
+        if not self.__released:
+            self.destroy()
 
     @property
     def instance_properties(self):
@@ -65,17 +353,172 @@ class ClusterManager(object):
     @property
     def registry(self):
         """Returns a read only copy of the registry"""
-        return copy.deepcopy(self.__registry)
+        with self.__registry_lock:
+            return copy.deepcopy(self.__registry)
+
+    def __register(self, key, value):
+        """adds a resource to the registry (steps register resources concurrently)"""
+        with self.__registry_lock:
+            self.__registry[key] = value
+            self.__save()
+
+    def __unregister(self, key):
+        """removes a (destroyed) resource from the registry"""
+        with self.__registry_lock:
+            del self.__registry[key]
+            self.__save()
+
+    def __save(self):
+        """persists the registry (or removes it once every resource has been destroyed)"""
+        path = get_registry_path(self.cluster_id)
+        if not self.__registry:
+            if os.path.isfile(path):
+                os.remove(path)
+            return
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        state = {'plan': list(self.plan), 'registry': self.__registry, 'idle_until': self.__idle_until,
+                 'reaper': self.__reaper, 'session': self.__session}
+        # written to a temporary file that replaces the registry, so readers (e.g. reapers) never see a partial write
+        fd, temporary_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(state, f, default=str)
+            os.rename(temporary_path, path)
+        except Exception:
+            os.remove(temporary_path)
+            raise
+
+    def __get_tags(self, role):
+        """gets the tags identifying the cluster's resources"""
+        return [
+            {'Key': CLUSTER_TAG, 'Value': self.cluster_id}, {'Key': ROLE_TAG, 'Value': role},
+            {'Key': OWNER_TAG, 'Value': get_owner_id()},
+        ]
 
     def create(self):
-        """creates the cluster"""
+        """
+        creates the cluster, running independent steps (e.g. iam resources and security groups) concurrently.
+        only the master is waited for, nodes join the cluster as they start (see cluster.utils.wait_for_workers).
+        if a warm cluster with the same id exists, the manager attaches to it instead (resizing it to the plan).
+        """
+        if not self.__registry and self.__attach():
+            return
         if not self.__registry:
-            self.__create_policies()
-            self.__create_role()
-            self.__create_instance_profile()
-            self.__create_security_groups()
-            self.__create_master()
-            self.__create_nodes()
+            steps = {
+                'policies': self.__create_policies,
+                'role': self.__create_role,
+                'instance_profile': self.__create_instance_profile,
+                'security_groups': self.__create_security_groups,
+                'master': self.__create_master,
+                'nodes': self.__create_nodes,
+                'master_running': self.__wait_for_master,
+            }
+            run_steps(steps, self.CREATION_DEPENDENCIES)
+
+    def __attach(self):
+        """
+        attaches to the warm cluster with the manager's id, if it exists, was released (by the session that used it)
+        within its idle ttl, its master is running and its instance types are the plan's
+        (else the cluster is destroyed, to be recreated for the plan).
+        the cluster is checked and marked as in use by this session under the registry's lock,
+        so that concurrent sessions (or reapers) don't take it over too.
+        :rtype: bool
+        """
+        state = read_cluster_registry(self.cluster_id)
+        if state and is_being_reaped(state):
+            logger.info('Cluster {} is being destroyed, waiting for it.'.format(self.cluster_id))
+            state = poll(
+                lambda: read_cluster_registry(self.cluster_id),
+                lambda current: not current or not is_being_reaped(current), timeout=REAPING_TIMEOUT)
+        if not state:
+            return False
+        with locked_registry(self.cluster_id):
+            state = read_cluster_registry(self.cluster_id)
+            if not state:
+                return False
+            if is_being_reaped(state):
+                raise RuntimeError('Cluster {} is still being destroyed (by process {})'.format(
+                    self.cluster_id, state['reaper']))
+            if is_in_use(state):
+                raise RuntimeError('Cluster {} is in use by another session (process {})'.format(
+                    self.cluster_id, state['session']))
+            self.__registry.update(state['registry'])
+            if is_idle(state):
+                logger.info('Cluster {} has been idle for longer than its idle ttl, recreating it.'.format(
+                    self.cluster_id))
+                self.destroy()
+                return False
+            master_type, node_type = state['plan'][:2]
+            if (master_type, node_type) != (self.plan.master_type, self.plan.node_type):
+                logger.info('Cluster {} has {} and {} instances rather than {} and {}, recreating it.'.format(
+                    self.cluster_id, master_type, node_type, self.plan.master_type, self.plan.node_type))
+                self.destroy()
+                return False
+            master = self.__registry.get('cluster_master')
+            region = self.instance_properties.region
+            if not master or get_instances(region, [master['InstanceId']])[0]['State']['Name'] != 'running':
+                logger.info('Cluster {} is not running, recreating it.'.format(self.cluster_id))
+                self.destroy()
+                return False
+            logger.info('Attaching to cluster {}.'.format(self.cluster_id))
+            self.__save()  # the cluster is in use by this session until it is released
+        self.resize(self.plan.node_count)
+        return True
+
+    def release(self):
+        """releases the cluster, keeping it warm (for other managers to attach to) for the manager's idle ttl"""
+        with self.__registry_lock:
+            self.__idle_until = time.time() + (self.idle_ttl or 0)
+            self.__save()
+        self.__released = True
+
+    def claim(self, pid):
+        """
+        marks the (persisted) cluster as being destroyed by a process, so that no other reaper destroys it meanwhile
+        (unless the process stops, see is_being_reaped)
+        :param int pid: the id of the process destroying the cluster
+        """
+        with self.__registry_lock:
+            self.__reaper = pid
+            self.__save()
+
+    def destroy_in_background(self):
+        """
+        hands the (persisted) registry to a detached process that destroys the cluster, returning immediately.
+        the cluster is released with no idle time first, so that it is reaped later if the process fails,
+        and claimed by this process until the detached process claims it (see claim), so that it isn't reaped meanwhile.
+        the cluster is destroyed in this process if the detached process can't be started.
+        """
+        self.idle_ttl = 0
+        self.claim(os.getpid())
+        self.release()
+        log_name = '{}.log'.format(self.cluster_id)
+        if start_reaper(['--cluster-id', self.cluster_id], log_name) is None:
+            self.destroy()
+            return
+        logger.info('Destroying cluster {} in the background (see {}).'.format(self.cluster_id, log_name))
+        with self.__registry_lock:
+            self.__registry = {}
+
+    def resize(self, node_count):
+        """
+        resizes the cluster to a number of nodes, launching or terminating nodes
+        :type node_count: int
+        """
+        region = self.instance_properties.region
+        nodes = self.registry.get('cluster_nodes', [])
+        if nodes:
+            nodes = [
+                node for node in get_instances(region, [n['InstanceId'] for n in nodes])
+                if node['State']['Name'] in {'pending', 'running'}
+            ]
+        if len(nodes) < node_count:
+            nodes += self.__launch_nodes(node_count - len(nodes))
+        elif len(nodes) > node_count:
+            self.__terminate_instances([node['InstanceId'] for node in nodes[node_count:]])
+            nodes = nodes[:node_count]
+        self.__register('cluster_nodes', nodes)
 
     # noinspection PyBroadException
     def destroy(self):
@@ -125,7 +568,8 @@ class ClusterManager(object):
         self.__add_access_rules(node['GroupId'], access_cidrs, security_group_ids, NODE_SG_PORTS)
 
         cluster_security_groups = [master, node]
-        self.__registry['security_groups'] = cluster_security_groups
+        ec2_client(region).create_tags(Resources=[master['GroupId'], node['GroupId']], Tags=self.__get_tags('network'))
+        self.__register('security_groups', cluster_security_groups)
 
     def __add_access_rules(self, input_group_id, ip_addresses, extra_group_ids, ports):
         """adds required access rules to the security groups of the cluster"""
@@ -135,84 +579,80 @@ class ClusterManager(object):
         ec2_client(region).authorize_security_group_ingress(GroupId=input_group_id, IpPermissions=ingress_rules)
 
     def __create_master(self):
-        """creates the cluster's master node"""
+        """launches the cluster's master node (retrying while its new instance profile propagates)"""
         instance_name = 'spark-data-miner-master-{}-{}'.format(self.cluster_id, datetime.datetime.now().strftime('%s'))
-        tag_specs = [{'ResourceType': 'instance', 'Tags': [{'Key': 'Name', 'Value': instance_name}]}]
+        tags = [{'Key': 'Name', 'Value': instance_name}] + self.__get_tags('master')
+        tag_specs = [{'ResourceType': 'instance', 'Tags': tags}]
         region, vpc_id, subnet, security_groups, key_name, public_ip, private_ip, profile = self.instance_properties
 
         instance_profile = self.registry['instance_profile']
         security_group_ids = [sg['GroupId'] for sg in security_groups + self.registry['security_groups']]
-        instance = None
-        max_retrys = 5
-        while instance is None:
-            try:
-                instance = ec2_client(region).run_instances(
-                    ImageId=self.ami['ImageId'], SubnetId=subnet, InstanceType=self.plan.master_type, MaxCount=1,
-                    UserData=MASTER_USER_DATA, IamInstanceProfile={'Name': instance_profile['InstanceProfileName']},
-                    KeyName=key_name, SecurityGroupIds=security_group_ids, TagSpecifications=tag_specs, MinCount=1,
-                )['Instances'][0]
-            except ClientError:
-                if max_retrys <= 0:
-                    raise
-                max_retrys -= 1
-                time.sleep(10)
-        instance = wait_for_instance(region, instance)
-        self.__registry['cluster_master'] = instance
+
+        def run_master():
+            return ec2_client(region).run_instances(
+                ImageId=self.ami['ImageId'], SubnetId=subnet, InstanceType=self.plan.master_type, MaxCount=1,
+                UserData=MASTER_USER_DATA, IamInstanceProfile={'Name': instance_profile['InstanceProfileName']},
+                KeyName=key_name, SecurityGroupIds=security_group_ids, TagSpecifications=tag_specs, MinCount=1,
+            )['Instances'][0]
+
+        self.__register('cluster_master', retry(run_master, (ClientError, ), timeout=60))
+
+    def __wait_for_master(self):
+        """waits for the cluster's master node to be running"""
+        region = self.instance_properties.region
+        self.__register('cluster_master', wait_for_instance(region, self.registry['cluster_master']))
 
     def __create_nodes(self):
-        """creates the non-master cluster nodes"""
+        """launches the non-master cluster nodes (as soon as the master's address is known)"""
+        self.__register('cluster_nodes', self.__launch_nodes(self.plan.node_count))
+
+    def __launch_nodes(self, node_count):
+        """
+        launches nodes for the cluster
+        :type node_count: int
+        :rtype: list[dict]
+        """
         instance_name = 'spark-data-miner-node-{}-{}'.format(self.cluster_id, datetime.datetime.now().strftime('%s'))
-        tag_specs = [{'ResourceType': 'instance', 'Tags': [{'Key': 'Name', 'Value': instance_name}]}]
+        tags = [{'Key': 'Name', 'Value': instance_name}] + self.__get_tags('node')
+        tag_specs = [{'ResourceType': 'instance', 'Tags': tags}]
         region, vpc_id, subnet, security_groups, key_name, public_ip, private_ip, profile = self.instance_properties
         image = get_ami(region)
         instance_profile = self.registry['instance_profile']['Arn']
         security_group_ids = [sg['GroupId'] for sg in security_groups + self.registry['security_groups'][-1:]]
         master_host = self.registry['cluster_master']['PrivateIpAddress']
-        instances = ec2_client(region).run_instances(
+        return ec2_client(region).run_instances(
             ImageId=image['ImageId'], SubnetId=subnet, InstanceType=self.plan.node_type, KeyName=key_name,
-            MaxCount=self.plan.node_count, MinCount=self.plan.node_count, SecurityGroupIds=security_group_ids,
+            MaxCount=node_count, MinCount=node_count, SecurityGroupIds=security_group_ids,
             UserData=NODE_USER_DATA.format(master_address=master_host, spark_port=SPARK_PORT),
             IamInstanceProfile={'Arn': instance_profile}, TagSpecifications=tag_specs,
         )['Instances']
-        instance_ids = [instance['InstanceId'] for instance in instances]
-        retries = max(len(instances), 6)
-        while not all(instance['State']['Name'] == 'running' for instance in instances) and retries > 0:
-            retries -= 1
-            instances = ec2_client(region).describe_instances(
-                InstanceIds=instance_ids)['Reservations'][0]['Instances']
-            time.sleep(10)
-        self.__registry['cluster_nodes'] = instances
+
+    def __terminate_instances(self, instance_ids):
+        """terminates instances, waiting (with exponential backoff) for them to be terminated"""
+        region = self.instance_properties.region
+        poll(
+            lambda: ec2_client(region).terminate_instances(InstanceIds=instance_ids)['TerminatingInstances'],
+            lambda terminated: all(i['CurrentState']['Name'] == 'terminated' for i in terminated),
+            timeout=180)
 
     def __destroy_nodes(self):
         """destroys the non-master cluster nodes"""
-        region = self.instance_properties.region
         instance_ids = [i['InstanceId'] for i in self.registry['cluster_nodes']]
-        terminated = ec2_client(region).terminate_instances(InstanceIds=instance_ids)['TerminatingInstances']
-        max_retrys = 18
-        while any(i['CurrentState']['Name'] != 'terminated' for i in terminated) and max_retrys > 0:
-            time.sleep(10)
-            max_retrys -= 1
-            terminated = ec2_client(region).terminate_instances(InstanceIds=instance_ids)['TerminatingInstances']
-        del self.__registry['cluster_nodes']
+        if instance_ids:
+            self.__terminate_instances(instance_ids)
+        self.__unregister('cluster_nodes')
 
     def __destroy_master(self):
         """destroys the master cluster node"""
-        region = self.instance_properties.region
-        instance_id = self.registry['cluster_master']['InstanceId']
-        terminated = ec2_client(region).terminate_instances(InstanceIds=[instance_id])['TerminatingInstances']
-        max_retrys = 18
-        while any(i['CurrentState']['Name'] != 'terminated' for i in terminated) and max_retrys > 0:
-            time.sleep(10)
-            max_retrys -= 1
-            terminated = ec2_client(region).terminate_instances(InstanceIds=[instance_id])['TerminatingInstances']
-        del self.__registry['cluster_master']
+        self.__terminate_instances([self.registry['cluster_master']['InstanceId']])
+        self.__unregister('cluster_master')
 
     def __destroy_security_groups(self):
         """destroys the security groups"""
         region = self.instance_properties.region
         for group in self.__registry['security_groups'][::-1]:
             ec2_client(region).delete_security_group(GroupId=group['GroupId'])
-        del self.__registry['security_groups']
+        self.__unregister('security_groups')
 
     def __create_policies(self):
         """creates the iam policies for the spark_data_miner instances"""
@@ -221,7 +661,7 @@ class ClusterManager(object):
             policy_name = 'spark-data-miner-{}-{}-{}'.format(i, self.cluster_id, datetime.datetime.now().strftime('%s'))
             policy = iam_client().create_policy(PolicyName=policy_name, PolicyDocument=ujson.dumps(doc))
             policies.append(policy['Policy'])
-        self.__registry['policies'] = policies
+        self.__register('policies', policies)
 
     def __create_role(self):
         """creates the iam role for the spark data miner"""
@@ -230,7 +670,7 @@ class ClusterManager(object):
         resp = iam_client().create_role(RoleName=role_name, AssumeRolePolicyDocument=policy_document)
         for policy in self.registry['policies']:
             iam_client().attach_role_policy(RoleName=role_name, PolicyArn=policy['Arn'])
-        self.__registry['role'] = resp['Role']
+        self.__register('role', resp['Role'])
 
     def __create_instance_profile(self):
         """creates the instance profile for the spark data miner"""
@@ -239,7 +679,7 @@ class ClusterManager(object):
         profile_name = resp['InstanceProfile']['InstanceProfileName']
         role_name = self.registry['role']['RoleName']
         iam_client().add_role_to_instance_profile(InstanceProfileName=profile_name, RoleName=role_name)
-        self.__registry['instance_profile'] = resp['InstanceProfile']
+        self.__register('instance_profile', resp['InstanceProfile'])
 
     def __destroy_instance_profile(self):
         """destroys the instance profile for the spark data miner"""
@@ -252,7 +692,7 @@ class ClusterManager(object):
             logger.warning(
                 'could not detach role ({}) from instance_profile ({})'.format(role_name, profile_name))
         iam_client().delete_instance_profile(InstanceProfileName=profile_name)
-        del self.__registry['instance_profile']
+        self.__unregister('instance_profile')
 
     def __destroy_role(self):
         """destroys the role for the spark data miner"""
@@ -264,10 +704,10 @@ class ClusterManager(object):
             except Exception:
                 logger.warning('could not detach policy ({}) from role ({})'.format(policy['PolicyName'], role_name))
         iam_client().delete_role(RoleName=role_name)
-        del self.__registry['role']
+        self.__unregister('role')
 
     def __destroy_policies(self):
         """destroys the policies for the spark data miner"""
         for policy in self.__registry['policies']:
             iam_client().delete_policy(PolicyArn=policy['Arn'])
-        del self.__registry['policies']
+        self.__unregister('policies')
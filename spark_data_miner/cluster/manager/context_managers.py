@@ -2,29 +2,49 @@
 # -*- coding: utf-8 -*-
 from contextlib import contextmanager
 
-from spark_data_miner.cluster.manager.access import ClusterManager, ClusterPlan
+from spark_data_miner.cluster.manager.access import ClusterManager, ClusterPlan, reap_idle_clusters_in_background
 from spark_data_miner.cluster.manager.session import get_new_right_person_spark_session
+from spark_data_miner.cluster.manager.tuning import get_tuning_profile
 from spark_data_miner.cluster.ami.constants import NAME_FORMAT
-from spark_data_miner.cluster.ami.utils import ami_exists
+from spark_data_miner.cluster.ami.utils import ami_exists, get_ami, has_baked_jars, has_baked_package
 from spark_data_miner.cluster.utils import describe_ec2_properties_from_instance, add_package_to_spark, \
-    get_instance_memory
+    get_instance_memory, get_instance_vcpus, wait_for_workers, SHIPPED_PACKAGES
+
+
+MIN_WORKER_FRACTION = 0.8
 
 
 @contextmanager
-def spark_data_mining_session(plan):
+def spark_data_mining_session(plan, spark_overrides=None, min_worker_fraction=MIN_WORKER_FRACTION, worker_timeout=600,
+                              cluster_id=None, idle_ttl=None, background_teardown=False, fair_scheduling=False):
     """
-    creates a spark session to a temporary cluster
+    creates a spark session to a temporary cluster, tuned for the plan's instance types.
+    the session is yielded once a fraction of the workers have registered, the rest join as they come up.
+    jars and the package are only shipped to the cluster if its AMI doesn't have them (see ami.utils.create_ami).
     :type plan: ClusterPlan
+    :param dict spark_overrides: spark settings that replace those of the plan's tuning profile (e.g. for a job)
+    :param float min_worker_fraction: the fraction of the plan's nodes to wait for before yielding the session
+    :param float worker_timeout: the maximum time (seconds) to wait for the workers
+    :param str cluster_id: the id of a warm cluster to attach to (or create) rather than a temporary cluster
+    :param float idle_ttl: keep the cluster warm for this long (seconds) after the session, see ClusterManager
+    :param bool background_teardown: destroy the cluster in a detached process, rather than waiting for it
+    :param bool fair_scheduling: share the cluster between concurrent jobs fairly (see SparkDatasetMiner.create_dataset)
     """
     region = describe_ec2_properties_from_instance().region
     assert ami_exists(region), 'A valid AMI does not exist in this region ({})'.format(NAME_FORMAT.format('*'))
-    instance_memory = get_instance_memory(plan.node_type)
-    assert instance_memory >= 4, 'each spark node instance requires 4 GiB of memory'
-    with ClusterManager(plan=plan) as inventory:
+    tuning = get_tuning_profile(  # raises if the plan's nodes have too little memory for spark's executors
+        plan, get_instance_memory(plan.node_type), get_instance_vcpus(plan.node_type), spark_overrides)
+    reap_idle_clusters_in_background(exclude=[cluster_id] if cluster_id else [])
+    manager = ClusterManager(
+        plan=plan, cluster_id=cluster_id, idle_ttl=idle_ttl, background_teardown=background_teardown)
+    with manager as inventory:
         master_ip = inventory['cluster_master']['PrivateIpAddress']
-        useable_memory = int(round((instance_memory - 3) * 0.9, 0))  # TODO: parameterise
-        session = get_new_right_person_spark_session(master_ip, useable_memory)
-        add_package_to_spark(session, 'spark_data_miner')
+        image = get_ami(region)
+        session = get_new_right_person_spark_session(master_ip, tuning, has_baked_jars(image), fair_scheduling)
+        if not has_baked_package(image):
+            for package_name in SHIPPED_PACKAGES:
+                add_package_to_spark(session, package_name)
+        wait_for_workers(master_ip, plan.node_count, min_worker_fraction, worker_timeout)
         yield session
 
 
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Cluster planning from the volume of data to mine
+
+The planner measures the input still to be mined by some miners (days with a current dataset, see the miners'
+manifests, are skipped), and sizes a cluster to mine it within a target time using a throughput model:
+the input bytes mined per second by each executor core. The default throughput can be calibrated for a
+miner config with the local benchmark (see spark_data_miner.core.benchmark), and is adjusted to each instance type
+from its specs (see get_core_throughput).
+
+Usage:
+>>> plan = get_cluster_plan([miner_1, miner_2], target_seconds=3600, node_type='r5.4xlarge')
+>>> with spark_data_mining_session(plan) as session:
+...     miner_1.create_dataset(session)
+...     miner_2.create_dataset(session)
+"""
+from __future__ import unicode_literals, division
+
+import copy
+import datetime
+import logging
+import math
+import re
+
+from spark_data_miner.cluster.manager.access import ClusterPlan
+from spark_data_miner.cluster.manager.tuning import get_executor_layout
+from spark_data_miner.cluster.utils import get_instance_specs
+from spark_data_miner.core.utils import get_s3_prefix_size
+
+
+logger = logging.getLogger('spark_data_miner.cluster.manager.planning')
+
+
+CORE_THROUGHPUT = 2 * 1024 ** 2  # compressed input bytes mined per second by an executor core (with enough memory)
+CORE_MEMORY = 4  # GiB per vcpu below which mining spills to disk (and slows down in proportion)
+STARTUP_SECONDS = 300  # cluster bring-up and job scheduling, not spent mining
+
+
+def get_pending_input_size(miner):
+    """
+    gets the size (in bytes) of the input of the days a miner has still to build
+    :type miner: spark_data_miner.core.miner.SparkDatasetMiner
+    :rtype: int
+    """
+    if miner.run_date is None:  # the miner will run today (see SparkDatasetMiner.create_dataset)
+        miner = copy.copy(miner)
+        miner.run_date = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    return sum(
+        get_s3_prefix_size(miner.config.s3_bucket, miner._input_prefixes[date])
+        for date in miner._dates if not miner.dataset_exists(date)
+    )
+
+
+def get_node_cores(node_type):
+    """
+    gets the number of executor cores of a node (see tuning.get_executor_layout)
+    :type node_type: str
+    :rtype: int
+    """
+    executor_cores, node_executors = get_executor_layout(get_instance_specs(node_type).vcpus)
+    return executor_cores * node_executors
+
+
+def get_network_bandwidth(specs):
+    """
+    gets the sustained network bandwidth (bytes per second) of an instance type, from its network performance:
+    instances with bandwidth "up to" some Gigabits only sustain a share of it, in proportion to their vcpus
+    :type specs: spark_data_miner.cluster.utils.InstanceSpecs
+    :rtype: float|None
+    :returns: the bandwidth, or None if the network performance is unknown
+    """
+    match = re.match(r'(Up to )?(\d+(?:\.\d+)?) Gigabit', specs.network or '')
+    if not match:
+        return None
+    gigabits = float(match.group(2))
+    if match.group(1):
+        gigabits = min(gigabits, gigabits * specs.vcpus / 32)
+    return gigabits * 1000 ** 3 / 8
+
+
+def get_core_throughput(node_type, core_throughput=CORE_THROUGHPUT):
+    """
+    gets the input bytes mined per second by an executor core of an instance type: the calibrated throughput,
+    reduced for instance types with less than CORE_MEMORY per vcpu (e.g. compute optimized instances)
+    and bounded by the node's network bandwidth (the input is read from s3)
+    :type node_type: str
+    :param float core_throughput: the input bytes mined per second by an executor core with enough memory
+    :rtype: float
+    """
+    specs = get_instance_specs(node_type)
+    throughput = core_throughput * min(1.0, specs.memory / specs.vcpus / CORE_MEMORY)
+    bandwidth = get_network_bandwidth(specs)
+    if bandwidth:
+        throughput = min(throughput, bandwidth / get_node_cores(node_type))
+    return throughput
+
+
+def estimate_seconds(plan, input_size, core_throughput=CORE_THROUGHPUT):
+    """
+    estimates the time (seconds) a cluster plan takes to mine some input
+    :type plan: ClusterPlan
+    :param int input_size: the size (in bytes) of the input
+    :param float core_throughput: the input bytes mined per second by an executor core with enough memory
+    :rtype: float
+    """
+    node_throughput = get_core_throughput(plan.node_type, core_throughput) * get_node_cores(plan.node_type)
+    return STARTUP_SECONDS + input_size / (node_throughput * plan.node_count)
+
+
+def get_cluster_plan(miners, target_seconds=3600, master_type='r5.xlarge', node_type='r5.4xlarge',
+                     core_throughput=CORE_THROUGHPUT, min_nodes=1, max_nodes=100):
+    """
+    gets the plan of the smallest cluster mining the pending input of some miners within a target time
+    :param list[spark_data_miner.core.miner.SparkDatasetMiner] miners: the miners to run on the cluster
+    :param float target_seconds: the target time (seconds) to mine the input in, including cluster start up
+    :type master_type: str
+    :type node_type: str
+    :param float core_throughput: the input bytes mined per second by an executor core with enough memory
+        (see get_core_throughput)
+    :param int min_nodes: the minimum number of nodes of the cluster
+    :param int max_nodes: the maximum number of nodes of the cluster
+    :rtype: ClusterPlan
+    """
+    input_size = sum(get_pending_input_size(miner) for miner in miners)
+    mining_seconds = max(target_seconds - STARTUP_SECONDS, 1)
+    cores = input_size / (get_core_throughput(node_type, core_throughput) * mining_seconds)
+    node_count = int(math.ceil(cores / get_node_cores(node_type)))
+    node_count = min(max(node_count, min_nodes), max_nodes)
+
+    plan = ClusterPlan(master_type, node_type, node_count)
+    logger.info('Planned {} {} nodes to mine {:.1f} GiB in about {:.0f}s.'.format(
+        node_count, node_type, input_size / 1024 ** 3, estimate_seconds(plan, input_size, core_throughput)))
+    return plan
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Reaps (destroys) clusters that are no longer in use
+
+Clusters are destroyed from their persisted registry (see ClusterManager), e.g. by a detached process
+started by ClusterManager.destroy_in_background. Orphaned clusters (whose registry is lost, e.g. after a
+failed teardown) are found by the tags of their resources and destroyed resource by resource.
+Registries are only on the host that created their clusters, so only the clusters tagged with this host's
+owner id (see access.get_owner_id) are considered orphans: clusters driven from other hosts are never reaped.
+
+Usage:
+$ reap_spark_data_miner_clusters  # idle clusters and orphaned clusters older than 12 hours
+$ reap_spark_data_miner_clusters --idle  # idle clusters only (as started by spark_data_mining_session)
+$ reap_spark_data_miner_clusters --cluster-id 0b5b7a4e-...
+"""
+from __future__ import unicode_literals, division
+
+import argparse
+import datetime
+import logging
+import os
+import re
+import sys
+
+from spark_data_miner.cluster.components.ec2.utils import ec2_client
+from spark_data_miner.cluster.components.iam.utils import iam_client
+from spark_data_miner.cluster.components.waiters import poll
+from spark_data_miner.cluster.manager.access import ClusterManager, CLUSTER_TAG, OWNER_TAG, list_cluster_ids, \
+    reap_idle_clusters, get_owner_id, read_cluster_registry, is_being_reaped
+from spark_data_miner.cluster.utils import describe_ec2_properties_from_instance
+
+
+logger = logging.getLogger('spark_data_miner.cluster.manager.reaper')
+
+
+LIVE_INSTANCE_STATES = ['pending', 'running', 'stopping', 'stopped']
+
+
+def get_tagged_instances(region, owner):
+    """
+    gets the live instances of every cluster of an owner, by cluster id
+    :type region: str
+    :param str owner: the id of the owner of the clusters (see access.get_owner_id)
+    :rtype: dict[str, list[dict]]
+    """
+    filters = [
+        {'Name': 'tag-key', 'Values': [CLUSTER_TAG]},
+        {'Name': 'tag:{}'.format(OWNER_TAG), 'Values': [owner]},
+        {'Name': 'instance-state-name', 'Values': LIVE_INSTANCE_STATES},
+    ]
+    instances = {}
+    for page in ec2_client(region).get_paginator('describe_instances').paginate(Filters=filters):
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                cluster_id = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}[CLUSTER_TAG]
+                instances.setdefault(cluster_id, []).append(instance)
+    return instances
+
+
+def get_orphaned_clusters(region, min_age):
+    """
+    gets the ids of this host's clusters (see access.get_owner_id) with live instances but no registry,
+    launched over min_age ago
+    :type region: str
+    :param float min_age: the minimum age (hours) of the clusters
+    :rtype: list[str]
+    """
+    known_clusters = set(list_cluster_ids())
+    oldest_launch = datetime.datetime.utcnow() - datetime.timedelta(hours=min_age)
+    orphans = []
+    for cluster_id, instances in get_tagged_instances(region, get_owner_id()).items():
+        launched = min(instance['LaunchTime'].replace(tzinfo=None) for instance in instances)
+        if cluster_id not in known_clusters and launched < oldest_launch:
+            orphans.append(cluster_id)
+    return sorted(orphans)
+
+
+def get_iam_name_pattern(cluster_id, policy=False):
+    """
+    gets a pattern matching the exact names of a cluster's iam resources (see ClusterManager), e.g.
+    spark-data-miner-<cluster id>-<timestamp> for its instance profile and role
+    :type cluster_id: str
+    :param bool policy: match the names of its policies (spark-data-miner-<index>-<cluster id>-<timestamp>)
+    :rtype: typing.Pattern
+    """
+    return re.compile(r'^spark-data-miner-{}{}-\d+$'.format(r'\d+-' if policy else '', re.escape(cluster_id)))
+
+
+def destroy_tagged_cluster(region, cluster_id):
+    """
+    destroys the resources of one of this host's clusters found by their tags (instances and security groups),
+    e.g. when its registry is lost. its iam resources are found from its instances' instance profiles
+    (and the profiles' roles and policies), and only destroyed if their names are the cluster's
+    :type region: str
+    :type cluster_id: str
+    """
+    client = ec2_client(region)
+    instances = get_tagged_instances(region, get_owner_id()).get(cluster_id, [])
+    profile_names = {
+        instance['IamInstanceProfile']['Arn'].split('/')[-1]
+        for instance in instances if 'IamInstanceProfile' in instance
+    }
+    instance_ids = [i['InstanceId'] for i in instances]
+    if instance_ids:
+        poll(
+            lambda: client.terminate_instances(InstanceIds=instance_ids)['TerminatingInstances'],
+            lambda terminated: all(i['CurrentState']['Name'] == 'terminated' for i in terminated),
+            timeout=300)
+
+    filters = [
+        {'Name': 'tag:{}'.format(CLUSTER_TAG), 'Values': [cluster_id]},
+        {'Name': 'tag:{}'.format(OWNER_TAG), 'Values': [get_owner_id()]},
+    ]
+    for group in client.describe_security_groups(Filters=filters)['SecurityGroups']:
+        client.delete_security_group(GroupId=group['GroupId'])
+
+    iam = iam_client()
+    name_pattern, policy_pattern = get_iam_name_pattern(cluster_id), get_iam_name_pattern(cluster_id, policy=True)
+    for profile_name in profile_names:
+        if not name_pattern.match(profile_name):
+            continue
+        profile = iam.get_instance_profile(InstanceProfileName=profile_name)['InstanceProfile']
+        for role in profile['Roles']:
+            iam.remove_role_from_instance_profile(InstanceProfileName=profile_name, RoleName=role['RoleName'])
+        iam.delete_instance_profile(InstanceProfileName=profile_name)
+        for role in profile['Roles']:
+            if not name_pattern.match(role['RoleName']):
+                continue
+            for policy in iam.list_attached_role_policies(RoleName=role['RoleName'])['AttachedPolicies']:
+                iam.detach_role_policy(RoleName=role['RoleName'], PolicyArn=policy['PolicyArn'])
+                if policy_pattern.match(policy['PolicyName']):
+                    iam.delete_policy(PolicyArn=policy['PolicyArn'])
+            iam.delete_role(RoleName=role['RoleName'])
+
+
+def main():
+    """destroys a cluster (from its registry), or the idle and orphaned clusters"""
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO, format='%(asctime)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Destroy spark data miner clusters that are no longer in use')
+    parser.add_argument('--cluster-id', default=None, help='destroy this cluster (from its registry) only')
+    parser.add_argument('--idle', action='store_true', help='destroy idle clusters only, not orphaned clusters')
+    parser.add_argument('--exclude', action='append', default=[], help='the id of a cluster not to destroy')
+    parser.add_argument('--min-age', type=float, default=12,
+                        help='the minimum age (hours) of orphaned clusters (without a registry) to destroy')
+    parser.add_argument('--region', default=None, help='the region of the clusters (default: this instance\'s)')
+    args = parser.parse_args()
+
+    if args.cluster_id:
+        state = read_cluster_registry(args.cluster_id)
+        if state and state.get('reaper') != os.getppid() and is_being_reaped(state):
+            logger.info('Cluster {} is being destroyed by process {}.'.format(args.cluster_id, state['reaper']))
+            return
+        logger.info('Destroying cluster {}.'.format(args.cluster_id))
+        manager = ClusterManager.from_registry(args.cluster_id)
+        manager.claim(os.getpid())
+        manager.destroy()
+        return
+
+    reap_idle_clusters(exclude=args.exclude)
+    if args.idle:
+        return
+    region = args.region or describe_ec2_properties_from_instance().region
+    for cluster_id in get_orphaned_clusters(region, args.min_age):
+        if cluster_id in args.exclude:
+            continue
+        logger.info('Destroying orphaned cluster {}.'.format(cluster_id))
+        destroy_tagged_cluster(region, cluster_id)
+
+
+if __name__ == '__main__':
+    main()
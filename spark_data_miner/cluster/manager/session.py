@@ -3,74 +3,118 @@
 """
 Creates a session to interface with a spark cluster as an independent driver.
 Usage:
->>> session = get_new_right_person_spark_session('127.0.0.1')
+>>> session = get_new_right_person_spark_session('127.0.0.1', tuning={'spark.executor.memory': '4g'})
 >>> # do session things...
 >>> session.stop()
+
+Sessions can also run locally (on all the cores of this machine), e.g. for development and benchmarks:
+>>> session = get_local_spark_session()
 """
 from __future__ import unicode_literals
 
 import logging
+import os
 
+import pyspark
 from pyspark import SparkConf
 from pyspark import SparkContext
 from pyspark.sql import SparkSession
 
+from spark_data_miner.cluster.ami.constants import S3A_JARS, SPARK_DIRECTORY
+from spark_data_miner.cluster.ami.utils import get_jar_file_name
 from spark_data_miner.cluster.components.ec2.constants import BLOCK_MANAGER_PORT, TASK_SCHEDULER_PORT, SPARK_PORT
 
-_config = None
-
 
 logger = logging.getLogger('right_person.data_mining.cluster.session')
 
 
-def _get_right_person_spark_config(master_ip, instance_memory):
+def _get_local_s3a_jars():
+    """
+    gets the paths of local copies of the s3a jars (from pyspark or a spark installation, e.g. on an AMI) if any
+    :rtype: list[str]
+    """
+    jar_directories = [os.path.join(os.path.dirname(pyspark.__file__), 'jars'), os.path.join(SPARK_DIRECTORY, 'jars')]
+    for jar_directory in jar_directories:
+        jars = [os.path.join(jar_directory, get_jar_file_name(jar)) for jar in S3A_JARS]
+        if all(os.path.isfile(jar) for jar in jars):
+            return jars
+    return []
+
+
+def _get_right_person_spark_config(master_ip, tuning, baked_jars=False, fair_scheduling=False):
     """
     Creates a config for the right_person spark cluster
     Contains specific cluster parameters including extra jars
     to access s3 resources and ports to communicate with.
-    The config is a singleton and won't be recreated once set.
+    A new config is created for every session, so that every session can be tuned (e.g. for a cluster plan).
+    The s3a jars are only resolved from maven if the cluster's AMI or this machine doesn't have them.
 
     :param str master_ip: the ip of the clusters master node
-    :param int instance_memory: the memory of the executor instances
+    :param dict[str, str] tuning: the spark settings tuning the cluster (see tuning.get_tuning_profile)
+    :param bool baked_jars: whether the cluster's AMI has the s3a jars on the spark classpath
+    :param bool fair_scheduling: share the cluster between concurrent jobs (e.g. days built concurrently) fairly
     :rtype: pyspark.SparkConf
     """
-    global _config
-    if not _config:
-        _config = SparkConf().setAppName('spark-data-miner')
-        _config.setMaster('spark://{}:{}'.format(master_ip, SPARK_PORT))
-        _config.set('spark.jars.packages', 'org.apache.hadoop:hadoop-aws:2.7.5,com.amazonaws:aws-java-sdk:1.7.4')
-        _config.get("spark.rpc.message.maxSize", "256")
-        _config.set('spark.rdd.compress', 'True')
+    config = SparkConf().setAppName('spark-data-miner')
+    config.setMaster('spark://{}:{}'.format(master_ip, SPARK_PORT))
+    local_jars = _get_local_s3a_jars() if baked_jars else []
+    if local_jars:
+        config.set('spark.driver.extraClassPath', ':'.join(local_jars))
+    else:
+        config.set('spark.jars.packages', ','.join(S3A_JARS))
+    config.set('spark.rpc.message.maxSize', '256')
+    config.set('spark.rdd.compress', 'True')
+    if fair_scheduling:
+        config.set('spark.scheduler.mode', 'FAIR')
 
-        _config.set('spark.blockManager.port', str(BLOCK_MANAGER_PORT))
-        _config.set('spark.driver.port', str(TASK_SCHEDULER_PORT))
-        _config.set('spark.executor.memory', str(instance_memory) + 'g')
+    config.set('spark.blockManager.port', str(BLOCK_MANAGER_PORT))
+    config.set('spark.driver.port', str(TASK_SCHEDULER_PORT))
 
-        _config.set('spark.driver.maxResultSize', '1536m')
+    config.set('spark.driver.maxResultSize', '1536m')
 
-        _config.set("spark.hadoop.fs.s3a.impl", "org.apache.hadoop.fs.s3a.S3AFileSystem")
-        _config.set("spark.hadoop.mapred.output.compress", "true")
-        _config.set("spark.hadoop.mapred.output.compression.codec", "org.apache.hadoop.io.compress.GzipCodec")
-        _config.set("spark.hadoop.mapred.output.compress.type", "BLOCK")
-        _config.set("spark.hadoop.mapreduce.fileoutputcommitter.algorithm.version", "2")
-    return _config
+    config.set("spark.hadoop.fs.s3a.impl", "org.apache.hadoop.fs.s3a.S3AFileSystem")
+    config.set("spark.hadoop.mapreduce.fileoutputcommitter.algorithm.version", "2")
 
+    config.setAll(list(tuning.items()))
+    return config
 
-def get_new_right_person_spark_session(master_ip, instance_memory):
+
+def get_new_right_person_spark_session(master_ip, tuning, baked_jars=False, fair_scheduling=False):
     """
     Create a session to communicate with the right_person spark cluster.
 
     :param str master_ip: the ip of the clusters master node
-    :param int instance_memory: the memory of the executor instances
+    :param dict[str, str] tuning: the spark settings tuning the cluster (see tuning.get_tuning_profile)
+    :param bool baked_jars: whether the cluster's AMI has the s3a jars on the spark classpath
+    :param bool fair_scheduling: share the cluster between concurrent jobs fairly, rather than first in first out
     :rtype: pyspark.SparkSession
     """
-
+    config = _get_right_person_spark_config(master_ip, tuning, baked_jars, fair_scheduling)
     try:
-        spark_context = SparkContext(conf=_get_right_person_spark_config(master_ip, instance_memory))
+        spark_context = SparkContext(conf=config)
     except (Exception, ):  # stop any existing contexts, we don't want them...
         logger.info('A spark context exists already on this machine.')
         SparkContext.getOrCreate().stop()
-        spark_context = SparkContext(conf=_get_right_person_spark_config(master_ip, instance_memory))
+        spark_context = SparkContext(conf=config)
 
     spark_session = SparkSession(spark_context)
     return spark_session
+
+
+def get_local_spark_session(cores='*', driver_memory='4g', fair_scheduling=False):
+    """
+    Create a session that runs spark locally, configured like the right_person spark cluster.
+    No cluster (or s3 access) is required, see spark_data_miner.core.utils.set_local_root
+
+    :param str|int cores: the number of cores to use ("*" for all cores)
+    :param str driver_memory: the memory of the local driver (which runs the executors)
+    :param bool fair_scheduling: share the cores between concurrent jobs fairly, rather than first in first out
+    :rtype: pyspark.SparkSession
+    """
+    config = SparkConf().setAppName('spark-data-miner-local').setMaster('local[{}]'.format(cores))
+    config.set('spark.driver.memory', driver_memory)
+    config.set('spark.rdd.compress', 'True')
+    if fair_scheduling:
+        config.set('spark.scheduler.mode', 'FAIR')
+
+    return SparkSession(SparkContext.getOrCreate(conf=config))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Spark tuning profiles for a cluster plan
+
+The profile sizes executors to the instance type of the nodes: each node runs as many executors
+(of a few cores each) as its cores allow, rather than one executor using all of the node's memory,
+and the memory of each executor is split between the JVM heap and its python workers.
+
+The cluster runs spark's standalone scheduler, which only honours spark.cores.max, spark.executor.cores and
+spark.executor.memory (the heap) to place executors. It doesn't reserve memory outside of the heap, so the rest of an
+executor's share of the node is simply left unallocated, for the JVM's overhead and the executor's python workers.
+
+Usage:
+>>> plan = ClusterPlan('r5.xlarge', 'r5.4xlarge', 10)
+>>> get_tuning_profile(plan, instance_memory=128, instance_vcpus=16, overrides={'spark.sql.shuffle.partitions': 2000})
+"""
+from __future__ import unicode_literals, division
+
+
+RESERVED_MEMORY = 3  # GiB for the OS and the spark worker daemon
+RESERVED_CORES = 1
+EXECUTOR_CORES = 5
+MEMORY_OVERHEAD_FRACTION = 0.1
+MIN_MEMORY_OVERHEAD = 384  # MiB
+MIN_HEAP_MEMORY = 512  # MiB, spark executors need at least 450 MiB
+PYTHON_MEMORY_FRACTION = 0.25
+TASKS_PER_CORE = 2
+
+
+def get_executor_layout(instance_vcpus):
+    """
+    gets the number of cores of each executor and the number of executors of each node
+    :type instance_vcpus: int
+    :rtype: tuple[int, int]
+    """
+    node_cores = max(1, instance_vcpus - RESERVED_CORES)
+    executor_cores = min(EXECUTOR_CORES, node_cores)
+    return executor_cores, node_cores // executor_cores
+
+
+def get_executor_memory(instance_memory, node_executors):
+    """
+    gets how the memory of each executor of a node is split
+    :param int instance_memory: the memory (GiB) of a node
+    :param int node_executors: the number of executors of the node
+    :rtype: tuple[int, int, int]
+    :returns: the heap, JVM overhead and python worker memory (MiB)
+    """
+    executor_memory = int((instance_memory - RESERVED_MEMORY) * 1024 / node_executors)
+    memory_overhead = max(MIN_MEMORY_OVERHEAD, int(executor_memory * MEMORY_OVERHEAD_FRACTION))
+    python_memory = int(executor_memory * PYTHON_MEMORY_FRACTION)
+    return executor_memory - memory_overhead - python_memory, memory_overhead, python_memory
+
+
+def get_tuning_profile(plan, instance_memory, instance_vcpus, overrides=None):
+    """
+    gets the spark settings to run a cluster plan's nodes at full use.
+    nodes with little memory per core run fewer, larger executors, so that each executor's heap is large enough
+    :type plan: spark_data_miner.cluster.manager.access.ClusterPlan
+    :param int instance_memory: the memory (GiB) of a node
+    :param int instance_vcpus: the number of cores of a node
+    :param dict overrides: spark settings that replace those of the profile (e.g. for a particular job)
+    :rtype: dict[str, str]
+    """
+    executor_cores, node_executors = get_executor_layout(instance_vcpus)
+    node_cores = executor_cores * node_executors
+    while node_executors > 1 and get_executor_memory(instance_memory, node_executors)[0] < MIN_HEAP_MEMORY:
+        node_executors -= 1
+    executor_cores = node_cores // node_executors
+    cores = executor_cores * node_executors * plan.node_count
+
+    heap_memory, memory_overhead, python_memory = get_executor_memory(instance_memory, node_executors)
+    if heap_memory < MIN_HEAP_MEMORY:
+        raise ValueError(
+            '{} nodes ({} GiB) leave {} MiB of heap to their executors, at least {} MiB are required'.format(
+                plan.node_type, instance_memory, heap_memory, MIN_HEAP_MEMORY))
+
+    profile = {
+        'spark.executor.cores': executor_cores,
+        'spark.cores.max': cores,
+        'spark.executor.memory': '{}m'.format(heap_memory),
+        'spark.python.worker.memory': '{}m'.format(python_memory // executor_cores),
+        'spark.python.worker.reuse': 'true',
+        'spark.default.parallelism': cores * TASKS_PER_CORE,
+        'spark.sql.shuffle.partitions': cores * TASKS_PER_CORE,
+        'spark.serializer': 'org.apache.spark.serializer.KryoSerializer',
+    }
+    profile.update(overrides or {})
+    return {key: str(value) for key, value in profile.items()}
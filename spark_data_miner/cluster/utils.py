@@ -1,49 +1,191 @@
+import hashlib
+import importlib
+import json
+import logging
+import math
 import os
-import shutil
-import sys
 import tempfile
+import time
 import ujson
+import zipfile
 from collections import namedtuple
 
-import boto3
+import pkg_resources
 import requests
 
+from spark_data_miner.cluster.ami.constants import PACKAGE_NAME
+from spark_data_miner.cluster.components.ec2.constants import INSTANCE_TYPES, INSTANCE_CATALOG_CACHE, WEB_UI_PORT
 from spark_data_miner.cluster.components.ec2.utils import ec2_client
+from spark_data_miner.cluster.components.waiters import poll
+from spark_data_miner.core.utils import get_aws_client
+
+
+logger = logging.getLogger('spark_data_miner.cluster.utils')
+
+
+PACKAGE_CACHE_DIRECTORY = '~/.spark_data_miner/packages'
+PACKAGE_CACHE_SIZE = 10  # archives, the least recently used are evicted
+PACKAGE_TEMPORARY_TTL = 3600  # seconds after which an archive being written is considered abandoned
+# the packages executors import (shipped unless baked into the AMI), e.g. the right_person vectorizers
+SHIPPED_PACKAGES = ('spark_data_miner', 'right_person')
 
 
 EC2Properties = namedtuple(
     'EC2Properties', 'region vpc_id subnet_id security_groups key_name public_ip private_ip profile')
 
+InstanceSpecs = namedtuple('InstanceSpecs', 'instance_type memory vcpus network nvme')
+
+
+def get_package_location(package_name):
+    """
+    gets the directory of an (importable) package
+    :type package_name: str
+    :rtype: str
+    """
+    return os.path.dirname(os.path.abspath(importlib.import_module(package_name).__file__))
+
+
+def get_package_files(package_location):
+    """
+    gets the python files of a package (with their paths relative to the package's parent directory)
+    :param str package_location: the directory of the package
+    :rtype: list[tuple[str, str]]
+    """
+    parent = os.path.dirname(os.path.abspath(package_location))
+    files = []
+    for directory, directory_names, file_names in os.walk(package_location):
+        directory_names[:] = sorted(name for name in directory_names if name != '__pycache__')
+        for file_name in sorted(file_names):
+            if file_name.endswith('.py'):
+                path = os.path.join(directory, file_name)
+                files.append((path, os.path.relpath(path, parent)))
+    return files
+
+
+def get_package_hash(package_files):
+    """
+    gets a hash of the contents (and paths) of a package's files
+    :param list[tuple[str, str]] package_files: see get_package_files
+    :rtype: str
+    """
+    package_hash = hashlib.sha1()
+    for path, relative_path in package_files:
+        package_hash.update(relative_path.encode('utf-8'))
+        with open(path, 'rb') as f:
+            package_hash.update(f.read())
+    return package_hash.hexdigest()
+
+
+def evict_package_archives(cache_directory, cache_size=PACKAGE_CACHE_SIZE):
+    """
+    removes the least recently used package archives from a cache, keeping cache_size archives,
+    and the temporary files of archives that were abandoned while being written (e.g. by a killed session)
+    :type cache_directory: str
+    :type cache_size: int
+    """
+    names = os.listdir(cache_directory)
+    archives = [os.path.join(cache_directory, name) for name in names if name.endswith('.zip')]
+    for archive in sorted(archives, key=os.path.getmtime, reverse=True)[cache_size:]:
+        os.remove(archive)
+    for temporary_archive in [os.path.join(cache_directory, name) for name in names if name.endswith('.tmp')]:
+        try:
+            if os.path.getmtime(temporary_archive) < time.time() - PACKAGE_TEMPORARY_TTL:
+                os.remove(temporary_archive)
+        except OSError:  # renamed (or removed) by its writer meanwhile
+            pass
+
+
+def get_package_archive(package_name):
+    """
+    gets a zip archive of a package's python files, from a cache keyed by the hash of the files
+    (the archive is only built if the package has changed since it was last archived)
+    :param str package_name: a python imported package name
+    :rtype: str
+    """
+    cache_directory = os.path.expanduser(PACKAGE_CACHE_DIRECTORY)
+    if not os.path.isdir(cache_directory):
+        os.makedirs(cache_directory)
+
+    package_files = get_package_files(get_package_location(package_name))
+    archive = os.path.join(cache_directory, '{}-{}.zip'.format(package_name, get_package_hash(package_files)))
 
-def add_package_to_spark(session, package_name):  # todo: refocus around the class rather than the function
+    if os.path.isfile(archive):
+        os.utime(archive, None)
+    else:
+        handle, temporary_archive = tempfile.mkstemp(suffix='.tmp', dir=cache_directory)
+        os.close(handle)
+        try:
+            with zipfile.ZipFile(temporary_archive, 'w', zipfile.ZIP_DEFLATED) as f:
+                for path, relative_path in package_files:
+                    f.write(path, relative_path)
+            os.rename(temporary_archive, archive)
+        except Exception:
+            os.remove(temporary_archive)
+            raise
+        evict_package_archives(cache_directory)
+    return archive
+
+
+def add_package_to_spark(session, package_name):
     """
     adds a python package to the spark context by package import
     :type session: pyspark.SparkSession
     :param package_name: a python imported package name
     """
-    tar_name = os.path.join(tempfile.mkdtemp(), package_name)  # todo: clean up after process exit
-    package_location = os.path.abspath(os.path.join(os.path.dirname(sys.modules[package_name].__file__), os.pardir))
-    package_tar = shutil.make_archive(tar_name, 'zip', package_location)
-    session.sparkContext.addPyFile(package_tar)
+    session.sparkContext.addPyFile(get_package_archive(package_name))
+
+
+def get_package_version():
+    """
+    Gets the installed version of the package (None if it isn't installed, or is run from source:
+    from a checkout or an editable install, whose files may differ from the released version's)
+    :rtype: str|None
+    """
+    try:
+        distribution = pkg_resources.get_distribution(PACKAGE_NAME)
+    except pkg_resources.DistributionNotFound:
+        return None
+    if distribution.precedence == pkg_resources.DEVELOP_DIST:  # setup.py develop (or pip install -e) installs
+        return None
+    if distribution.has_metadata('direct_url.json'):  # pep 660 editable installs
+        direct_url = json.loads(distribution.get_metadata('direct_url.json'))
+        if direct_url.get('dir_info', {}).get('editable'):
+            return None
+    installed_location = os.path.abspath(distribution.location)
+    if any(os.path.dirname(get_package_location(name)) != installed_location for name in SHIPPED_PACKAGES):
+        return None
+    return distribution.version
+
+
+def get_installed_package_hash():
+    """
+    Gets the hash of the files of the packages executors import (see SHIPPED_PACKAGES), as they would be shipped
+    :rtype: str
+    """
+    package_files = []
+    for package_name in SHIPPED_PACKAGES:
+        package_files.extend(get_package_files(get_package_location(package_name)))
+    return get_package_hash(package_files)
 
 
 def describe_ec2_properties_from_instance():
     properties = [
         'VpcId', 'SubnetId', 'SecurityGroups', 'KeyName', 'PublicIpAddress', 'PrivateIpAddress', 'IamInstanceProfile']
-    instance_id = requests.get('http://169.254.169.254/latest/meta-data/instance-id').text
-    region = requests.get("http://169.254.169.254/latest/dynamic/instance-identity/document").json()['region']
+    instance_id = requests.get('http://169.254.169.254/latest/meta-data/instance-id', timeout=5).text
+    region = requests.get(
+        "http://169.254.169.254/latest/dynamic/instance-identity/document", timeout=5).json()['region']
     resp = ec2_client(region).describe_instances(InstanceIds=[instance_id])
     details = resp['Reservations'][0]['Instances'][0]
     return EC2Properties(*[region] + [details[prop] for prop in properties])
 
 
-def get_instance_memory(instance_type):
+def _get_instance_attributes(instance_type):
     """
-    Gets the maximum instance memory for a given instance_type
+    Gets the attributes (memory, vcpu, ...) of a given instance_type from the pricing api
     :param str instance_type: e.g. r5.2xlarge
-    :rtype: int
+    :rtype: dict[str, str]
     """
-    client = boto3.client('pricing', region_name='us-east-1')  # only available in us-east-1 and ap-northeast-1
+    client = get_aws_client('pricing', 'us-east-1')  # only available in us-east-1 and ap-northeast-1
     filters = {
         'instanceType': instance_type,
         'operatingSystem': 'Linux',
@@ -52,4 +194,115 @@ def get_instance_memory(instance_type):
     }
     filter_args = [{'Type': 'TERM_MATCH', 'Field': x, 'Value': y} for x, y in filters.items()]
     instance = ujson.loads(client.get_products(ServiceCode='AmazonEC2', Filters=filter_args)['PriceList'][0])['product']
-    return int(instance['attributes']['memory'].replace(' GiB', ''))
+    return instance['attributes']
+
+
+def _get_nvme_storage(storage):
+    """
+    Gets the local NVMe storage (GB) from a pricing api storage description, e.g. "2 x 300 NVMe SSD"
+    :type storage: str
+    :rtype: int
+    """
+    if 'NVMe' not in storage:
+        return 0
+    disks, size = storage.split(' NVMe')[0].split(' x ')
+    return int(disks) * int(size.replace(',', ''))
+
+
+def _read_instance_catalog_cache():
+    """reads the instance types cached from the pricing api"""
+    path = os.path.expanduser(INSTANCE_CATALOG_CACHE)
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as f:
+        return ujson.load(f)
+
+
+def _write_instance_catalog_cache(cached_types):
+    """writes the instance types cached from the pricing api"""
+    path = os.path.expanduser(INSTANCE_CATALOG_CACHE)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as f:
+        ujson.dump(cached_types, f)
+
+
+def get_instance_specs(instance_type, refresh=False):
+    """
+    Gets the specs (memory, vcpus, network and local NVMe storage) of a given instance_type.
+    Specs come from the bundled catalog (INSTANCE_TYPES), or else from the disk cache of the pricing api;
+    the pricing api is only called (and its specs cached) for unknown instance types or to refresh the cache.
+    :param str instance_type: e.g. r5.2xlarge
+    :param bool refresh: get the specs from the pricing api (updating the cache)
+    :rtype: InstanceSpecs
+    """
+    if not refresh and instance_type in INSTANCE_TYPES:
+        return InstanceSpecs(instance_type, **INSTANCE_TYPES[instance_type])
+
+    cached_types = _read_instance_catalog_cache()
+    if refresh or instance_type not in cached_types:
+        attributes = _get_instance_attributes(instance_type)
+        cached_types[instance_type] = {
+            'memory': float(attributes['memory'].replace(' GiB', '').replace(',', '')),
+            'vcpus': int(attributes['vcpu']),
+            'network': attributes.get('networkPerformance'),
+            'nvme': _get_nvme_storage(attributes.get('storage', '')),
+        }
+        _write_instance_catalog_cache(cached_types)
+    return InstanceSpecs(instance_type, **cached_types[instance_type])
+
+
+def get_instance_memory(instance_type):
+    """
+    Gets the maximum instance memory for a given instance_type
+    :param str instance_type: e.g. r5.2xlarge
+    :rtype: int
+    """
+    return int(get_instance_specs(instance_type).memory)
+
+
+def get_instance_vcpus(instance_type):
+    """
+    Gets the number of virtual cpus for a given instance_type
+    :param str instance_type: e.g. r5.2xlarge
+    :rtype: int
+    """
+    return get_instance_specs(instance_type).vcpus
+
+
+def get_alive_workers(master_ip):
+    """
+    Gets the number of workers registered (and alive) with a spark master, from the master's status endpoint
+    (0 if the master isn't up yet)
+    :param str master_ip: the ip of the clusters master node
+    :rtype: int
+    """
+    try:
+        status = requests.get('http://{}:{}/json/'.format(master_ip, WEB_UI_PORT), timeout=5).json()
+    except (requests.RequestException, ValueError):
+        return 0
+    return sum(worker.get('state') == 'ALIVE' for worker in status.get('workers', []))
+
+
+def wait_for_workers(master_ip, worker_count, fraction=1.0, timeout=600):
+    """
+    Waits for (a fraction of) the workers of a cluster to register with the spark master.
+    The remaining workers join the cluster (and running jobs) as they register.
+    :param str master_ip: the ip of the clusters master node
+    :param int worker_count: the number of workers in the cluster
+    :param float fraction: the fraction of the workers to wait for
+    :param float timeout: the maximum time (seconds) to wait for
+    :rtype: int
+    :returns: the number of workers registered
+    """
+    required = max(1, int(math.ceil(worker_count * fraction)))
+
+    def is_ready(alive_workers):
+        logger.info('Waiting for workers ({}/{} registered, {} required).'.format(
+            alive_workers, worker_count, required))
+        return alive_workers >= required
+
+    alive_workers = poll(lambda: get_alive_workers(master_ip), is_ready, timeout, max_delay=10)
+    if alive_workers < required:
+        logger.warning('Only {}/{} workers registered after {}s.'.format(alive_workers, worker_count, timeout))
+    return alive_workers
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Local miner harness and benchmark
+
+Generates synthetic auction logs in a local directory (in place of s3), mines them with a local spark session
+and reports the throughput of each stage of the miner. No cluster or AWS access is required.
+
+Usage:
+$ benchmark_spark_data_miner --users 10000 --rows 1000000 --cardinalities 1000 100 10
+"""
+from __future__ import unicode_literals, print_function
+
+import argparse
+import datetime
+import gzip
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+from spark_data_miner.cluster.manager.session import get_local_spark_session
+from spark_data_miner.core.config import MinerConfig, MinerField
+from spark_data_miner.core.miner import SparkDatasetMiner
+from spark_data_miner.core.sources import get_input_source
+from spark_data_miner.core.utils import set_local_root, get_s3_prefix_size
+
+
+logger = logging.getLogger('spark_data_miner.core.benchmark')
+
+
+BENCHMARK_BUCKET = 'auctions'
+BENCHMARK_PREFIX = 'auctions/%Y-%m-%d/'
+BENCHMARK_OUTPUT_BUCKET = 'mined'
+
+
+def get_synthetic_config(cardinalities, delimiter=','):
+    """
+    gets a miner config for synthetic auction logs (alternating counter and set fields)
+    :param list[int] cardinalities: the number of distinct values of each field
+    :type delimiter: str
+    :rtype: MinerConfig
+    """
+    fields = [
+        MinerField('field_{}'.format(i), i + 1, 'str', 'dict' if i % 2 == 0 else 'set')
+        for i in range(len(cardinalities))
+    ]
+    return MinerConfig('benchmark', delimiter, fields, 0, False, BENCHMARK_BUCKET, BENCHMARK_PREFIX)
+
+
+def generate_auction_logs(path, users, rows, cardinalities, files=1, delimiter=',', seed=0):
+    """
+    writes synthetic auction logs as gzipped delimited files: a user id followed by a value for each field.
+    users are skewed, so that a few users have many rows (as in real auction logs)
+    :param str path: the directory to write the files to
+    :param int users: the number of distinct users
+    :param int rows: the total number of rows
+    :param list[int] cardinalities: the number of distinct values of each field
+    :param int files: the number of files to write
+    :type delimiter: str
+    :type seed: int
+    """
+    rng = random.Random(seed)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    for file_index in range(files):
+        file_rows = rows // files + (1 if file_index < rows % files else 0)
+        with gzip.open(os.path.join(path, 'part-{:05d}.csv.gz'.format(file_index)), 'wb') as f:
+            for _ in range(file_rows):
+                user = 'user-{}'.format(int(users * rng.random() ** 2))
+                values = ['{}-{}'.format(i, rng.randrange(c)) for i, c in enumerate(cardinalities)]
+                f.write((delimiter.join([user] + values) + '\n').encode('utf-8'))
+
+
+def run_benchmark(session, miner, date, rows):
+    """
+    runs the stages of a miner for a date, reporting the throughput of each stage.
+    each stage is run as its own spark job (from the input), so the time of a stage is the
+    time of its job less the time of the previous stage's job.
+    :type session: pyspark.SparkSession
+    :type miner: SparkDatasetMiner
+    :type date: datetime|date
+    :param int rows: the number of input rows
+    :rtype: list[dict]
+    """
+    input_size = get_s3_prefix_size(miner.config.s3_bucket, miner._input_prefixes[date])
+    source = get_input_source(miner.config)
+    partitions = miner.get_output_partitions(date, input_size)
+
+    def read():
+        return miner.read_input(session, date)[0]
+
+    def parse():
+        return source.parse_lines(read()).map(miner.create_compact_record)
+
+    def combine():
+        dataset = parse().reduceByKey(miner.combine_compact_records, partitions)
+        return dataset.filter(miner.filter_compact_records)
+
+    stages = [
+        ('read', lambda: read().count()),
+        ('parse', lambda: parse().count()),
+        ('combine', lambda: combine().count()),
+        ('store', lambda: miner.create_dataset_for_day(session, date)),
+    ]
+
+    results = []
+    previous_seconds = 0.0
+    for name, run_stage in stages:
+        start = time.time()
+        run_stage()
+        seconds = time.time() - start
+        stage_seconds = max(seconds - previous_seconds, 1e-6)
+        results.append({
+            'stage': name,
+            'seconds': stage_seconds,
+            'rows_per_second': rows / stage_seconds,
+            'bytes_per_second': input_size / stage_seconds,
+        })
+        previous_seconds = seconds
+    return results
+
+
+def main():
+    """generates synthetic auction logs and benchmarks the miner on a local spark session"""
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO, format='%(asctime)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Benchmark the spark data miner locally on synthetic auction logs')
+    parser.add_argument('--users', type=int, default=10000, help='the number of distinct users')
+    parser.add_argument('--rows', type=int, default=1000000, help='the number of auction rows')
+    parser.add_argument('--cardinalities', type=int, nargs='+', default=[1000, 100, 10],
+                        help='the number of distinct values of each field')
+    parser.add_argument('--files', type=int, default=10, help='the number of input files')
+    parser.add_argument('--input-split-size', type=int, default=None, help='combine input files into splits (bytes)')
+    parser.add_argument('--storage-format', default='text', help='the storage format of the mined dataset')
+    parser.add_argument('--compression', default='gzip', help='the compression of the mined dataset')
+    parser.add_argument('--cores', default='*', help='the number of local cores to use')
+    parser.add_argument('--root', default=None, help='the local directory to use in place of s3 (default: temporary)')
+    args = parser.parse_args()
+
+    set_local_root(args.root or tempfile.mkdtemp(prefix='spark-data-miner-benchmark-'))
+    miner = SparkDatasetMiner(
+        get_synthetic_config(args.cardinalities), BENCHMARK_OUTPUT_BUCKET, data_max_age=1,
+        storage_format=args.storage_format, compression=args.compression or None,
+        input_split_size=args.input_split_size)
+    miner.run_date = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    date = miner._dates[0]
+
+    input_path = miner.get_dataset_input_location(date)[len('file://'):]
+    logger.info('Generating {} rows for {} users in {}'.format(args.rows, args.users, input_path))
+    generate_auction_logs(input_path, args.users, args.rows, args.cardinalities, args.files)
+
+    session = get_local_spark_session(args.cores)
+    try:
+        results = run_benchmark(session, miner, date, args.rows)
+    finally:
+        session.stop()
+
+    print('{:<10}{:>12}{:>16}{:>16}'.format('stage', 'seconds', 'rows/s', 'MB/s'))
+    for result in results:
+        print('{:<10}{:>12.2f}{:>16.0f}{:>16.2f}'.format(
+            result['stage'], result['seconds'], result['rows_per_second'], result['bytes_per_second'] / 1024 ** 2))
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Dataset manifests and catalog
+
+Each mined day has a small manifest object, written once the day's dataset is complete.
+The manifest records the size of the dataset and the config that built it,
+so existence checks are a single GET and volumes can be used to plan clusters.
+
+Usage:
+>>> from spark_data_miner.core.miner import SparkDatasetMiner
+>>> miner = SparkDatasetMiner(config, 'output-bucket')
+>>> miner.catalog.manifests()  # manifests for the dates of the current run
+>>> miner.catalog.total_size()  # bytes stored for the dates of the current run
+"""
+from __future__ import unicode_literals
+
+import datetime
+import hashlib
+import json
+import posixpath
+from collections import namedtuple
+
+from spark_data_miner.core.utils import get_s3_object, put_s3_object
+
+
+_dataset_manifest = namedtuple(
+    '_dataset_manifest', 'date complete partitions records size fingerprint storage_format compression created_at')
+
+
+class DatasetManifest(_dataset_manifest):
+
+    DATE_FORMAT = '%Y-%m-%d'
+
+    def to_json(self):
+        """
+        :rtype: str
+        """
+        return json.dumps(self._asdict(), sort_keys=True)
+
+    @classmethod
+    def from_json(cls, manifest_json):
+        """
+        :type manifest_json: str|bytes
+        :rtype: DatasetManifest
+        """
+        if isinstance(manifest_json, bytes):
+            manifest_json = manifest_json.decode('utf-8')
+        return cls(**json.loads(manifest_json))
+
+
+def get_config_fingerprint(config):
+    """
+    gets a fingerprint of a miner config, to identify datasets built with a different config
+    :type config: spark_data_miner.core.config.MinerConfig
+    :rtype: str
+    """
+    config_dict = dict(config._asdict(), fields=[dict(f._asdict()) for f in config.fields])
+    return hashlib.sha1(json.dumps(config_dict, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class DatasetCatalog(object):
+    """Reads and writes the manifests of a miner's datasets"""
+
+    def __init__(self, s3_bucket, s3_prefix, fingerprint, storage_format, compression, dates=None):
+        """
+        :param str s3_bucket: the bucket the datasets are stored in
+        :param str s3_prefix: the prefix the manifests are stored under
+        :param str fingerprint: the fingerprint of the current miner config
+        :param str storage_format: the storage format of the current miner
+        :param str|None compression: the compression of the current miner
+        :param list[datetime|date]|None dates: the default dates to describe
+        """
+        self.s3_bucket = s3_bucket
+        self.s3_prefix = s3_prefix
+        self.fingerprint = fingerprint
+        self.storage_format = storage_format
+        self.compression = compression
+        self.dates = dates or []
+
+    def get_manifest_key(self, date):
+        """
+        :type date: datetime|date
+        :rtype: str
+        """
+        return posixpath.join(self.s3_prefix, date.strftime(DatasetManifest.DATE_FORMAT) + '.json')
+
+    def manifest(self, date):
+        """
+        gets the manifest for a date, or None if the date has not been (completely) built
+        :type date: datetime|date
+        :rtype: DatasetManifest|None
+        """
+        manifest_json = get_s3_object(self.s3_bucket, self.get_manifest_key(date))
+        return DatasetManifest.from_json(manifest_json) if manifest_json is not None else None
+
+    def write_manifest(self, date, partitions, records, size):
+        """
+        writes the manifest of a completed dataset (built with the current config, format and compression)
+        :type date: datetime|date
+        :type partitions: int
+        :type records: int
+        :param int size: the size of the dataset in bytes
+        :rtype: DatasetManifest
+        """
+        manifest = DatasetManifest(
+            date.strftime(DatasetManifest.DATE_FORMAT), True, partitions, records, size, self.fingerprint,
+            self.storage_format, self.compression, datetime.datetime.utcnow().isoformat())
+        put_s3_object(self.s3_bucket, self.get_manifest_key(date), manifest.to_json().encode('utf-8'))
+        return manifest
+
+    def is_current(self, manifest):
+        """
+        checks a manifest describes a complete dataset built with the current config,
+        and stored in the current format and compression (so that it can be read, and is not rewritten)
+        :type manifest: DatasetManifest|None
+        :rtype: bool
+        """
+        return bool(manifest and manifest.complete and manifest.fingerprint == self.fingerprint and
+                    (manifest.storage_format, manifest.compression) == (self.storage_format, self.compression))
+
+    def manifests(self, dates=None):
+        """
+        gets the manifests for some dates (the dates of the current run by default)
+        :type dates: list[datetime|date]|None
+        :rtype: dict[datetime|date, DatasetManifest|None]
+        """
+        return {date: self.manifest(date) for date in (self.dates if dates is None else dates)}
+
+    def missing(self, dates=None):
+        """
+        gets the dates without a current, complete dataset
+        :type dates: list[datetime|date]|None
+        :rtype: list[datetime|date]
+        """
+        return sorted(date for date, manifest in self.manifests(dates).items() if not self.is_current(manifest))
+
+    def total_size(self, dates=None):
+        """
+        gets the total size (in bytes) of the datasets recorded for some dates
+        :type dates: list[datetime|date]|None
+        :rtype: int
+        """
+        return sum(m.size for m in self.manifests(dates).values() if m)
+
+    def total_records(self, dates=None):
+        """
+        gets the total number of records of the datasets recorded for some dates
+        :type dates: list[datetime|date]|None
+        :rtype: int
+        """
+        return sum(m.records for m in self.manifests(dates).values() if m)
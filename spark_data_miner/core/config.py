@@ -4,23 +4,26 @@ from collections import namedtuple
 
 import six
 
-_miner_config = namedtuple('_miner_config', 'name delimiter fields id_field headers s3_bucket s3_prefix')
-_miner_field = namedtuple('_miner_field', 'name index rtype stype')
+from spark_data_miner.core.sources import INPUT_FORMATS, TEXT_INPUT
+
+_miner_config = namedtuple('_miner_config', 'name delimiter fields id_field headers s3_bucket s3_prefix input_format')
+_miner_field = namedtuple('_miner_field', 'name index rtype stype limit')
 
 
 class MinerField(_miner_field):
 
     __NAME_ERROR_MESSAGE = 'name must be string'
-    __INDEX_ERROR_MESSAGE = 'index must be of type int or tuple[int]'
+    __INDEX_ERROR_MESSAGE = 'index must be of type int, str (a column name) or tuple[int|str]'
     __RTYPE_ERROR_MESSAGE = 'rtype must be callable'
     __STYPE_ERROR_MESSAGE = 'stype must be "dict", "set" or None'
+    __LIMIT_ERROR_MESSAGE = 'limit must be a positive integer (for "dict" fields) or None'
 
-    def __new__(cls, name, index, rtype, stype=None):
+    def __new__(cls, name, index, rtype, stype=None, limit=None):
         assert isinstance(name, six.string_types), cls.__NAME_ERROR_MESSAGE
-        assert type(index) in (int, list, tuple), cls.__INDEX_ERROR_MESSAGE
+        assert isinstance(index, (int, list, tuple) + six.string_types), cls.__INDEX_ERROR_MESSAGE
         if isinstance(index, (list, tuple)):
             index = tuple(index)
-            assert all(isinstance(arg, int) for arg in index), cls.__INDEX_ERROR_MESSAGE
+            assert all(isinstance(arg, (int,) + six.string_types) for arg in index), cls.__INDEX_ERROR_MESSAGE
         else:
             index = [index]
         # noinspection PyBroadException
@@ -29,8 +32,9 @@ class MinerField(_miner_field):
         except Exception:
             raise TypeError(cls.__RTYPE_ERROR_MESSAGE)
         assert stype in {'dict', 'set', None}, cls.__STYPE_ERROR_MESSAGE
+        assert limit is None or (isinstance(limit, int) and limit > 0 and stype == 'dict'), cls.__LIMIT_ERROR_MESSAGE
         # noinspection PyArgumentList
-        return super(MinerField, cls).__new__(cls, name, index, rtype, stype)
+        return super(MinerField, cls).__new__(cls, name, index, rtype, stype, limit)
 
 
 class MinerConfig(_miner_config):
@@ -38,21 +42,24 @@ class MinerConfig(_miner_config):
     __NAME_ERROR_MESSAGE = 'name must be string'
     __DELIMITER_ERROR_MESSAGE = 'delimiter must be a single character'
     __FIELDS_ERROR_MESSAGE = 'fields must be a list of MinerField'
-    __ID_FIELD_ERROR_MESSAGE = 'id_field must be an integer'
+    __ID_FIELD_ERROR_MESSAGE = 'id_field must be an integer or a column name'
     __HEADER_ERROR_MESSAGE = 'header must be boolean'
     __S3_BUCKET_ERROR_MESSAGE = 's3 bucket must be string'
     __S3_PREFIX_ERROR_MESSAGE = 's3 prefix must be string'
+    __INPUT_FORMAT_ERROR_MESSAGE = 'input format must be one of {}'.format(sorted(INPUT_FORMATS))
 
-    def __new__(cls, name, delimiter, fields, id_field, headers, s3_bucket, s3_prefix):
+    def __new__(cls, name, delimiter, fields, id_field, headers, s3_bucket, s3_prefix, input_format=TEXT_INPUT):
         assert isinstance(name, six.string_types), cls.__NAME_ERROR_MESSAGE
         assert isinstance(delimiter, six.string_types) and len(str(delimiter)) == 1, cls.__DELIMITER_ERROR_MESSAGE
         try:
             fields = [f if isinstance(f, MinerField) else MinerField(**f) for f in fields]
         except Exception:
             raise TypeError(cls.__FIELDS_ERROR_MESSAGE)
-        assert isinstance(id_field, int), cls.__ID_FIELD_ERROR_MESSAGE
+        assert isinstance(id_field, (int,) + six.string_types), cls.__ID_FIELD_ERROR_MESSAGE
         assert isinstance(headers, bool), cls.__HEADER_ERROR_MESSAGE
         assert isinstance(s3_bucket, six.string_types), cls.__S3_BUCKET_ERROR_MESSAGE
         assert isinstance(s3_prefix, six.string_types), cls.__S3_PREFIX_ERROR_MESSAGE
+        assert input_format in INPUT_FORMATS, cls.__INPUT_FORMAT_ERROR_MESSAGE
         # noinspection PyArgumentList
-        return super(MinerConfig, cls).__new__(cls, name, delimiter, fields, id_field, headers, s3_bucket, s3_prefix)
+        return super(MinerConfig, cls).__new__(
+            cls, name, delimiter, fields, id_field, headers, s3_bucket, s3_prefix, input_format)
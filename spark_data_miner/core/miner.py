@@ -19,32 +19,80 @@ Usage:
 from __future__ import unicode_literals
 
 import base64
-import csv
 import datetime
 import logging
+import math
 import os
 import posixpath
 import ujson
-from operator import itemgetter
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
+from operator import add
 
-from spark_data_miner.core.utils import get_spark_s3_files, get_s3_connection
+from pyspark import StorageLevel
+
+from spark_data_miner.core.catalog import DatasetCatalog, get_config_fingerprint
+from spark_data_miner.core.records import compile_record_builder, compile_compact_record_builder, \
+    get_compact_record_combiner, get_record_expander
+from spark_data_miner.core.sketch import CountMinSketch, merge_counters
+from spark_data_miner.core.sources import get_input_source, get_input_columns
+from spark_data_miner.core.storage import TEXT_FORMAT, PARQUET_FORMAT, STORAGE_FORMATS, ID_COLUMN, COUNT_COLUMN, \
+    GZIP, get_dataset_schema, get_compression_codec, get_column_converter
+from spark_data_miner.core.utils import get_spark_s3_files, get_s3_prefix_size, s3_object_exists, \
+    delete_s3_prefix, list_s3_objects, group_s3_objects, read_s3_lines, get_s3_object, put_s3_object
 
 
 logger = logging.getLogger('spark_data_miner.core.miner')
 
 
+ROLLUP_MANIFEST = '_DAYS.json'  # hidden from spark readers by its leading underscore
+
+
+def _to_json_record(record):
+    """
+    converts the sets of a record to lists, so that it can be serialized as json
+    :type record: dict
+    :rtype: dict
+    """
+    return {k: list(v) if isinstance(v, set) else v for k, v in record.items()}
+
+
 class SparkDatasetMiner(object):
 
     MAX_COMBINED_RECORDS = 10000
     MIN_COMBINED_RECORDS = 5
 
-    def __init__(self, config, output_s3_bucket, data_max_age=7):
+    OUTPUT_PARTITIONS = 1000  # used when the input size is unknown
+    OUTPUT_SIZE_RATIO = 0.2  # the expected size of a mined dataset relative to its input
+
+    HOT_KEY_SKETCH_WIDTH = 2 ** 17  # a 2 MiB sketch per partition
+    HOT_KEY_SKETCH_DEPTH = 4
+
+    def __init__(self, config, output_s3_bucket, data_max_age=7, storage_format=TEXT_FORMAT, compression=GZIP,
+                 output_partition_size=128 * 1024 ** 2, input_split_size=None, hot_key_filter=False):
+        """
+        :type config: spark_data_miner.core.config.MinerConfig
+        :type output_s3_bucket: str
+        :type data_max_age: int
+        :param str storage_format: "text" or "parquet"
+        :param str|None compression: the output codec, e.g. "gzip", "bzip2", "snappy", "lz4", "zstd" or None
+        :param int output_partition_size: the target size (in bytes) of each output file
+        :param int|None input_split_size: the target size (in bytes) of combined input splits (None for a task per file)
+        :param bool hot_key_filter: drop ids with more than MAX_COMBINED_RECORDS rows before the shuffle
+        """
+        assert storage_format in STORAGE_FORMATS, 'storage_format must be one of {}'.format(sorted(STORAGE_FORMATS))
         self.run_date = None
 
         self.config = config
         self.data_max_age = data_max_age
         self.output_s3_bucket = output_s3_bucket
         self.storage_delimiter = '\t'
+        self.storage_format = storage_format
+        self.compression = compression
+        self.compression_codec = get_compression_codec(storage_format, compression)
+        self.output_partition_size = output_partition_size
+        self.input_split_size = input_split_size
+        self.hot_key_filter = hot_key_filter
 
     @property
     def _dates(self):
@@ -57,45 +105,89 @@ class SparkDatasetMiner(object):
         return {date: date.strftime(os.path.join(self.config.s3_prefix)) for date in self._dates}
 
     @property
-    def _output_prefixes(self):
-        """Get the output locations of the job. Not available until the run_date is set"""
+    def _output_root(self):
+        """Get the root of all output locations of the job"""
         bucket = base64.b64encode(self.config.s3_bucket.encode()).decode("utf-8")
         prefix = base64.b64encode(self.config.s3_prefix.encode()).decode("utf-8")
-        date_prefix = posixpath.join('spark_data_miner', self.config.name, bucket, prefix, '%Y-%m-%d/')
+        return posixpath.join('spark_data_miner', self.config.name, bucket, prefix)
+
+    @property
+    def _output_prefixes(self):
+        """Get the output locations of the job. Not available until the run_date is set"""
+        date_prefix = posixpath.join(self._output_root, '%Y-%m-%d/')
         return {date: date.strftime(date_prefix) for date in self._dates + [self.run_date]}
 
+    @property
+    def _rollup_prefixes(self):
+        """
+        Get the rollup locations of the job (for this run and the previous run).
+        A rollup is keyed by the run date and covers the data_max_age days before it.
+        Not available until the run_date is set
+        """
+        rollup_prefix = posixpath.join(self._output_root, 'rollup', '%Y-%m-%d/')
+        dates = [self.run_date - datetime.timedelta(days=1), self.run_date]
+        return {date: date.strftime(rollup_prefix) for date in dates}
+
+    @property
+    def catalog(self):
+        """Get the catalog of the job's dataset manifests"""
+        return DatasetCatalog(
+            self.output_s3_bucket, posixpath.join(self._output_root, 'manifests'), get_config_fingerprint(self.config),
+            self.storage_format, self.compression, self._dates if self.run_date else None)
+
     @property
     def create_record(self):
         """
         This function returns a function (that can be serialized) for the spark job to create a dataset
         they do not contain references to self, and so can be easily serialised by spark.
+        The function is compiled for the config, see spark_data_miner.core.records
         :returns: types.FuncType
         """
+        return compile_record_builder(self.config)
 
-        field_functions = ((f.name, f.stype, eval(f.rtype), itemgetter(*f.index)) for f in self.config.fields)
-        id_field = self.config.id_field
+    @property
+    def create_compact_record(self):
+        """
+        This function returns a function (that can be serialized) for the spark job to create compact records
+        (lists of the count and field values, by field index) that are combined while mining.
+        :returns: types.FuncType
+        """
+        return compile_compact_record_builder(self.config)
+
+    @property
+    def combine_compact_records(self):
+        """
+        This function returns a function (that can be serialized) for the spark job to combine compact records
+        :returns: types.FuncType
+        """
+        return get_compact_record_combiner(self.config, self.MAX_COMBINED_RECORDS)
+
+    @property
+    def filter_compact_records(self):
+
+        min_records = self.MIN_COMBINED_RECORDS
+        max_records = self.MAX_COMBINED_RECORDS
 
-        def get_stored_value(store_as, value):
-            if store_as == 'dict':
-                return {value: 1}
-            if store_as == 'set':
-                return {value}
-            if store_as is None:
-                return value
+        def filter_compact_records(record):
+            id_field, record = record
+            return record and min_records <= record[0] <= max_records and id_field
 
-        def create_record(raw):
-            record = {}
-            for field_name, field_type, true_val, getter in field_functions:
-                record[field_name] = get_stored_value(field_type, true_val(getter(raw)))
-            record['c'] = 1
-            return raw[id_field], record
+        return filter_compact_records
 
-        return create_record
+    @property
+    def expand_record(self):
+        """
+        This function returns a function (that can be serialized) for the spark job to expand compact records
+        to records (dicts of the field values by field name) before they are stored.
+        :returns: types.FuncType
+        """
+        return get_record_expander(self.config)
 
     @property
     def combine_records(self):
 
         max_records = self.MAX_COMBINED_RECORDS
+        limits = {f.name: f.limit for f in self.config.fields if f.limit}
 
         def combine_records(record_1, record_2):
             if (not record_1) or (not record_2) or record_1['c'] + record_2['c'] > max_records:
@@ -106,6 +198,8 @@ class SparkDatasetMiner(object):
                         record_1[feature] |= val
                     elif isinstance(val, int):
                         record_1[feature] += val
+                    elif isinstance(val, dict) and feature in limits:
+                        record_1[feature] = merge_counters(record_1[feature], val, limits[feature])
                     elif isinstance(val, dict):
                         for i in val:
                             if i in record_1[feature]:
@@ -142,7 +236,7 @@ class SparkDatasetMiner(object):
 
         def store_record(mined_data):
             id_field, record = mined_data
-            return storage_delimiter.join([id_field, ujson.dumps(record)])
+            return storage_delimiter.join([id_field, ujson.dumps(_to_json_record(record))])
 
         return store_record
 
@@ -153,13 +247,29 @@ class SparkDatasetMiner(object):
         the functions do not reference self.
         :returns:
         """
+        return self.get_load_record()
+
+    def get_load_record(self, features=None, as_sets=True):
+        """
+        This function returns a function (that can be serialized) for the spark job to load (a projection of) records
+        Only the requested features are kept, and only their values are converted,
+        but each record is still decoded whole (json can't be partially decoded): only parquet datasets prune columns.
+        the functions do not reference self.
+        :param list[str]|None features: the features to load (all features if None)
+        :param bool as_sets: convert lists to sets (not needed by consumers that only iterate over values)
+        :returns: types.FuncType
+        """
         storage_delimiter = self.storage_delimiter
+        columns = None if features is None else set(features) | {COUNT_COLUMN}
 
         def deserialize_record(serialized_record):
             record = ujson.loads(serialized_record)
-            for k, v in record.items():
-                if isinstance(v, list):
-                    record[k] = set(v)
+            if columns is not None:
+                record = {k: v for k, v in record.items() if k in columns}
+            if as_sets:
+                for k, v in record.items():
+                    if isinstance(v, list):
+                        record[k] = set(v)
             return record
 
         def load_record(stored_data):
@@ -168,6 +278,98 @@ class SparkDatasetMiner(object):
 
         return load_record
 
+    @property
+    def store_row(self):
+        """
+        This function returns a function (that can be serialized) for the spark job to store records as parquet rows
+        the functions do not reference self.
+        :returns: types.FuncType
+        """
+        converters = [(f.name, get_column_converter(f)) for f in self.config.fields]
+
+        def store_row(mined_data):
+            id_field, record = mined_data
+            return [id_field, record['c']] + [convert(record.get(name)) for name, convert in converters]
+
+        return store_row
+
+    def get_load_row(self, columns, as_sets=True):
+        """
+        This function returns a function (that can be serialized) for the spark job to load parquet rows as records
+        the functions do not reference self.
+        :param list[str] columns: the feature columns selected from the dataset
+        :param bool as_sets: convert lists to sets (not needed by consumers that only iterate over values)
+        :returns: types.FuncType
+        """
+        columns = list(columns)
+
+        def load_row(row):
+            record = {COUNT_COLUMN: row[COUNT_COLUMN]}
+            for column in columns:
+                value = row[column]
+                record[column] = set(value) if as_sets and isinstance(value, list) else value
+            return row[ID_COLUMN], record
+
+        return load_row
+
+    @property
+    def store_contributions(self):
+        """
+        This function returns a function (that can be serialized) for the spark job to store rollup records
+        the functions do not reference self.
+        :returns: types.FuncType
+        """
+        storage_delimiter = self.storage_delimiter
+
+        def store_contributions(rollup_data):
+            id_field, contributions = rollup_data
+            contributions = {day: _to_json_record(record) for day, record in contributions.items()}
+            return storage_delimiter.join([id_field, ujson.dumps(contributions)])
+
+        return store_contributions
+
+    @property
+    def load_contributions(self):
+        """
+        This function returns a function (that can be serialized) for the spark job to load rollup records
+        a rollup record is the per day records (contributions) of a user, keyed by the date.
+        the functions do not reference self.
+        :returns: types.FuncType
+        """
+        storage_delimiter = self.storage_delimiter
+
+        def deserialize_record(record):
+            for k, v in record.items():
+                if isinstance(v, list):
+                    record[k] = set(v)
+            return record
+
+        def load_contributions(stored_data):
+            id_field, serialized_contributions = stored_data.strip().split(storage_delimiter)
+            contributions = ujson.loads(serialized_contributions)
+            return id_field, {day: deserialize_record(record) for day, record in contributions.items()}
+
+        return load_contributions
+
+    @property
+    def merge_contributions(self):
+        """
+        This function returns a function (that can be serialized) for the spark job to merge rollup records
+        into a single profile. The result is None if the merged profile is not valid.
+        the functions do not reference self.
+        :returns: types.FuncType
+        """
+        combine_records = self.combine_records
+
+        def merge_contributions(contributions):
+            records = list(contributions.values())
+            merged = records[0]
+            for record in records[1:]:
+                merged = combine_records(merged, record)
+            return merged
+
+        return merge_contributions
+
     def get_dataset_input_location(self, date):
         """
         Get the input location for the job, for a given date
@@ -184,6 +386,75 @@ class SparkDatasetMiner(object):
         """
         return get_spark_s3_files(self.output_s3_bucket, self._output_prefixes[date])
 
+    def get_rollup_location(self, date):
+        """
+        Get the rollup location for the job, for a given run date
+        :type date: datetime|date|None
+        :rtype: str
+        """
+        return get_spark_s3_files(self.output_s3_bucket, self._rollup_prefixes[date])
+
+    def get_output_partitions(self, date, input_size=None):
+        """
+        Get the number of output partitions for a date so that output files are close to the target size
+        :type date: datetime|date
+        :param int|None input_size: the size (in bytes) of the input, if it is already known
+        :rtype: int
+        """
+        if input_size is None:
+            input_size = get_s3_prefix_size(self.config.s3_bucket, self._input_prefixes[date])
+        if not input_size:
+            return self.OUTPUT_PARTITIONS
+        return max(1, int(math.ceil(input_size * self.OUTPUT_SIZE_RATIO / self.output_partition_size)))
+
+    def read_input(self, session, date):
+        """
+        Reads the raw input lines for a date.
+        When an input split size is set, the input prefix is listed once and small objects are combined into splits
+        of (roughly) that size, so each task reads many objects rather than one.
+        :type session: pyspark.SparkSession
+        :type date: datetime|date
+        :rtype: tuple[pyspark.RDD, int|None]
+        :returns: the input lines and the size (in bytes) of the input, if known
+        """
+        if not self.input_split_size:
+            return session.sparkContext.textFile(self.get_dataset_input_location(date)), None
+
+        objects = list_s3_objects(self.config.s3_bucket, self._input_prefixes[date])
+        splits = group_s3_objects(objects, self.input_split_size)
+        raw_files = session.sparkContext.parallelize(splits, max(1, len(splits)))
+        return raw_files.flatMap(read_s3_lines(self.config.s3_bucket)), sum(size for key, size in objects)
+
+    def drop_hot_keys(self, session, partial_dataset):
+        """
+        Drops the records of ids that have more rows than MAX_COMBINED_RECORDS (and so would be filtered after the
+        shuffle anyway). Candidate ids are found with a count-min sketch built per partition, and only the candidates
+        are counted exactly, so that only ids certain to exceed the limit are dropped.
+        The records should be persisted, as they are read by the counting jobs before being combined.
+        :type session: pyspark.SparkSession
+        :param pyspark.RDD partial_dataset: the (id, record) pairs of a day, before they are combined
+        :rtype: pyspark.RDD
+        """
+        max_records = self.MAX_COMBINED_RECORDS
+        width, depth = self.HOT_KEY_SKETCH_WIDTH, self.HOT_KEY_SKETCH_DEPTH
+
+        ids = partial_dataset.keys()
+
+        def sketch_partition(keys):
+            sketch = CountMinSketch(width, depth)
+            for key in keys:
+                sketch.add(key)
+            yield sketch
+
+        sketch = session.sparkContext.broadcast(ids.mapPartitions(sketch_partition).treeReduce(CountMinSketch.merge))
+        candidates = ids.filter(lambda key: sketch.value.estimate(key) > max_records)
+        hot_keys = candidates.map(lambda key: (key, 1)).reduceByKey(add).filter(lambda x: x[1] > max_records).keys()
+        hot_keys = session.sparkContext.broadcast(set(hot_keys.collect()))
+        sketch.unpersist()
+
+        logger.info('Dropping {} hot keys from dataset {}'.format(len(hot_keys.value), self.config.name))
+        return partial_dataset.filter(lambda x: x[0] not in hot_keys.value)
+
     def create_dataset_for_day(self, session, date):
         """
         Builds datasets for a specific right_person configuration
@@ -191,46 +462,337 @@ class SparkDatasetMiner(object):
         :type date: datetime|date
         """
 
-        record_location = self.get_dataset_input_location(date)
         dataset_output_location = self.get_dataset_output_location(date)
 
-        delimiter = str(self.config.delimiter)
+        source = get_input_source(self.config)
+        if source.reads_lines:
+            raw_files, input_size = self.read_input(session, date)
+            rows = source.parse_lines(raw_files)
+        else:
+            rows = source.read(session, self.get_dataset_input_location(date), get_input_columns(self.config))
+            input_size = None
+
+        partial_dataset = rows.map(self.create_compact_record)
+        combinable_dataset = partial_dataset
+        if self.hot_key_filter:
+            partial_dataset.persist(StorageLevel.MEMORY_AND_DISK)
+            combinable_dataset = self.drop_hot_keys(session, partial_dataset)
+        partitions = self.get_output_partitions(date, input_size)
+        dataset = combinable_dataset.reduceByKey(self.combine_compact_records, partitions)
+        dataset = dataset.filter(self.filter_compact_records).map(self.expand_record)
+
+        # records are counted by an action on the persisted output, as accumulators updated in transformations
+        # over count retried (or speculative) tasks
+        delete_s3_prefix(self.output_s3_bucket, self._output_prefixes[date])  # remove any partial write
+        if self.storage_format == PARQUET_FORMAT:
+            stored = dataset.map(self.store_row).persist(StorageLevel.MEMORY_AND_DISK)
+            records = stored.count()
+            session.createDataFrame(stored, get_dataset_schema(self.config), verifySchema=False).write.parquet(
+                dataset_output_location, compression=self.compression_codec)
+        else:
+            stored = dataset.map(self.store_record).persist(StorageLevel.MEMORY_AND_DISK)
+            records = stored.count()
+            stored.saveAsTextFile(dataset_output_location, compressionCodecClass=self.compression_codec)
+
+        stored.unpersist()
+        partial_dataset.unpersist()
 
-        raw_files = session.sparkContext.textFile(record_location)
+        size = get_s3_prefix_size(self.output_s3_bucket, self._output_prefixes[date])
+        self.catalog.write_manifest(date, partitions, records, size)
 
-        if self.config.headers:  # todo: abstract to a method
-            header = raw_files.first().strip()
-            map_fn = (lambda x: self.create_record(
-                csv.reader([x], delimiter=delimiter).next()) if header not in x else (None, None))
+    def load_dataset(self, session, date, features=None, condition=None, vectorizer=None):
+        """
+        Loads the dataset for a specific date as an RDD of (id, record)
+        Only the requested features are materialized: parquet datasets only read their columns
+        (and push the condition down to the files), text datasets are read and decoded whole and only convert the
+        values of the requested features.
+        With a vectorizer (e.g. RightPersonModel.vectorizer), records are loaded as (id, vector) instead.
+        :type session: pyspark.SparkSession
+        :type date: datetime|date
+        :param list[str]|None features: the features to load (all features if None)
+        :param str|pyspark.sql.Column|None condition: a filter on the dataset columns (parquet datasets only)
+        :param Callable|None vectorizer: a function creating a vector from a record (without sets)
+        :rtype: pyspark.RDD
+        """
+        location = self.get_dataset_output_location(date)
+        if features is not None:
+            features = [f.name for f in self.config.fields if f.name in set(features)]
+        as_sets = vectorizer is None
+
+        if self.storage_format == PARQUET_FORMAT:
+            columns = features if features is not None else [f.name for f in self.config.fields]
+            dataframe = session.read.parquet(location)
+            if condition is not None:
+                dataframe = dataframe.where(condition)
+            rdd = dataframe.select(ID_COLUMN, COUNT_COLUMN, *columns).rdd.map(self.get_load_row(columns, as_sets))
+        elif condition is not None:
+            raise ValueError('conditions are only supported by the {} storage format'.format(PARQUET_FORMAT))
         else:
-            map_fn = (lambda x: self.create_record(csv.reader([x], delimiter=delimiter).next()))
+            rdd = session.sparkContext.textFile(location).map(self.get_load_record(features, as_sets))
 
-        partial_dataset = raw_files.map(map_fn).filter(lambda x: x != (None, None))
-        dataset = partial_dataset.reduceByKey(self.combine_records, 1000).filter(self.filter_records)
-        dataset.map(self.store_record).saveAsTextFile(
-            dataset_output_location, compressionCodecClass="org.apache.hadoop.io.compress.GzipCodec")
+        if vectorizer is not None:
+            rdd = rdd.map(lambda x: (x[0], vectorizer(x[1])))
+        return rdd
 
-    def get_dataset_for_day(self, session):
+    def get_existing_dates(self):
         """
-        :type session: pyspark.SparkSession
+        Gets the dates of the job that have a complete dataset (missing dates are logged)
+        :rtype: list[datetime]
         """
+        dates = []
         for date in self._dates:
-            try:
-                rdd = session.sparkContext.textFile(self.get_dataset_output_location(date)).map(self.load_record).cache()
-                yield rdd
-                rdd.unpersist()
-            except (Exception, ):
+            if self.dataset_exists(date):
+                dates.append(date)
+            else:
                 logger.warning('Could not retrieve dataset {} for date {}'.format(self.config.name, date))
+        return dates
+
+    def get_dataset_for_day(self, session, features=None, condition=None, vectorizer=None,
+                            storage_level=StorageLevel.MEMORY_AND_DISK):
+        """
+        Yields the dataset of each existing day, persisted until the next day is requested
+        :type session: pyspark.SparkSession
+        :param list[str]|None features: the features to load (all features if None)
+        :param str|pyspark.sql.Column|None condition: a filter on the dataset columns (parquet datasets only)
+        :param Callable|None vectorizer: a function creating a vector from a record (without sets)
+        :param pyspark.StorageLevel storage_level: how each day is persisted
+        """
+        for date in self.get_existing_dates():
+            rdd = self.load_dataset(session, date, features, condition, vectorizer).persist(storage_level)
+            yield rdd
+            rdd.unpersist()
+
+    def get_dataset(self, session, features=None, condition=None, vectorizer=None,
+                    storage_level=StorageLevel.MEMORY_AND_DISK):
+        """
+        Loads the datasets of every existing day as a single RDD of (id, record).
+        The RDD is persisted (unless storage_level is None) and must be unpersisted by the caller,
+        see persisted_dataset. Records are always serialized in python, so MEMORY_AND_DISK already stores
+        serialized blocks, and spills them to disk rather than recomputing them from s3 under memory pressure.
+        :type session: pyspark.SparkSession
+        :param list[str]|None features: the features to load (all features if None)
+        :param str|pyspark.sql.Column|None condition: a filter on the dataset columns (parquet datasets only)
+        :param Callable|None vectorizer: a function creating a vector from a record (without sets)
+        :param pyspark.StorageLevel|None storage_level: how the dataset is persisted
+        :rtype: pyspark.RDD
+        """
+        dates = self.get_existing_dates()
+        if not dates:
+            raise ValueError('No datasets exist for {} between {} and {}'.format(
+                self.config.name, self._dates[0], self._dates[-1]))
+        rdd = session.sparkContext.union([
+            self.load_dataset(session, date, features, condition, vectorizer) for date in dates])
+        if storage_level is not None:
+            rdd.persist(storage_level)
+        return rdd
+
+    @contextmanager
+    def persisted_dataset(self, session, features=None, condition=None, vectorizer=None,
+                          storage_level=StorageLevel.MEMORY_AND_DISK):
+        """
+        Provides the datasets of every existing day as a single persisted RDD, unpersisted on exit
+        :type session: pyspark.SparkSession
+        :param list[str]|None features: the features to load (all features if None)
+        :param str|pyspark.sql.Column|None condition: a filter on the dataset columns (parquet datasets only)
+        :param Callable|None vectorizer: a function creating a vector from a record (without sets)
+        :param pyspark.StorageLevel storage_level: how the dataset is persisted
+        :yields: pyspark.RDD
+        """
+        rdd = self.get_dataset(session, features, condition, vectorizer, storage_level)
+        try:
+            yield rdd
+        finally:
+            rdd.unpersist()
+
+    def _write_completed(self, prefix):
+        """checks the success marker of a spark write exists"""
+        return s3_object_exists(self.output_s3_bucket, posixpath.join(prefix, '_SUCCESS'))
 
     def dataset_exists(self, date):
-        prefix = self._output_prefixes[date]
-        return bool(list(get_s3_connection().Bucket(self.output_s3_bucket).objects.filter(Prefix=prefix)))
+        """
+        Checks a complete dataset, built with the current config (and format and compression), exists for a date.
+        Datasets built before manifests were written are checked by their success marker.
+        :type date: datetime|date
+        :rtype: bool
+        """
+        catalog = self.catalog
+        manifest = catalog.manifest(date)
+        if manifest is None:
+            return self._write_completed(self._output_prefixes[date])
+        if not catalog.is_current(manifest):
+            logger.warning('Dataset {} for date {} was built with a different config, format or compression'.format(
+                self.config.name, date))
+            return False
+        return True
+
+    def rollup_exists(self, date):
+        return self._write_completed(self._rollup_prefixes[date])
+
+    def get_rollup_days(self, date):
+        """
+        Gets the days included in the rollup for a run date, from the rollup's manifest
+        :type date: datetime|date
+        :rtype: set[str]|None
+        :returns: the days (as %Y-%m-%d), or None if the rollup has no manifest
+        """
+        manifest = get_s3_object(self.output_s3_bucket, posixpath.join(self._rollup_prefixes[date], ROLLUP_MANIFEST))
+        if manifest is None:
+            return None
+        return set(ujson.loads(manifest.decode('utf-8')))
+
+    def get_rollup_partitions(self, dates):
+        """
+        Get the number of partitions of a rollup so that its files are close to the target output size.
+        The rollup is about as large as the datasets it includes, whose sizes are recorded by their manifests
+        (datasets built before manifests were written are listed instead).
+        :param list[datetime|date] dates: the dates included in the rollup
+        :rtype: int
+        """
+        size = 0
+        for date, manifest in self.catalog.manifests(dates).items():
+            if manifest is not None:
+                size += manifest.size
+            else:
+                size += get_s3_prefix_size(self.output_s3_bucket, self._output_prefixes[date])
+        return max(1, int(math.ceil(size / float(self.output_partition_size))))
+
+    def create_rollup(self, session):
+        """
+        Builds the rolling rollup of the datasets for the run date.
+        The rollup stores the records of each user by day so that it can be updated incrementally:
+        the previous run's rollup (whose days are listed in its manifest) drops the days that are no longer in the
+        window (or no longer exist) and adds every existing day of the window it is missing, e.g. the newest day
+        and days back-filled since it was built.
+        If there is no previous rollup (or it has no manifest), the rollup is built from every day in the window.
+        :type session: pyspark.SparkSession
+        """
+        previous_run_date = self.run_date - datetime.timedelta(days=1)
+        days = {date.strftime('%Y-%m-%d'): date for date in self._dates if self.dataset_exists(date)}
+        if not days:
+            raise ValueError('No datasets exist to build the rollup for {}'.format(self.run_date))
+
+        def to_contributions(day):
+            return lambda x: (x[0], {day: x[1]})
+
+        previous_days = self.get_rollup_days(previous_run_date) if self.rollup_exists(previous_run_date) else None
+        if previous_days is None:
+            previous, new_days = None, sorted(days)
+        else:
+            kept_days = previous_days & set(days)
+            previous = session.sparkContext.textFile(self.get_rollup_location(previous_run_date))
+            previous = previous.map(self.load_contributions).map(
+                lambda x: (x[0], {day: record for day, record in x[1].items() if day in kept_days})).filter(
+                lambda x: x[1])
+            new_days = sorted(set(days) - previous_days)
+        logger.info('Adding days {} to rollup {} for date {}'.format(new_days, self.config.name, self.run_date))
+
+        contributions = [self.load_dataset(session, days[day]).map(to_contributions(day)) for day in new_days]
+        if previous is not None:
+            contributions.append(previous)
+
+        def merge_days(contributions_1, contributions_2):
+            contributions_1.update(contributions_2)
+            return contributions_1
+
+        partitions = self.get_rollup_partitions(list(days.values()))
+        rollup = session.sparkContext.union(contributions).reduceByKey(merge_days, partitions)
+        rollup.map(self.store_contributions).saveAsTextFile(
+            self.get_rollup_location(self.run_date),
+            compressionCodecClass=get_compression_codec(TEXT_FORMAT, self.compression))
+        put_s3_object(
+            self.output_s3_bucket, posixpath.join(self._rollup_prefixes[self.run_date], ROLLUP_MANIFEST),
+            ujson.dumps(sorted(days)))
+
+    def get_rollup_dataset(self, session, features=None):
+        """
+        Loads the rollup for the run date as an RDD of (id, record), with one merged record per user
+        :type session: pyspark.SparkSession
+        :param list[str]|None features: the features to load (all features if None)
+        :rtype: pyspark.RDD
+        """
+        merge_contributions = self.merge_contributions
+        rdd = session.sparkContext.textFile(self.get_rollup_location(self.run_date)).map(self.load_contributions)
+        rdd = rdd.map(lambda x: (x[0], merge_contributions(x[1]))).filter(self.filter_records)
+        if features is not None:
+            columns = set(features) | {COUNT_COLUMN}
+            rdd = rdd.map(lambda x: (x[0], {k: v for k, v in x[1].items() if k in columns}))
+        return rdd
+
+    def _build_dataset_for_day(self, session, date, scheduler_pool=None):
+        """
+        Builds the dataset for a date, reporting success rather than raising
+        :type session: pyspark.SparkSession
+        :type date: datetime|date
+        :param str|None scheduler_pool: the FAIR scheduler pool to submit the day's jobs to
+        :rtype: bool
+        """
+        if scheduler_pool:
+            session.sparkContext.setLocalProperty('spark.scheduler.pool', scheduler_pool)
+        try:
+            self.create_dataset_for_day(session, date)
+        except (Exception, ):
+            logger.warning('Could not build dataset {} for date {}'.format(self.config.name, date))
+            return False
+        finally:
+            if scheduler_pool:
+                session.sparkContext.setLocalProperty('spark.scheduler.pool', None)
+        logger.info('Built dataset {} for date {}'.format(self.config.name, date))
+        return True
+
+    @staticmethod
+    def _has_thread_local_properties(session):
+        """
+        Checks local properties (e.g. the scheduler pool) set in a python thread only apply to that thread's jobs.
+        Threads are only pinned to their own JVM threads from pyspark 3 (with PYSPARK_PIN_THREAD), before that
+        a python thread's calls may be served by any JVM thread, so its properties can leak to other threads' jobs.
+        :type session: pyspark.SparkSession
+        :rtype: bool
+        """
+        major_version = int(session.sparkContext.version.split('.')[0])
+        return major_version >= 3 and os.environ.get('PYSPARK_PIN_THREAD', 'true').lower() != 'false'
 
-    def create_dataset(self, session):
+    def create_dataset(self, session, rollup=False, max_concurrent_days=1, scheduler_pools=False):
+        """
+        Builds the datasets for every day that is missing
+        Days can be built concurrently, as separate spark jobs sharing the cluster's cores.
+        With scheduler_pools, each day's jobs are also submitted to their own scheduler pool, so that days share the
+        cluster fairly. Pools require a session with FAIR scheduling, and python threads pinned to JVM threads
+        (pyspark 3 or later, see _has_thread_local_properties), otherwise the days share the default pool.
+        :type session: pyspark.SparkSession
+        :param bool rollup: also update the rolling rollup of the datasets
+        :param int max_concurrent_days: the maximum number of days to build at the same time
+        :param bool scheduler_pools: submit each day's jobs to its own FAIR scheduler pool
+        :rtype: dict[datetime, bool]
+        :returns: whether each missing day was built
+        """
         self.run_date = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
-        for date in self._dates:
-            if not self.dataset_exists(date):
-                try:
-                    self.create_dataset_for_day(session, date)
-                except (Exception, ):
-                    logger.warning('Could not build dataset {} for date {}'.format(self.config.name, date))
+        missing_dates = [date for date in self._dates if not self.dataset_exists(date)]
+
+        if scheduler_pools and session.sparkContext.getConf().get('spark.scheduler.mode') != 'FAIR':
+            logger.warning('Scheduler pools require a session with FAIR scheduling, using the default pool')
+            scheduler_pools = False
+        if scheduler_pools and not self._has_thread_local_properties(session):
+            logger.warning('Scheduler pools require threads pinned to JVM threads (pyspark 3), using the default pool')
+            scheduler_pools = False
+
+        def build(date):
+            return self._build_dataset_for_day(session, date, date.strftime('%Y-%m-%d') if scheduler_pools else None)
+
+        if max_concurrent_days > 1 and len(missing_dates) > 1:
+            pool = ThreadPool(min(max_concurrent_days, len(missing_dates)))
+            try:
+                results = pool.map(build, missing_dates)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [self._build_dataset_for_day(session, date) for date in missing_dates]
+
+        built = dict(zip(missing_dates, results))
+
+        if rollup and not self.rollup_exists(self.run_date):
+            try:
+                self.create_rollup(session)
+            except (Exception, ):
+                logger.warning('Could not build rollup {} for date {}'.format(self.config.name, self.run_date))
+        return built
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+record building functions, compiled for a miner config
+
+Records are built once for every raw row that is mined, so the record builder is generated
+with its field extraction unrolled and its type converters resolved ahead of time.
+
+While mining, records are "compact": a list of [count, value of field 0, value of field 1, ...]
+so that field names are not pickled through the shuffle and values are merged without type checks.
+Compact records are expanded to the public {field name: value, 'c': count} format only when stored.
+"""
+from __future__ import unicode_literals
+
+from spark_data_miner.core.sketch import merge_counters
+
+
+def _get_field_value_source(field, converter):
+    """
+    gets the source of an expression building the stored value of a field from a raw row
+    :type field: spark_data_miner.core.config.MinerField
+    :param str converter: the name of the field's type converter
+    :rtype: str
+    """
+    if len(field.index) == 1:
+        raw_value = 'raw[{!r}]'.format(field.index[0])
+    else:
+        raw_value = '({},)'.format(', '.join('raw[{!r}]'.format(i) for i in field.index))
+    value = '{}({})'.format(converter, raw_value)
+
+    if field.stype == 'dict':
+        return '{{{}: 1}}'.format(value)
+    if field.stype == 'set':
+        return '{{{}}}'.format(value)
+    return value
+
+
+def _compile_builder(config, record_source, function_name):
+    """
+    compiles a function that builds an (id, record) pair from a raw row
+    :type config: spark_data_miner.core.config.MinerConfig
+    :param Callable record_source: formats the source of the record from the source of the field values
+    :param str function_name: the name of the function
+    :rtype: types.FuncType
+    """
+    namespace = {}
+    values = []
+    for i, field in enumerate(config.fields):
+        converter = '_rtype_{}'.format(i)
+        namespace[converter] = eval(field.rtype)
+        values.append(_get_field_value_source(field, converter))
+
+    source = 'def {}(raw):\n    return raw[{!r}], {}\n'.format(
+        function_name, config.id_field, record_source(values))
+    exec(compile(source, '<{} {}>'.format(config.name, function_name), 'exec'), namespace)
+    return namespace[function_name]
+
+
+def compile_record_builder(config):
+    """
+    compiles a function that builds an (id, record) pair from a raw row for a miner config, e.g.
+    >>> def create_record(raw):
+    ...     return raw[0], {'field': {_rtype_0(raw[1]): 1}, 'c': 1}
+    :type config: spark_data_miner.core.config.MinerConfig
+    :rtype: types.FuncType
+    """
+    names = [f.name for f in config.fields]
+
+    def record_source(values):
+        items = ['{!r}: {}'.format(name, value) for name, value in zip(names, values)] + ["'c': 1"]
+        return '{{{}}}'.format(', '.join(items))
+
+    return _compile_builder(config, record_source, 'create_record')
+
+
+def compile_compact_record_builder(config):
+    """
+    compiles a function that builds an (id, compact record) pair from a raw row for a miner config, e.g.
+    >>> def create_compact_record(raw):
+    ...     return raw[0], [1, {_rtype_0(raw[1]): 1}]
+    :type config: spark_data_miner.core.config.MinerConfig
+    :rtype: types.FuncType
+    """
+    return _compile_builder(config, lambda values: '[{}]'.format(', '.join(['1'] + values)), 'create_compact_record')
+
+
+def _merge_or(value_1, value_2):
+    value_1 |= value_2
+    return value_1
+
+
+def _merge_counter(value_1, value_2):
+    for i in value_2:
+        if i in value_1:
+            value_1[i] += value_2[i]
+        else:
+            value_1[i] = value_2[i]
+    return value_1
+
+
+def _merge_sum(value_1, value_2):
+    return value_1 + value_2
+
+
+def _merge_any(value_1, value_2):
+    """merges values of a type only known at runtime"""
+    if isinstance(value_2, (bool, set)):
+        return value_1 | value_2
+    if isinstance(value_2, int):
+        return value_1 + value_2
+    if isinstance(value_2, dict):
+        return _merge_counter(value_1, value_2)
+    return value_1
+
+
+def _keep_first(value_1, value_2):
+    return value_1
+
+
+_SCALAR_MERGES = {
+    'bool': _merge_or,
+    'int': _merge_sum,
+    'long': _merge_sum,
+    'float': _keep_first,
+    'str': _keep_first,
+    'unicode': _keep_first,
+}
+
+
+def _get_field_merge(field):
+    """
+    gets the function merging two values of a field (as combine_records would)
+    :type field: spark_data_miner.core.config.MinerField
+    :rtype: Callable
+    """
+    if field.stype == 'set':
+        return _merge_or
+    if field.stype == 'dict':
+        if field.limit:
+            limit = field.limit
+            return lambda value_1, value_2: merge_counters(value_1, value_2, limit)
+        return _merge_counter
+    return _SCALAR_MERGES.get(field.rtype, _merge_any)
+
+
+def get_compact_record_combiner(config, max_records):
+    """
+    gets a function (that can be serialized) combining two compact records,
+    the result is None if the records have more than max_records rows between them.
+    :type config: spark_data_miner.core.config.MinerConfig
+    :type max_records: int
+    :rtype: types.FuncType
+    """
+    merges = [(i, _get_field_merge(field)) for i, field in enumerate(config.fields, start=1)]
+
+    def combine_compact_records(record_1, record_2):
+        if (not record_1) or (not record_2) or record_1[0] + record_2[0] > max_records:
+            return
+        record_1[0] += record_2[0]
+        for i, merge in merges:
+            record_1[i] = merge(record_1[i], record_2[i])
+        return record_1
+
+    return combine_compact_records
+
+
+def get_record_expander(config):
+    """
+    gets a function (that can be serialized) expanding an (id, compact record) pair to an (id, record) pair
+    :type config: spark_data_miner.core.config.MinerConfig
+    :rtype: types.FuncType
+    """
+    names = ['c'] + [f.name for f in config.fields]
+
+    def expand_record(mined_data):
+        id_field, compact_record = mined_data
+        return id_field, dict(zip(names, compact_record))
+
+    return expand_record
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+approximate counting structures for the spark jobs of the miner
+they can be built per partition and merged, so that counts are gathered without a shuffle.
+"""
+from __future__ import unicode_literals
+
+import heapq
+
+import mmh3
+import numpy
+
+
+class CountMinSketch(object):
+    """
+    Count-min sketch: estimates are never below the true count,
+    and exceed it by at most e/width of the total count (with probability 1 - e^-depth).
+    Counters are 32 bit (sketches are shipped between executors) and saturate when merged,
+    so estimates are only exact below 2^31.
+    """
+
+    def __init__(self, width=2 ** 17, depth=4, dtype=numpy.int32):
+        """
+        :param int width: the number of counters per row
+        :param int depth: the number of rows (independent hashes)
+        :param numpy.dtype dtype: the type of the counters
+        """
+        self.width = width
+        self.depth = depth
+        self.table = numpy.zeros((depth, width), dtype=dtype)
+
+    def _indexes(self, key):
+        """gets the counter index of a key for each row"""
+        return [mmh3.hash(key, seed) % self.width for seed in range(self.depth)]
+
+    def add(self, key, count=1):
+        """
+        :type key: str
+        :type count: int
+        """
+        for row, index in enumerate(self._indexes(key)):
+            self.table[row, index] += count
+
+    def estimate(self, key):
+        """
+        :type key: str
+        :rtype: int
+        """
+        return int(min(self.table[row, index] for row, index in enumerate(self._indexes(key))))
+
+    def merge(self, other):
+        """
+        merges another sketch (of the same shape) into this sketch
+        :type other: CountMinSketch
+        :rtype: CountMinSketch
+        """
+        assert (self.width, self.depth) == (other.width, other.depth), 'sketches must have the same shape'
+        total = self.table.astype(numpy.int64) + other.table
+        self.table = numpy.minimum(total, numpy.iinfo(self.table.dtype).max).astype(self.table.dtype)
+        return self
+
+
+def merge_counters(counter_1, counter_2, limit):
+    """
+    merges a {value: count} counter into another, keeping at most limit values (Space-Saving):
+    once the counter is full, a new value replaces its least frequent value and takes over its count,
+    so counts may be over-estimated but a frequent value is kept even if it first appears after the counter is full.
+    :param dict counter_1: the counter merged into (at most limit values)
+    :param dict counter_2: the counter to merge
+    :type limit: int
+    :rtype: dict
+    """
+    heap = None  # (count, value) of counter_1, built once it is full (entries of updated values are stale)
+    for value, count in counter_2.items():
+        if value in counter_1:
+            counter_1[value] += count
+        elif len(counter_1) < limit:
+            counter_1[value] = count
+        else:
+            if heap is None:
+                heap = [(c, v) for v, c in counter_1.items()]
+                heapq.heapify(heap)
+            min_count, min_value = heapq.heappop(heap)
+            while counter_1.get(min_value) != min_count:
+                min_count, min_value = heapq.heappop(heap)
+            del counter_1[min_value]
+            counter_1[value] = min_count + count
+        if heap is not None:
+            heapq.heappush(heap, (counter_1[value], value))
+    return counter_1
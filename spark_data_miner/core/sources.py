@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Input sources for the miner
+
+A source reads the raw rows of a day's input. Each row is indexable by the MinerField indexes:
+delimited text rows are lists (indexed by position), json lines and parquet rows are dicts (indexed by name).
+"""
+from __future__ import unicode_literals
+
+import csv
+import ujson
+
+
+TEXT_INPUT = 'text'
+JSON_INPUT = 'json'
+PARQUET_INPUT = 'parquet'
+
+INPUT_FORMATS = {TEXT_INPUT, JSON_INPUT, PARQUET_INPUT}
+
+
+class DelimitedTextSource(object):
+    """reads delimited text lines (optionally with header lines) as lists"""
+
+    reads_lines = True
+
+    def __init__(self, delimiter, headers):
+        """
+        :param str delimiter: the field delimiter
+        :param bool headers: whether the files start with a header line (header lines are skipped)
+        """
+        self.delimiter = str(delimiter)
+        self.headers = headers
+
+    def parse_lines(self, lines):
+        """
+        :type lines: pyspark.RDD
+        :rtype: pyspark.RDD
+        """
+        delimiter = self.delimiter
+        if self.headers:
+            header = lines.first().strip()
+            lines = lines.filter(lambda x: header not in x)
+        return lines.map(lambda x: next(csv.reader([x], delimiter=delimiter)))
+
+
+class JsonLinesSource(object):
+    """reads json lines as dicts"""
+
+    reads_lines = True
+
+    @staticmethod
+    def parse_lines(lines):
+        """
+        :type lines: pyspark.RDD
+        :rtype: pyspark.RDD
+        """
+        return lines.filter(lambda x: x.strip()).map(ujson.loads)
+
+
+class ParquetSource(object):
+    """reads parquet files as dicts, reading only the columns the miner needs"""
+
+    reads_lines = False
+
+    @staticmethod
+    def read(session, location, columns):
+        """
+        :type session: pyspark.SparkSession
+        :param str location: the location of the parquet files
+        :param list[str] columns: the columns to read
+        :rtype: pyspark.RDD
+        """
+        return session.read.parquet(location).select(*columns).rdd.map(lambda row: row.asDict())
+
+
+def get_input_source(config):
+    """
+    gets the input source for a miner config
+    :type config: spark_data_miner.core.config.MinerConfig
+    :rtype: DelimitedTextSource|JsonLinesSource|ParquetSource
+    """
+    if config.input_format == JSON_INPUT:
+        return JsonLinesSource()
+    if config.input_format == PARQUET_INPUT:
+        return ParquetSource()
+    return DelimitedTextSource(config.delimiter, config.headers)
+
+
+def get_input_columns(config):
+    """
+    gets the (named) columns a miner config reads from its input
+    :type config: spark_data_miner.core.config.MinerConfig
+    :rtype: list[str]
+    """
+    columns = [config.id_field]
+    for field in config.fields:
+        columns.extend(i for i in field.index if i not in columns)
+    return columns
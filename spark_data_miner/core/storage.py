@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+storage formats for mined datasets
+
+Datasets are stored either as delimited text ("id<TAB>json") or as parquet.
+Parquet datasets have a schema derived from the MinerConfig fields, which allows
+readers to prune columns (features) and push filters down to the files.
+"""
+from __future__ import unicode_literals
+
+import six
+from pyspark.sql.types import ArrayType, BooleanType, DoubleType, LongType, MapType, StringType, StructField, \
+    StructType
+
+
+TEXT_FORMAT = 'text'
+PARQUET_FORMAT = 'parquet'
+
+STORAGE_FORMATS = {TEXT_FORMAT, PARQUET_FORMAT}
+
+GZIP = 'gzip'
+
+# text datasets are written with hadoop codecs, only bzip2 files can be split by readers.
+# zstd requires the cluster to run hadoop 2.9 or later.
+TEXT_COMPRESSION_CODECS = {
+    None: None,
+    GZIP: 'org.apache.hadoop.io.compress.GzipCodec',
+    'bzip2': 'org.apache.hadoop.io.compress.BZip2Codec',
+    'snappy': 'org.apache.hadoop.io.compress.SnappyCodec',
+    'lz4': 'org.apache.hadoop.io.compress.Lz4Codec',
+    'zstd': 'org.apache.hadoop.io.compress.ZStandardCodec',
+}
+
+# parquet files are always splittable (by row group), whatever the codec
+PARQUET_COMPRESSION_CODECS = {
+    None: 'uncompressed',
+    GZIP: 'gzip',
+    'snappy': 'snappy',
+    'lz4': 'lz4',
+    'zstd': 'zstd',
+}
+
+ID_COLUMN = 'id'
+COUNT_COLUMN = 'c'
+
+_RTYPE_SPARK_TYPES = {
+    'int': LongType,
+    'long': LongType,
+    'float': DoubleType,
+    'bool': BooleanType,
+    'str': StringType,
+    'unicode': StringType,
+}
+
+
+def get_compression_codec(storage_format, compression):
+    """
+    gets the codec used to write a dataset in some storage format
+    :type storage_format: str
+    :param str|None compression: the compression name, e.g. "gzip", "zstd" or None for uncompressed
+    :rtype: str|None
+    """
+    codecs = PARQUET_COMPRESSION_CODECS if storage_format == PARQUET_FORMAT else TEXT_COMPRESSION_CODECS
+    if compression not in codecs:
+        raise ValueError('compression for {} datasets must be one of {}'.format(
+            storage_format, sorted(c for c in codecs if c)))
+    return codecs[compression]
+
+
+def get_spark_type(rtype):
+    """
+    gets the spark sql type for a MinerField rtype (values of unknown types are stored as strings)
+    :type rtype: str
+    :rtype: pyspark.sql.types.DataType
+    """
+    return _RTYPE_SPARK_TYPES.get(rtype, StringType)()
+
+
+def _to_string(value):
+    return value if value is None or isinstance(value, six.string_types) else six.text_type(value)
+
+
+def get_column_converter(field):
+    """
+    gets the function converting the stored value of a field to the value of its parquet column:
+    sets are stored as arrays, and values of unknown types are stored as strings (as get_spark_type types them)
+    :type field: spark_data_miner.core.config.MinerField
+    :rtype: Callable
+    """
+    to_string = field.rtype not in _RTYPE_SPARK_TYPES
+    if field.stype == 'dict':
+        if to_string:
+            return lambda value: None if value is None else {_to_string(k): count for k, count in value.items()}
+        return lambda value: value
+    if field.stype == 'set':
+        if to_string:
+            return lambda value: None if value is None else [_to_string(v) for v in value]
+        return lambda value: None if value is None else list(value)
+    if to_string:
+        return _to_string
+    return lambda value: value
+
+
+def get_field_type(field):
+    """
+    gets the spark sql type for a MinerField, considering how the field is stored
+    :type field: spark_data_miner.core.config.MinerField
+    :rtype: pyspark.sql.types.DataType
+    """
+    value_type = get_spark_type(field.rtype)
+    if field.stype == 'dict':
+        return MapType(value_type, LongType())
+    if field.stype == 'set':
+        return ArrayType(value_type)
+    return value_type
+
+
+def get_dataset_schema(config):
+    """
+    gets the parquet schema of a dataset mined with a config
+    :type config: spark_data_miner.core.config.MinerConfig
+    :rtype: pyspark.sql.types.StructType
+    """
+    fields = [StructField(ID_COLUMN, StringType(), False), StructField(COUNT_COLUMN, LongType(), False)]
+    fields.extend(StructField(f.name, get_field_type(f), True) for f in config.fields)
+    return StructType(fields)
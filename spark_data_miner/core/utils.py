@@ -1,25 +1,95 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-"""connection functions for right_person"""
+"""
+connection functions for right_person
+
+Buckets are on s3 unless a local root is set (see set_local_root), in which case
+buckets are directories of the local root and spark reads and writes them with the file protocol.
+"""
 from __future__ import unicode_literals
 
+import bz2
+import io
 import os
+import shutil
+import threading
+import zlib
 
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+
+AWS_MAX_POOL_CONNECTIONS = 50
+AWS_MAX_ATTEMPTS = 10
+
+_S3 = threading.local()
+_LOCAL_ROOT = None
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_aws_config():
+    """
+    Get the config of aws clients: pooled connections and botocore's adaptive retries (backing off when throttled)
+    :rtype: botocore.config.Config
+    """
+    return Config(
+        max_pool_connections=AWS_MAX_POOL_CONNECTIONS, retries={'mode': 'adaptive', 'max_attempts': AWS_MAX_ATTEMPTS})
 
 
-_S3 = None
+def get_aws_client(service, region=None):
+    """
+    Get a shared client for an aws service (and region), created once per process.
+    Clients are thread safe, so they are shared between threads (e.g. concurrent cluster provisioning steps).
+    :param str service: e.g. ec2, iam, ssm
+    :param str region: the region of the client (the default region if None)
+    :rtype: botocore.client.BaseClient
+    """
+    key = (service, region)
+    client = _CLIENTS.get(key)
+    if client is None:
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.get(key)
+            if client is None:
+                client = boto3.session.Session().client(service, region_name=region, config=get_aws_config())
+                _CLIENTS[key] = client
+    return client
 
 
 def get_s3_connection():
     """
-    Get singleton S3 Connection
+    Get the S3 Connection of the current thread.
+    Resources (and the default session) are not thread safe, so each thread (e.g. each day built concurrently)
+    creates its own, from its own session.
     :rtype boto3.resources.base.ServiceResource:
     """
-    global _S3
-    if _S3 is None:
-        _S3 = boto3.resource('s3')
-    return _S3
+    resource = getattr(_S3, 'resource', None)
+    if resource is None:
+        resource = _S3.resource = boto3.session.Session().resource('s3', config=get_aws_config())
+    return resource
+
+
+def set_local_root(local_root):
+    """
+    Use a local directory in place of s3 (e.g. for local runs and benchmarks), or s3 again if local_root is None
+    :type local_root: str|None
+    """
+    global _LOCAL_ROOT
+    _LOCAL_ROOT = os.path.abspath(local_root) if local_root else None
+
+
+def get_local_root():
+    """
+    Get the local directory used in place of s3, if any
+    :rtype: str|None
+    """
+    return _LOCAL_ROOT
+
+
+def _get_local_path(s3_bucket, s3_key):
+    """gets the path of an object in the local root"""
+    return os.path.join(_LOCAL_ROOT, s3_bucket, s3_key)
 
 
 def get_spark_s3_files(s3_bucket, s3_prefix):
@@ -29,4 +99,206 @@ def get_spark_s3_files(s3_bucket, s3_prefix):
     :type s3_prefix: str
     :rtype: str
     """
-    return 's3a://{}'.format(os.path.join(s3_bucket, s3_prefix))
\ No newline at end of file
+    if _LOCAL_ROOT:
+        return 'file://{}'.format(_get_local_path(s3_bucket, s3_prefix))
+    return 's3a://{}'.format(os.path.join(s3_bucket, s3_prefix))
+
+
+def _list_local_objects(s3_bucket, s3_prefix):
+    """lists the objects (and their sizes) under a prefix of a local bucket"""
+    bucket_path = os.path.join(_LOCAL_ROOT, s3_bucket)
+    objects = []
+    for directory, _, file_names in os.walk(bucket_path):
+        for file_name in file_names:
+            path = os.path.join(directory, file_name)
+            key = os.path.relpath(path, bucket_path).replace(os.sep, '/')
+            if key.startswith(s3_prefix):
+                objects.append((key, os.path.getsize(path)))
+    return sorted(objects)
+
+
+def list_s3_objects(s3_bucket, s3_prefix):
+    """
+    list the objects (and their sizes) under an s3 prefix, ignoring empty objects and markers
+    :type s3_bucket: str
+    :type s3_prefix: str
+    :rtype: list[tuple[str, int]]
+    """
+    if _LOCAL_ROOT:
+        objects = _list_local_objects(s3_bucket, s3_prefix)
+    else:
+        objects = [(o.key, o.size) for o in get_s3_connection().Bucket(s3_bucket).objects.filter(Prefix=s3_prefix)]
+    return [(key, size) for key, size in objects if size and not key.endswith('/')]
+
+
+def get_s3_prefix_size(s3_bucket, s3_prefix):
+    """
+    get the total size (in bytes) of the objects under an s3 prefix
+    :type s3_bucket: str
+    :type s3_prefix: str
+    :rtype: int
+    """
+    return sum(size for key, size in list_s3_objects(s3_bucket, s3_prefix))
+
+
+def group_s3_objects(objects, split_size):
+    """
+    groups s3 objects into splits of (roughly) a target size, keeping the listing order.
+    objects larger than the split size are a split of their own.
+    :param list[tuple[str, int]] objects: the object keys and sizes
+    :param int split_size: the target size (in bytes) of a split
+    :rtype: list[list[str]]
+    """
+    splits = []
+    split, total = [], 0
+    for key, size in objects:
+        if split and total + size > split_size:
+            splits.append(split)
+            split, total = [], 0
+        split.append(key)
+        total += size
+    if split:
+        splits.append(split)
+    return splits
+
+
+def _get_decompressor(s3_key):
+    """gets a streaming decompressor for an s3 object, based on its extension"""
+    if s3_key.endswith('.gz'):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if s3_key.endswith('.bz2'):
+        return bz2.BZ2Decompressor()
+    return None
+
+
+def _decompress(decompressor, s3_key, data):
+    """
+    decompresses a chunk of a (possibly multi-member, e.g. concatenated) gzip or bzip2 object.
+    a decompressor stops at the end of its member, so a new decompressor is started for the data after it.
+    :type decompressor: zlib.Decompress|bz2.BZ2Decompressor
+    :type s3_key: str
+    :type data: bytes
+    :rtype: tuple[bytes, zlib.Decompress|bz2.BZ2Decompressor]
+    :returns: the decompressed data and the decompressor of the chunk's last member
+    """
+    output = []
+    while data:
+        if getattr(decompressor, 'eof', False) or decompressor.unused_data:
+            decompressor = _get_decompressor(s3_key)
+        try:
+            output.append(decompressor.decompress(data))
+        except EOFError:  # python 2 bzip2 decompressors raise at the end of their member
+            decompressor = _get_decompressor(s3_key)
+            continue
+        data = decompressor.unused_data
+    return b''.join(output), decompressor
+
+
+def read_s3_lines(s3_bucket):
+    """
+    This function returns a function (that can be serialized) for a spark job to read the lines of a split of s3 objects
+    gzip and bzip2 objects (including concatenated members) are decompressed (by extension) as they are streamed.
+    :type s3_bucket: str
+    :returns: types.FuncType
+    """
+    chunk_size = 1024 ** 2
+    local_root = _LOCAL_ROOT
+
+    def open_object(client, s3_key):
+        if local_root:
+            return io.open(os.path.join(local_root, s3_bucket, s3_key), 'rb')
+        return client.get_object(Bucket=s3_bucket, Key=s3_key)['Body']
+
+    def read_object(client, s3_key):
+        body = open_object(client, s3_key)
+        decompressor = _get_decompressor(s3_key)
+        remainder = b''
+        for chunk in iter(lambda: body.read(chunk_size), b''):
+            if decompressor is not None:
+                chunk, decompressor = _decompress(decompressor, s3_key, chunk)
+            lines = (remainder + chunk).split(b'\n')
+            remainder = lines.pop()
+            for line in lines:
+                yield line.rstrip(b'\r').decode('utf-8')
+        if remainder:
+            yield remainder.rstrip(b'\r').decode('utf-8')
+        body.close()
+
+    def read_s3_split(s3_keys):
+        client = None if local_root else get_aws_client('s3')
+        for s3_key in s3_keys:
+            for line in read_object(client, s3_key):
+                yield line
+
+    return read_s3_split
+
+
+def get_s3_object(s3_bucket, s3_key):
+    """
+    get the contents of an s3 object, or None if the object doesn't exist
+    :type s3_bucket: str
+    :type s3_key: str
+    :rtype: bytes|None
+    """
+    if _LOCAL_ROOT:
+        path = _get_local_path(s3_bucket, s3_key)
+        if not os.path.isfile(path):
+            return None
+        with io.open(path, 'rb') as f:
+            return f.read()
+    try:
+        return get_s3_connection().Object(s3_bucket, s3_key).get()['Body'].read()
+    except ClientError as e:
+        if e.response['Error']['Code'] in {'NoSuchKey', '404'}:
+            return None
+        raise
+
+
+def put_s3_object(s3_bucket, s3_key, body):
+    """
+    put an object on s3
+    :type s3_bucket: str
+    :type s3_key: str
+    :type body: bytes|str
+    """
+    if _LOCAL_ROOT:
+        path = _get_local_path(s3_bucket, s3_key)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with io.open(path, 'wb') as f:
+            f.write(body if isinstance(body, bytes) else body.encode('utf-8'))
+        return
+    get_s3_connection().Object(s3_bucket, s3_key).put(Body=body)
+
+
+def s3_object_exists(s3_bucket, s3_key):
+    """
+    check if an s3 object exists (without listing)
+    :type s3_bucket: str
+    :type s3_key: str
+    :rtype: bool
+    """
+    if _LOCAL_ROOT:
+        return os.path.isfile(_get_local_path(s3_bucket, s3_key))
+    try:
+        get_s3_connection().Object(s3_bucket, s3_key).load()
+    except ClientError as e:
+        if e.response['Error']['Code'] in {'NoSuchKey', '404'}:
+            return False
+        raise
+    return True
+
+
+def delete_s3_prefix(s3_bucket, s3_prefix):
+    """
+    delete every object under an s3 prefix
+    :type s3_bucket: str
+    :type s3_prefix: str
+    """
+    if _LOCAL_ROOT:
+        for key, _ in _list_local_objects(s3_bucket, s3_prefix):
+            os.remove(_get_local_path(s3_bucket, key))
+        if s3_prefix.endswith('/') and os.path.isdir(_get_local_path(s3_bucket, s3_prefix)):
+            shutil.rmtree(_get_local_path(s3_bucket, s3_prefix))
+        return
+    get_s3_connection().Bucket(s3_bucket).objects.filter(Prefix=s3_prefix).delete()
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from right_person.ml_utils.data.transformations import collect_sparse_vectors
+
+
+class TestCollectSparseVectors(unittest.TestCase):
+
+    def test_collect(self):
+        labelled_vectors = [([1, 3], 1), ([], 0), ([0, 2, 3], 0)]
+        matrix, labels = collect_sparse_vectors(labelled_vectors, 4, initial_rows=1)
+        self.assertEqual(matrix.shape, (3, 4))
+        self.assertEqual(matrix.toarray().astype(int).tolist(), [[0, 1, 0, 1], [0, 0, 0, 0], [1, 0, 1, 1]])
+        self.assertEqual(labels.tolist(), [1, 0, 0])
+
+    def test_no_vectors(self):
+        matrix, labels = collect_sparse_vectors([], 4)
+        self.assertEqual(matrix.shape, (0, 4))
+        self.assertEqual(len(labels), 0)
+
+    def test_memory_budget(self):
+        labelled_vectors = [(list(range(10)), 1)] * 100
+        collect_sparse_vectors(labelled_vectors, 10, memory_budget=10000, initial_rows=1)
+        with self.assertRaises(MemoryError):
+            collect_sparse_vectors(labelled_vectors, 10, memory_budget=1000, initial_rows=1)
@@ -23,3 +23,24 @@ class TestNewModel(unittest.TestCase):
     def test_intercept(self):
         model = RightPersonModel('name', 'account')
         self.assertEqual(model.intercept, 0)
+
+
+class TestVectors(unittest.TestCase):
+
+    def test_vectorizer(self):
+        model = RightPersonModel('name', 'account', features=['domain', 'size'])
+        profile = {'domain': {'example.com': 2}, 'size': {'300x250'}, 'other': {'ignored'}}
+        self.assertEqual(model.vectorizer(profile), model.get_right_person_vector(profile, model.features))
+        self.assertEqual(len(model.vectorizer(profile)), 2)
+
+    def test_vectorizer_lists(self):
+        model = RightPersonModel('name', 'account', features=['size'])
+        self.assertEqual(model.vectorizer({'size': ['300x250']}), model.vectorizer({'size': {'300x250'}}))
+
+    def test_predict_vectors(self):
+        model = RightPersonModel('name', 'account', features=['size'], hash_size=100)
+        profiles = [{'size': {'300x250'}}, {'size': {'728x90'}}, {'size': {'300x250', '160x600'}}]
+        model.partial_fit(profiles, [1, 0, 1])
+        matrix = model.combine_vectors([model.vectorizer(profile) for profile in profiles])
+        for prediction, profile in zip(model.predict_vectors(matrix), profiles):
+            self.assertAlmostEqual(prediction, model.predict(profile))
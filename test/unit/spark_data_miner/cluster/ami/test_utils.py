@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from spark_data_miner.cluster.ami.constants import JARS_TAG, S3A_JARS, PACKAGE_VERSION_TAG, PACKAGE_HASH_TAG
+from spark_data_miner.cluster.ami.utils import get_jar_file_name, get_jar_url, has_baked_jars, has_baked_package
+from spark_data_miner.cluster.utils import get_installed_package_hash, get_package_version
+
+
+class TestBakedDependencies(unittest.TestCase):
+
+    def test_jar_url(self):
+        coordinates = 'org.apache.hadoop:hadoop-aws:2.7.5'
+        self.assertEqual(get_jar_file_name(coordinates), 'hadoop-aws-2.7.5.jar')
+        self.assertEqual(
+            get_jar_url(coordinates),
+            'https://repo1.maven.org/maven2/org/apache/hadoop/hadoop-aws/2.7.5/hadoop-aws-2.7.5.jar')
+
+    def test_baked_jars(self):
+        self.assertTrue(has_baked_jars({'Tags': [{'Key': JARS_TAG, 'Value': ','.join(S3A_JARS)}]}))
+        self.assertFalse(has_baked_jars({'Tags': [{'Key': JARS_TAG, 'Value': 'org.apache.hadoop:hadoop-aws:2.7.3'}]}))
+        self.assertFalse(has_baked_jars({}))
+
+    def test_package_without_version_tag(self):
+        self.assertFalse(has_baked_package({'Tags': [{'Key': PACKAGE_VERSION_TAG, 'Value': ''}]}))
+
+    def test_package_is_compared_by_hash(self):
+        self.assertTrue(has_baked_package({'Tags': [{'Key': PACKAGE_HASH_TAG, 'Value': get_installed_package_hash()}]}))
+        self.assertFalse(has_baked_package({'Tags': [{'Key': PACKAGE_HASH_TAG, 'Value': 'stale'}]}))
+
+    def test_source_checkout_has_no_version(self):
+        self.assertIsNone(get_package_version())  # the tests run from the repository
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from spark_data_miner.cluster.components import waiters
+from spark_data_miner.cluster.components.waiters import get_backoff_delays, poll, retry
+
+
+class TestWaiters(unittest.TestCase):
+
+    def setUp(self):
+        self.sleeps = []
+        self._sleep = waiters.time.sleep
+        waiters.time.sleep = self.sleeps.append
+
+    def tearDown(self):
+        waiters.time.sleep = self._sleep
+
+    def test_backoff_delays(self):
+        delays = list(get_backoff_delays(100, initial_delay=1, max_delay=20))
+        self.assertAlmostEqual(sum(delays), 100)
+        self.assertTrue(all(delay <= 20 for delay in delays))
+        self.assertGreater(max(delays), delays[0])
+
+    def test_poll(self):
+        values = iter(range(10))
+        self.assertEqual(poll(lambda: next(values), lambda value: value >= 3, timeout=100), 3)
+        self.assertEqual(len(self.sleeps), 3)
+
+    def test_poll_timeout(self):
+        self.assertEqual(poll(lambda: 'pending', lambda value: value == 'running', timeout=10), 'pending')
+        self.assertAlmostEqual(sum(self.sleeps), 10)
+
+    def test_retry(self):
+        calls = []
+
+        def call():
+            calls.append(1)
+            if len(calls) < 3:
+                raise ValueError('not yet')
+            return 'done'
+
+        self.assertEqual(retry(call, (ValueError, ), timeout=100), 'done')
+        with self.assertRaises(ValueError):
+            retry(lambda: int('x'), (ValueError, ), timeout=5)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from spark_data_miner.cluster.manager import access
+from spark_data_miner.cluster.manager.access import run_steps, ClusterManager, ClusterPlan, get_registry_path, \
+    list_cluster_ids, read_cluster_registry, reap_idle_clusters, get_idle_cluster_ids, reap_idle_clusters_in_background
+from spark_data_miner.cluster.utils import EC2Properties
+
+
+class TestRunSteps(unittest.TestCase):
+
+    def test_dependencies_run_first(self):
+        order = []
+        lock = threading.Lock()
+
+        def step(name):
+            def run():
+                with lock:
+                    order.append(name)
+            return run
+
+        steps = {name: step(name) for name in 'abcd'}
+        run_steps(steps, {'b': ('a', ), 'c': ('a', ), 'd': ('b', 'c')})
+        self.assertEqual(order[0], 'a')
+        self.assertEqual(order[-1], 'd')
+        self.assertEqual(sorted(order), list('abcd'))
+
+    def test_independent_steps_run_concurrently(self):
+        started = {'a': threading.Event(), 'b': threading.Event()}
+        met = []
+
+        def step(name, other):
+            def run():
+                started[name].set()
+                met.append(started[other].wait(5))  # only set if the other step runs at the same time
+            return run
+
+        run_steps({'a': step('a', 'b'), 'b': step('b', 'a')}, {})
+        self.assertEqual(met, [True, True])
+
+    def test_failures_stop_dependent_steps(self):
+        ran = []
+
+        def fail():
+            raise ValueError('failed')
+
+        with self.assertRaises(ValueError):
+            run_steps({'a': fail, 'b': lambda: ran.append('b')}, {'b': ('a', )})
+        self.assertEqual(ran, [])
+
+
+class TestClusterRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self._directory = access.CLUSTER_REGISTRY_DIRECTORY
+        access.CLUSTER_REGISTRY_DIRECTORY = self.directory
+
+    def tearDown(self):
+        access.CLUSTER_REGISTRY_DIRECTORY = self._directory
+        shutil.rmtree(self.directory)
+
+    def write_registry(self, cluster_id, idle_until, reaper=None, session=None):
+        state = {
+            'plan': ['r5.xlarge', 'r5.2xlarge', 3], 'registry': {'policies': []}, 'idle_until': idle_until,
+            'reaper': reaper, 'session': session,
+        }
+        with open(get_registry_path(cluster_id), 'w') as f:
+            json.dump(state, f)
+
+    def test_no_clusters(self):
+        self.assertEqual(list_cluster_ids(), [])
+        self.assertIsNone(read_cluster_registry('missing'))
+
+    def test_from_registry(self):
+        self.write_registry('warm', None)
+        self.assertEqual(list_cluster_ids(), ['warm'])
+        manager = ClusterManager.from_registry('warm')
+        manager.release()
+        self.assertEqual(manager.plan, ClusterPlan('r5.xlarge', 'r5.2xlarge', 3))
+        self.assertEqual(manager.registry, {'policies': []})
+
+    def test_clusters_in_use_or_within_ttl_are_kept(self):
+        self.write_registry('in-use', None)
+        self.write_registry('warm', time.time() + 600)
+        self.assertEqual(reap_idle_clusters(), [])
+        self.assertTrue(os.path.isfile(get_registry_path('warm')))
+
+    def test_idle_clusters(self):
+        self.write_registry('in-use', None)
+        self.write_registry('idle', time.time() - 1)
+        self.write_registry('excluded', time.time() - 1)
+        self.assertEqual(get_idle_cluster_ids(exclude={'excluded'}), ['idle'])
+
+    def test_no_reaper_without_idle_clusters(self):
+        self.write_registry('in-use', None)
+        self.assertFalse(reap_idle_clusters_in_background())
+
+    def test_attach_to_other_instance_types(self):
+        self.write_registry('warm', time.time() + 600)
+        manager = ClusterManager(ClusterPlan('r5.xlarge', 'r5.4xlarge', 3), 'warm')
+        manager._instance_properties = EC2Properties('eu-west-1', *[None] * 7)  # not read from the ec2 metadata
+        self.assertFalse(manager._ClusterManager__attach())
+        self.assertIsNone(read_cluster_registry('warm'))
+
+    def test_clusters_in_use_are_not_attached(self):
+        self.write_registry('warm', None, session=os.getpid())
+        manager = ClusterManager(ClusterPlan('r5.xlarge', 'r5.2xlarge', 3), 'warm')
+        with self.assertRaises(RuntimeError):
+            manager._ClusterManager__attach()
+        self.assertEqual(read_cluster_registry('warm')['session'], os.getpid())
+        manager.release()
+
+    def test_session_in_registry(self):
+        self.write_registry('warm', time.time() + 600, session=1)
+        manager = ClusterManager.from_registry('warm')
+        manager.release()
+        self.assertEqual(read_cluster_registry('warm')['session'], 1)
+
+    def test_clusters_being_reaped_are_skipped(self):
+        stopped = subprocess.Popen([sys.executable, '-c', 'pass'])
+        stopped.wait()
+        self.write_registry('reaping', time.time() - 1, reaper=os.getpid())
+        self.write_registry('failed', time.time() - 1, reaper=stopped.pid)
+        self.assertEqual(get_idle_cluster_ids(), ['failed'])
+
+    def test_save_replaces_registry(self):
+        self.write_registry('warm', time.time() + 600)
+        ClusterManager.from_registry('warm').release()
+        self.assertEqual(os.listdir(self.directory), ['warm.json'])
+
+    def test_claim(self):
+        self.write_registry('warm', time.time() - 1)
+        manager = ClusterManager.from_registry('warm')
+        manager.claim(os.getpid())
+        manager.release()
+        state = read_cluster_registry('warm')
+        self.assertEqual(state['reaper'], os.getpid())
+        self.assertEqual(get_idle_cluster_ids(), [])
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import datetime
+import shutil
+import tempfile
+import unittest
+
+from spark_data_miner.cluster.manager.access import ClusterPlan
+from spark_data_miner.cluster.manager.planning import get_cluster_plan, estimate_seconds, get_node_cores, \
+    get_core_throughput, get_pending_input_size, STARTUP_SECONDS
+from spark_data_miner.core.benchmark import get_synthetic_config, generate_auction_logs
+from spark_data_miner.core.miner import SparkDatasetMiner
+from spark_data_miner.core.utils import set_local_root
+
+
+class TestClusterPlanning(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        set_local_root(self.root)
+        self.miner = SparkDatasetMiner(get_synthetic_config([10, 10]), 'mined', data_max_age=2)
+        self.miner.run_date = datetime.datetime(2019, 1, 3)
+        for date in self.miner._dates:
+            generate_auction_logs(
+                self.miner.get_dataset_input_location(date)[len('file://'):], 100, 10000, [10, 10], files=2)
+
+    def tearDown(self):
+        set_local_root(None)
+        shutil.rmtree(self.root)
+
+    def test_node_cores(self):
+        self.assertEqual(get_node_cores('r5.4xlarge'), 15)
+
+    def test_plan_is_sized_to_the_input(self):
+        small = get_cluster_plan([self.miner], target_seconds=STARTUP_SECONDS + 1, core_throughput=1024)
+        self.assertEqual(small.node_type, 'r5.4xlarge')
+        self.assertGreater(small.node_count, 1)
+        slow = get_cluster_plan([self.miner], target_seconds=STARTUP_SECONDS + 1, core_throughput=10)
+        self.assertGreater(slow.node_count, small.node_count)
+        self.assertEqual(get_cluster_plan([self.miner], max_nodes=3, core_throughput=0.001).node_count, 3)
+
+    def test_estimate(self):
+        plan = ClusterPlan('r5.xlarge', 'r5.4xlarge', 2)
+        self.assertEqual(estimate_seconds(plan, 30 * 1024 ** 2, core_throughput=1024 ** 2), STARTUP_SECONDS + 1)
+
+    def test_throughput_per_instance_type(self):
+        self.assertEqual(get_core_throughput('r5.4xlarge', 1024 ** 2), 1024 ** 2)
+        self.assertEqual(get_core_throughput('c5.4xlarge', 1024 ** 2), 1024 ** 2 / 2)  # 2 GiB per vcpu
+        self.assertEqual(get_core_throughput('r5.large', 1024 ** 3), 0.625 * 1000 ** 3 / 8)  # network bound
+        memory_optimized, compute_optimized = [
+            get_cluster_plan([self.miner], STARTUP_SECONDS + 1, node_type=node_type, core_throughput=1024)
+            for node_type in ('r5.4xlarge', 'c5.4xlarge')]
+        self.assertGreater(compute_optimized.node_count, memory_optimized.node_count)
+
+    def test_run_date_is_not_set(self):
+        miner = SparkDatasetMiner(get_synthetic_config([10, 10]), 'mined', data_max_age=2)
+        self.assertEqual(get_pending_input_size(miner), 0)
+        self.assertIsNone(miner.run_date)
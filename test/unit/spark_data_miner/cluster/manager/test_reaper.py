@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import datetime
+import json
+import shutil
+import tempfile
+import unittest
+
+from spark_data_miner.cluster.manager import access, reaper
+from spark_data_miner.cluster.manager.access import get_registry_path
+from spark_data_miner.cluster.manager.reaper import get_orphaned_clusters, get_iam_name_pattern
+
+
+class TestOrphanedClusters(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self._directory, self._get_tagged_instances = access.CLUSTER_REGISTRY_DIRECTORY, reaper.get_tagged_instances
+        access.CLUSTER_REGISTRY_DIRECTORY = self.directory
+        now = datetime.datetime.utcnow()
+        instances = {
+            'old': [{'LaunchTime': now - datetime.timedelta(hours=20)}, {'LaunchTime': now}],
+            'new': [{'LaunchTime': now - datetime.timedelta(hours=1)}],
+            'known': [{'LaunchTime': now - datetime.timedelta(hours=20)}],
+        }
+        self.owners = []
+
+        def get_tagged_instances(region, owner):
+            self.owners.append(owner)
+            return instances
+
+        reaper.get_tagged_instances = get_tagged_instances
+        with open(get_registry_path('known'), 'w') as f:
+            json.dump({'plan': [None, None, 0], 'registry': {}, 'idle_until': None}, f)
+
+    def tearDown(self):
+        access.CLUSTER_REGISTRY_DIRECTORY, reaper.get_tagged_instances = self._directory, self._get_tagged_instances
+        shutil.rmtree(self.directory)
+
+    def test_orphans_are_old_clusters_without_a_registry(self):
+        self.assertEqual(get_orphaned_clusters('eu-west-1', min_age=12), ['old'])
+        self.assertEqual(get_orphaned_clusters('eu-west-1', min_age=0.5), ['new', 'old'])
+
+    def test_only_this_hosts_clusters_are_orphans(self):
+        get_orphaned_clusters('eu-west-1', min_age=12)
+        self.assertEqual(self.owners, [access.get_owner_id()])
+
+
+class TestIamNames(unittest.TestCase):
+
+    def test_exact_names(self):
+        pattern = get_iam_name_pattern('0b5b-7a4e')
+        self.assertTrue(pattern.match('spark-data-miner-0b5b-7a4e-1580000000'))
+        self.assertFalse(pattern.match('spark-data-miner-0b5b-7a4e-f-1580000000'))
+        self.assertFalse(pattern.match('spark-data-miner-x0b5b-7a4e-1580000000'))
+        self.assertFalse(pattern.match('spark-data-miner-0-0b5b-7a4e-1580000000'))
+
+    def test_policy_names(self):
+        pattern = get_iam_name_pattern('0b5b-7a4e', policy=True)
+        self.assertTrue(pattern.match('spark-data-miner-1-0b5b-7a4e-1580000000'))
+        self.assertFalse(pattern.match('spark-data-miner-0b5b-7a4e-1580000000'))
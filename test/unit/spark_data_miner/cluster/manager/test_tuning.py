@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from spark_data_miner.cluster.manager.access import ClusterPlan
+from spark_data_miner.cluster.manager.tuning import get_executor_layout, get_tuning_profile, MIN_HEAP_MEMORY
+
+
+class TestTuningProfile(unittest.TestCase):
+
+    def test_executor_layout(self):
+        self.assertEqual(get_executor_layout(16), (5, 3))
+        self.assertEqual(get_executor_layout(4), (3, 1))
+        self.assertEqual(get_executor_layout(1), (1, 1))
+
+    def test_profile(self):
+        profile = get_tuning_profile(ClusterPlan('r5.xlarge', 'r5.4xlarge', 10), 128, 16)
+        self.assertEqual(profile['spark.executor.cores'], '5')
+        self.assertEqual(profile['spark.cores.max'], '150')
+        self.assertEqual(profile['spark.default.parallelism'], '300')
+        heap = int(profile['spark.executor.memory'][:-1])
+        python = int(profile['spark.python.worker.memory'][:-1]) * 5
+        self.assertLess((heap + python) * 3, (128 - 3) * 1024)
+        self.assertNotIn('spark.executor.instances', profile)
+        self.assertNotIn('spark.executor.memoryOverhead', profile)
+
+    def test_fewer_larger_executors(self):
+        profile = get_tuning_profile(ClusterPlan('r5.xlarge', 'c5.4xlarge', 2), 5, 16)
+        self.assertEqual(profile['spark.executor.cores'], '15')
+        self.assertEqual(profile['spark.cores.max'], '30')
+        self.assertGreaterEqual(int(profile['spark.executor.memory'][:-1]), MIN_HEAP_MEMORY)
+
+    def test_too_little_memory(self):
+        with self.assertRaises(ValueError):
+            get_tuning_profile(ClusterPlan('r5.xlarge', 'c5.large', 2), 4, 2)
+
+    def test_overrides(self):
+        profile = get_tuning_profile(
+            ClusterPlan('r5.xlarge', 'r5.xlarge', 2), 32, 4, overrides={'spark.sql.shuffle.partitions': 1000})
+        self.assertEqual(profile['spark.sql.shuffle.partitions'], '1000')
+        self.assertEqual(profile['spark.default.parallelism'], '12')
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import zipfile
+
+from spark_data_miner.cluster import utils
+from spark_data_miner.cluster.components import waiters
+from spark_data_miner.cluster.utils import wait_for_workers, get_instance_specs, get_instance_memory, \
+    get_instance_vcpus, _get_nvme_storage, get_package_archive, evict_package_archives, SHIPPED_PACKAGES
+
+
+class TestInstanceSpecs(unittest.TestCase):
+
+    def test_bundled_specs(self):
+        specs = get_instance_specs('r5d.4xlarge')
+        self.assertEqual((specs.memory, specs.vcpus, specs.nvme), (128, 16, 600))
+
+    def test_memory_and_vcpus(self):
+        self.assertEqual(get_instance_memory('r4.large'), 15)
+        self.assertEqual(get_instance_vcpus('c5.9xlarge'), 36)
+
+    def test_nvme_storage(self):
+        self.assertEqual(_get_nvme_storage('2 x 300 NVMe SSD'), 600)
+        self.assertEqual(_get_nvme_storage('1 x 1,900 NVMe SSD'), 1900)
+        self.assertEqual(_get_nvme_storage('EBS only'), 0)
+
+
+class TestWaitForWorkers(unittest.TestCase):
+
+    def setUp(self):
+        self._get_alive_workers, self._sleep = utils.get_alive_workers, waiters.time.sleep
+        waiters.time.sleep = lambda delay: None
+        self.workers = iter(range(100))
+        utils.get_alive_workers = lambda master_ip: next(self.workers)
+
+    def tearDown(self):
+        utils.get_alive_workers, waiters.time.sleep = self._get_alive_workers, self._sleep
+
+    def test_wait_for_fraction(self):
+        self.assertEqual(wait_for_workers('127.0.0.1', 10, fraction=0.8), 8)
+
+    def test_wait_for_at_least_one(self):
+        self.assertEqual(wait_for_workers('127.0.0.1', 10, fraction=0), 1)
+
+
+class TestPackageArchives(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self._directory = utils.PACKAGE_CACHE_DIRECTORY
+        utils.PACKAGE_CACHE_DIRECTORY = self.directory
+
+    def tearDown(self):
+        utils.PACKAGE_CACHE_DIRECTORY = self._directory
+        shutil.rmtree(self.directory)
+
+    def test_archive_is_cached(self):
+        archive = get_package_archive('spark_data_miner')
+        self.assertEqual(get_package_archive('spark_data_miner'), archive)
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(archive)])
+
+    def test_archive_has_only_python_files(self):
+        names = zipfile.ZipFile(get_package_archive('spark_data_miner')).namelist()
+        self.assertIn('spark_data_miner/core/miner.py', names)
+        self.assertTrue(all(name.startswith('spark_data_miner/') and name.endswith('.py') for name in names))
+
+    def test_shipped_packages(self):
+        names = set()
+        for package_name in SHIPPED_PACKAGES:
+            names.update(zipfile.ZipFile(get_package_archive(package_name)).namelist())
+        self.assertIn('spark_data_miner/__init__.py', names)
+        self.assertIn('right_person/__init__.py', names)
+        self.assertIn('right_person/models/core.py', names)  # the vectorizers run on executors
+        self.assertFalse([name for name in names if '__pycache__' in name])
+
+    def test_eviction(self):
+        for i in range(5):
+            path = os.path.join(self.directory, 'package-{}.zip'.format(i))
+            open(path, 'w').close()
+            os.utime(path, (time.time() + i, time.time() + i))
+        evict_package_archives(self.directory, cache_size=2)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['package-3.zip', 'package-4.zip'])
+
+    def test_abandoned_temporary_archives_are_removed(self):
+        for name, age in [('abandoned.tmp', 2 * utils.PACKAGE_TEMPORARY_TTL), ('writing.tmp', 0)]:
+            path = os.path.join(self.directory, name)
+            open(path, 'w').close()
+            os.utime(path, (time.time() - age, time.time() - age))
+        evict_package_archives(self.directory)
+        self.assertEqual(os.listdir(self.directory), ['writing.tmp'])
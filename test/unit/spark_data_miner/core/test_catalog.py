@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from spark_data_miner.core.catalog import DatasetManifest, DatasetCatalog, get_config_fingerprint
+from spark_data_miner.core.config import MinerConfig, MinerField
+
+
+def get_config(fields):
+    return MinerConfig('name', ',', fields, 0, False, 'bucket', 'prefix/%Y-%m-%d')
+
+
+class TestDatasetManifest(unittest.TestCase):
+
+    def test_json(self):
+        manifest = DatasetManifest('2019-01-01', True, 10, 100, 1000, 'abc', 'text', 'gzip', '2019-01-02T00:00:00')
+        self.assertEqual(DatasetManifest.from_json(manifest.to_json()), manifest)
+        self.assertEqual(DatasetManifest.from_json(manifest.to_json().encode('utf-8')), manifest)
+
+
+class TestDatasetCatalog(unittest.TestCase):
+
+    def test_fingerprint(self):
+        config = get_config([MinerField('field', [1], 'str', 'set')])
+        same_config = get_config([MinerField('field', [1], 'str', 'set')])
+        other_config = get_config([MinerField('field', [1], 'str', 'dict')])
+        self.assertEqual(get_config_fingerprint(config), get_config_fingerprint(same_config))
+        self.assertNotEqual(get_config_fingerprint(config), get_config_fingerprint(other_config))
+
+    def test_is_current(self):
+        catalog = DatasetCatalog('bucket', 'prefix', 'abc', 'text', 'gzip')
+        manifest = DatasetManifest('2019-01-01', True, 10, 100, 1000, 'abc', 'text', 'gzip', '2019-01-02T00:00:00')
+        self.assertTrue(catalog.is_current(manifest))
+        self.assertFalse(catalog.is_current(manifest._replace(fingerprint='def')))
+        self.assertFalse(catalog.is_current(manifest._replace(complete=False)))
+        self.assertFalse(catalog.is_current(None))
+
+    def test_is_current_checks_storage(self):
+        catalog = DatasetCatalog('bucket', 'prefix', 'abc', 'parquet', 'zstd')
+        manifest = DatasetManifest('2019-01-01', True, 10, 100, 1000, 'abc', 'parquet', 'zstd', '2019-01-02T00:00:00')
+        self.assertTrue(catalog.is_current(manifest))
+        self.assertFalse(catalog.is_current(manifest._replace(storage_format='text')))
+        self.assertFalse(catalog.is_current(manifest._replace(compression='gzip')))
+        self.assertFalse(catalog.is_current(manifest._replace(compression=None)))
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+from collections import namedtuple
+
+from pyspark.sql import Row
+
+from spark_data_miner.core.benchmark import get_synthetic_config, generate_auction_logs, BENCHMARK_BUCKET, \
+    BENCHMARK_OUTPUT_BUCKET
+from spark_data_miner.core.config import MinerConfig, MinerField
+from spark_data_miner.core.miner import SparkDatasetMiner, ROLLUP_MANIFEST
+from spark_data_miner.core.storage import get_dataset_schema
+from spark_data_miner.core.utils import set_local_root, put_s3_object
+
+
+MINED_RECORD = ('user-1', {'c': 7, 'field_0': {'0-1': 4, '0-2': 3}, 'field_1': {'1-0', '1-2'}})
+LOADED_RECORD = ('user-1', {'c': 7, 'field_0': {'0-1': 4, '0-2': 3}, 'field_1': {'1-0', '1-2'}})
+
+
+def get_miner(storage_format='text', data_max_age=2):
+    miner = SparkDatasetMiner(
+        get_synthetic_config([5, 3]), BENCHMARK_OUTPUT_BUCKET, data_max_age=data_max_age, storage_format=storage_format)
+    miner.run_date = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return miner
+
+
+def get_local_session():
+    """gets a local spark session, skipping the tests that need one if spark can't run here (e.g. without java)"""
+    from spark_data_miner.cluster.manager.session import get_local_spark_session
+    # noinspection PyBroadException
+    try:
+        return get_local_spark_session(2, driver_memory='1g')
+    except Exception as e:
+        raise unittest.SkipTest('a local spark session is not available: {}'.format(e))
+
+
+class TestStoredRecords(unittest.TestCase):
+
+    def test_text_round_trip(self):
+        miner = get_miner()
+        self.assertEqual(miner.load_record(miner.store_record(MINED_RECORD)), LOADED_RECORD)
+
+    def test_text_contributions_round_trip(self):
+        miner = get_miner()
+        contributions = ('user-1', {'2019-01-01': MINED_RECORD[1], '2019-01-02': {'c': 5, 'field_1': {'1-1'}}})
+        self.assertEqual(miner.load_contributions(miner.store_contributions(contributions)), contributions)
+
+    def test_text_projection(self):
+        miner = get_miner()
+        loaded = miner.get_load_record(['field_1'], as_sets=False)(miner.store_record(MINED_RECORD))
+        self.assertEqual(loaded[0], 'user-1')
+        self.assertEqual(loaded[1]['c'], 7)
+        self.assertEqual(sorted(loaded[1]['field_1']), ['1-0', '1-2'])
+        self.assertNotIn('field_0', loaded[1])
+
+    def test_parquet_round_trip(self):
+        miner = get_miner('parquet')
+        schema = get_dataset_schema(miner.config)
+        row = Row(*schema.names)(*miner.store_row(MINED_RECORD))
+        self.assertEqual(miner.get_load_row(['field_0', 'field_1'])(row), LOADED_RECORD)
+
+    def test_parquet_missing_fields(self):
+        miner = get_miner('parquet')
+        schema = get_dataset_schema(miner.config)
+        row = Row(*schema.names)(*miner.store_row(('user-2', {'c': 5, 'field_1': ['1-1']})))
+        loaded = ('user-2', {'c': 5, 'field_0': None, 'field_1': {'1-1'}})
+        self.assertEqual(miner.get_load_row(['field_0', 'field_1'])(row), loaded)
+
+    def test_parquet_unknown_types_are_strings(self):
+        fields = [MinerField('size', [1, 2], 'tuple', 'set'), MinerField('bid', [3], 'len')]
+        config = MinerConfig('name', ',', fields, 0, False, BENCHMARK_BUCKET, 'prefix/%Y-%m-%d')
+        miner = SparkDatasetMiner(config, BENCHMARK_OUTPUT_BUCKET, storage_format='parquet')
+        row = miner.store_row(('user-1', {'c': 1, 'size': {('300', '250')}, 'bid': 2}))
+        self.assertEqual(row, ['user-1', 1, ["('300', '250')"], '2'])
+
+
+class TestOutputPartitions(unittest.TestCase):
+
+    def test_partitions_from_input_size(self):
+        miner = get_miner()
+        miner.output_partition_size = 100
+        self.assertEqual(miner.get_output_partitions(None, 1000), 2)
+        self.assertEqual(miner.get_output_partitions(None, 1), 1)
+        self.assertEqual(miner.get_output_partitions(None, 0), miner.OUTPUT_PARTITIONS)
+
+
+class TestLocalMining(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.session = get_local_session()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.session.stop()
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        set_local_root(self.root)
+
+    def tearDown(self):
+        set_local_root(None)
+        shutil.rmtree(self.root)
+
+    def generate_logs(self, miner, dates=None, seed=0):
+        for date in dates or miner._dates:
+            path = os.path.join(self.root, BENCHMARK_BUCKET, miner._input_prefixes[date])
+            generate_auction_logs(path, 20, 500, [5, 3], files=2, seed=seed)
+
+    def assert_round_trip(self, storage_format):
+        text_miner, miner = get_miner(), get_miner(storage_format)
+        date = miner._dates[0]
+        self.generate_logs(miner, [date])
+        miner.create_dataset_for_day(self.session, date)
+
+        expected = dict(text_miner.read_input(self.session, date)[0].map(lambda line: line.split(',')[0]).map(
+            lambda user: (user, 1)).reduceByKey(lambda a, b: a + b).filter(lambda x: x[1] >= 5).collect())
+        loaded = dict(miner.load_dataset(self.session, date).collect())
+        self.assertEqual({user: record['c'] for user, record in loaded.items()}, expected)
+        self.assertTrue(all(isinstance(record['field_1'], set) for record in loaded.values()))
+        self.assertTrue(all(isinstance(record['field_0'], dict) for record in loaded.values()))
+        self.assertEqual(miner.catalog.manifest(date).records, len(expected))
+
+    def test_text_round_trip(self):
+        self.assert_round_trip('text')
+
+    def test_parquet_round_trip(self):
+        self.assert_round_trip('parquet')
+
+    def test_parquet_features(self):
+        miner = get_miner('parquet')
+        date = miner._dates[0]
+        self.generate_logs(miner, [date])
+        miner.create_dataset_for_day(self.session, date)
+        records = miner.load_dataset(self.session, date, features=['field_1']).values().collect()
+        self.assertTrue(records)
+        self.assertTrue(all(set(record) == {'c', 'field_1'} for record in records))
+
+    def test_concurrent_days(self):
+        miner = get_miner()
+        self.generate_logs(miner)
+        built = miner.create_dataset(self.session, max_concurrent_days=2)
+        self.assertEqual(sorted(built), miner._dates)
+        self.assertTrue(all(built.values()))
+        self.assertEqual(miner.create_dataset(self.session), {})
+
+    def test_get_dataset(self):
+        miner = get_miner()
+        self.generate_logs(miner)
+        miner.create_dataset(self.session)
+        days = sum(miner.load_dataset(self.session, date).count() for date in miner._dates)
+        with miner.persisted_dataset(self.session) as dataset:
+            self.assertEqual(dataset.count(), days)
+
+    def test_rollup(self):
+        miner = get_miner()
+        self.generate_logs(miner)
+        miner.create_dataset(self.session, rollup=True)
+        counts = {}
+        for date in miner._dates:
+            for user, record in miner.load_dataset(self.session, date).collect():
+                counts[user] = counts.get(user, 0) + record['c']
+        rollup = dict(miner.get_rollup_dataset(self.session).collect())
+        self.assertEqual({user: record['c'] for user, record in rollup.items()}, counts)
+
+    def test_incremental_rollup(self):
+        miner = get_miner()
+        run_date = miner.run_date
+        dates = [run_date - datetime.timedelta(days=i) for i in (3, 2, 1)]
+        self.generate_logs(miner, dates)
+
+        miner.run_date = run_date - datetime.timedelta(days=1)  # the previous run, before dates[1] was built
+        miner.create_dataset_for_day(self.session, dates[0])
+        miner.create_rollup(self.session)
+        self.assertEqual(miner.get_rollup_days(miner.run_date), {dates[0].strftime('%Y-%m-%d')})
+
+        miner.run_date = run_date
+        miner.create_dataset_for_day(self.session, dates[1])  # back-filled
+        miner.create_dataset_for_day(self.session, dates[2])
+        miner.create_rollup(self.session)
+        self.assertEqual(miner.get_rollup_days(run_date), {date.strftime('%Y-%m-%d') for date in dates[1:]})
+
+        counts = {}
+        for date in dates[1:]:
+            for user, record in miner.load_dataset(self.session, date).collect():
+                counts[user] = counts.get(user, 0) + record['c']
+        rollup = dict(miner.get_rollup_dataset(self.session).collect())
+        self.assertEqual({user: record['c'] for user, record in rollup.items()}, counts)
+
+
+class TestRollupDays(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        set_local_root(self.root)
+
+    def tearDown(self):
+        set_local_root(None)
+        shutil.rmtree(self.root)
+
+    def test_rollup_without_manifest(self):
+        self.assertIsNone(get_miner().get_rollup_days(get_miner().run_date))
+
+    def test_rollup_days(self):
+        miner = get_miner()
+        put_s3_object(miner.output_s3_bucket, miner._rollup_prefixes[miner.run_date] + ROLLUP_MANIFEST,
+                      '["2019-01-01", "2019-01-02"]')
+        self.assertEqual(miner.get_rollup_days(miner.run_date), {'2019-01-01', '2019-01-02'})
+
+    def test_rollup_partitions_from_manifests(self):
+        miner = get_miner()
+        miner.output_partition_size = 100
+        for date, size in zip(miner._dates, [150, 100]):
+            miner.catalog.write_manifest(date, 1, 10, size)
+        self.assertEqual(miner.get_rollup_partitions(miner._dates), 3)
+        self.assertEqual(miner.get_rollup_partitions(miner._dates[:1]), 2)
+
+
+class TestSchedulerPools(unittest.TestCase):
+
+    @staticmethod
+    def get_session(version):
+        return namedtuple('Session', 'sparkContext')(namedtuple('Context', 'version')(version))
+
+    def test_pools_need_pinned_threads(self):
+        self.assertFalse(SparkDatasetMiner._has_thread_local_properties(self.get_session('2.3.2')))
+        self.assertTrue(SparkDatasetMiner._has_thread_local_properties(self.get_session('3.0.1')))
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from spark_data_miner.core.config import MinerConfig, MinerField
+from spark_data_miner.core.records import compile_record_builder, compile_compact_record_builder, \
+    get_compact_record_combiner, get_record_expander
+
+
+class TestCompileRecordBuilder(unittest.TestCase):
+
+    def setUp(self):
+        fields = [
+            MinerField('domain', [1], 'str', 'dict'),
+            MinerField('size', [2, 3], 'str', 'set'),
+            MinerField('bid', [4], 'int'),
+        ]
+        self.config = MinerConfig('name', ',', fields, 0, False, 'bucket', 'prefix/%Y-%m-%d')
+
+    def test_create_record(self):
+        create_record = compile_record_builder(self.config)
+        raw = ['user', 'example.com', '300', '250', '12']
+        expected = {'domain': {'example.com': 1}, 'size': {"('300', '250')"}, 'bid': 12, 'c': 1}
+        self.assertEqual(create_record(raw), ('user', expected))
+
+    def test_create_record_is_reusable(self):
+        create_record = compile_record_builder(self.config)
+        create_record(['user', 'example.com', '300', '250', '12'])
+        _, record = create_record(['user', 'example.org', '728', '90', '1'])
+        self.assertEqual(record['domain'], {'example.org': 1})
+
+    def test_create_record_from_named_columns(self):
+        fields = [MinerField('domain', 'domain', 'str', 'set'), MinerField('size', ('width', 'height'), 'str')]
+        config = MinerConfig('name', ',', fields, 'user_id', False, 'bucket', 'prefix', input_format='json')
+        raw = {'user_id': 'user', 'domain': 'example.com', 'width': 300, 'height': 250}
+        expected = {'domain': {'example.com'}, 'size': '(300, 250)', 'c': 1}
+        self.assertEqual(compile_record_builder(config)(raw), ('user', expected))
+
+
+class TestCompactRecords(unittest.TestCase):
+
+    def setUp(self):
+        fields = [
+            MinerField('domain', [1], 'str', 'dict', limit=2),
+            MinerField('size', [2], 'str', 'set'),
+            MinerField('bid', [3], 'int'),
+        ]
+        self.config = MinerConfig('name', ',', fields, 0, False, 'bucket', 'prefix/%Y-%m-%d')
+        self.create_record = compile_compact_record_builder(self.config)
+
+    def test_create_compact_record(self):
+        raw = ['user', 'example.com', '300x250', '12']
+        self.assertEqual(self.create_record(raw), ('user', [1, {'example.com': 1}, {'300x250'}, 12]))
+
+    def test_combine_compact_records(self):
+        combine = get_compact_record_combiner(self.config, 10)
+        rows = [['user', 'a', '300x250', '1'], ['user', 'a', '728x90', '2'], ['user', 'b', '728x90', '3'],
+                ['user', 'c', '728x90', '4'], ['user', 'b', '728x90', '5']]
+        record = self.create_record(rows[0])[1]
+        for row in rows[1:]:
+            record = combine(record, self.create_record(row)[1])
+        self.assertEqual(record, [5, {'b': 3, 'c': 2}, {'300x250', '728x90'}, 15])
+
+    def test_combine_compact_records_late_heavy_hitter(self):
+        combine = get_compact_record_combiner(self.config, 100)
+        rows = [['user', 'a', '300x250', '1'], ['user', 'b', '300x250', '1']] + [['user', 'hot', '300x250', '1']] * 50
+        record = self.create_record(rows[0])[1]
+        for row in rows[1:]:
+            record = combine(record, self.create_record(row)[1])
+        self.assertEqual(len(record[1]), 2)
+        self.assertGreaterEqual(record[1]['hot'], 50)
+
+    def test_combine_compact_records_limit(self):
+        combine = get_compact_record_combiner(self.config, 1)
+        record_1 = self.create_record(['user', 'a', '300x250', '1'])[1]
+        record_2 = self.create_record(['user', 'a', '300x250', '1'])[1]
+        self.assertIsNone(combine(record_1, record_2))
+        self.assertIsNone(combine(None, record_2))
+
+    def test_expand_record(self):
+        expand = get_record_expander(self.config)
+        expected = {'c': 1, 'domain': {'a': 1}, 'size': {'300x250'}, 'bid': 1}
+        self.assertEqual(expand(self.create_record(['user', 'a', '300x250', '1'])), ('user', expected))
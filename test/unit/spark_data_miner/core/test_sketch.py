@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from spark_data_miner.core.sketch import CountMinSketch, merge_counters
+
+
+class TestCountMinSketch(unittest.TestCase):
+
+    def test_estimate_is_never_below_count(self):
+        sketch = CountMinSketch(width=64, depth=3)
+        counts = {'user-{}'.format(i): i for i in range(200)}
+        for key, count in counts.items():
+            sketch.add(key, count)
+        for key, count in counts.items():
+            self.assertGreaterEqual(sketch.estimate(key), count)
+
+    def test_estimate_is_exact_without_collisions(self):
+        sketch = CountMinSketch()
+        for _ in range(5):
+            sketch.add('user')
+        self.assertEqual(sketch.estimate('user'), 5)
+        self.assertEqual(sketch.estimate('other user'), 0)
+
+    def test_merge(self):
+        sketch_1, sketch_2 = CountMinSketch(), CountMinSketch()
+        sketch_1.add('user', 2)
+        sketch_2.add('user', 3)
+        self.assertEqual(sketch_1.merge(sketch_2).estimate('user'), 5)
+
+    def test_merge_saturates(self):
+        sketch_1, sketch_2 = CountMinSketch(width=64), CountMinSketch(width=64)
+        sketch_1.add('user', 2 ** 31 - 10)
+        sketch_2.add('user', 20)
+        self.assertEqual(sketch_1.merge(sketch_2).estimate('user'), 2 ** 31 - 1)
+
+    def test_merge_requires_same_shape(self):
+        with self.assertRaises(AssertionError):
+            CountMinSketch(width=64).merge(CountMinSketch(width=128))
+
+
+class TestMergeCounters(unittest.TestCase):
+
+    def test_merge_below_limit(self):
+        self.assertEqual(merge_counters({'a': 1, 'b': 2}, {'b': 1, 'c': 1}, 3), {'a': 1, 'b': 3, 'c': 1})
+
+    def test_new_value_replaces_least_frequent(self):
+        self.assertEqual(merge_counters({'a': 1, 'b': 3}, {'c': 2}, 2), {'b': 3, 'c': 3})
+
+    def test_late_heavy_hitter_is_kept(self):
+        counter = {'a': 1}
+        for value in ['b'] + ['hot'] * 50:
+            counter = merge_counters(counter, {value: 1}, 2)
+        self.assertEqual(len(counter), 2)
+        self.assertGreaterEqual(counter['hot'], 50)
+
+    def test_late_heavy_hitter_in_one_merge(self):
+        counter = merge_counters({'a': 1, 'b': 1}, {'c': 1, 'hot': 50, 'd': 1}, 2)
+        self.assertEqual(len(counter), 2)
+        self.assertGreaterEqual(counter['hot'], 50)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import bz2
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from spark_data_miner.core.benchmark import generate_auction_logs
+from spark_data_miner.core.utils import (
+    _decompress, _get_decompressor, get_aws_client, group_s3_objects, set_local_root, list_s3_objects, read_s3_lines,
+    put_s3_object, get_s3_object, delete_s3_prefix, get_s3_connection
+)
+
+
+class TestGroupS3Objects(unittest.TestCase):
+
+    def test_small_objects_are_combined(self):
+        objects = [('a', 10), ('b', 10), ('c', 10)]
+        self.assertEqual(group_s3_objects(objects, 20), [['a', 'b'], ['c']])
+
+    def test_large_objects_are_not_combined(self):
+        objects = [('a', 10), ('b', 50), ('c', 1)]
+        self.assertEqual(group_s3_objects(objects, 20), [['a'], ['b'], ['c']])
+
+    def test_no_objects(self):
+        self.assertEqual(group_s3_objects([], 20), [])
+
+
+def gzip_compress(data):
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb') as f:
+        f.write(data)
+    return buffer.getvalue()
+
+
+class TestDecompress(unittest.TestCase):
+
+    def assert_members(self, s3_key, compress, chunk_size):
+        members = [b'a,1\nb,2\n', b'c,3\n', b'd,4\n']
+        data = b''.join(compress(member) for member in members)
+        decompressor, output = _get_decompressor(s3_key), []
+        for i in range(0, len(data), chunk_size):
+            chunk, decompressor = _decompress(decompressor, s3_key, data[i:i + chunk_size])
+            output.append(chunk)
+        self.assertEqual(b''.join(output), b''.join(members))
+
+    def test_gzip_members(self):
+        for chunk_size in (1, 7, 1024):
+            self.assert_members('logs.gz', gzip_compress, chunk_size)
+
+    def test_bzip2_members(self):
+        for chunk_size in (1, 7, 1024):
+            self.assert_members('logs.bz2', bz2.compress, chunk_size)
+
+
+class TestLocalRoot(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        set_local_root(self.root)
+
+    def tearDown(self):
+        set_local_root(None)
+        shutil.rmtree(self.root)
+
+    def test_read_generated_logs(self):
+        generate_auction_logs(self.root + '/bucket/logs/', 10, 100, [5, 3], files=3)
+        keys = [key for key, _ in list_s3_objects('bucket', 'logs/')]
+        self.assertEqual(len(keys), 3)
+        lines = list(read_s3_lines('bucket')(keys))
+        self.assertEqual(len(lines), 100)
+        self.assertTrue(all(len(line.split(',')) == 3 for line in lines))
+
+    def test_read_concatenated_logs(self):
+        os.makedirs(self.root + '/bucket/logs/')
+        with open(self.root + '/bucket/logs/part-0.gz', 'wb') as f:
+            f.write(gzip_compress(b'a,1\nb,2\n') + gzip_compress(b'c,3\n'))
+        self.assertEqual(list(read_s3_lines('bucket')(['logs/part-0.gz'])), ['a,1', 'b,2', 'c,3'])
+
+    def test_objects(self):
+        put_s3_object('bucket', 'manifests/a.json', '{}')
+        self.assertEqual(get_s3_object('bucket', 'manifests/a.json'), b'{}')
+        delete_s3_prefix('bucket', 'manifests/')
+        self.assertIsNone(get_s3_object('bucket', 'manifests/a.json'))
+
+
+class TestAwsClients(unittest.TestCase):
+
+    def test_clients_are_shared(self):
+        client = get_aws_client('ec2', 'eu-west-1')
+        self.assertIs(get_aws_client('ec2', 'eu-west-1'), client)
+        self.assertIsNot(get_aws_client('ec2', 'us-east-1'), client)
+
+    def test_adaptive_retries(self):
+        config = get_aws_client('iam', 'eu-west-1').meta.config
+        self.assertEqual(config.retries['mode'], 'adaptive')
+        self.assertEqual(config.max_pool_connections, 50)
+
+    def test_s3_connections_are_per_thread(self):
+        connection = get_s3_connection()
+        self.assertIs(get_s3_connection(), connection)
+        connections = []
+        thread = threading.Thread(target=lambda: connections.append(get_s3_connection()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(connections[0], connection)